@@ -9,6 +9,7 @@
  * tareing, and command sequences
  */
 #include "mbed.h"
+#include <cstddef>
 #include <cstdint>
 #include <cstdio>
 #include <vector>
@@ -67,6 +68,43 @@
     }
 // =================================================
 
+// ============== Binary Telemetry ===============
+    // compact alternative to the JSON text frame, selected with {B1} / {B0}.
+    // the GUI decoder (GUI/telemetry.py) mirrors this layout
+    #define TELEMETRY_SYNC     0x5AA5
+    #define TELEMETRY_CHANNELS 16
+
+    struct __attribute__((packed)) TelemetryChannel {
+        uint32_t ms;
+        float    value;
+        float    raw;
+    };
+
+    struct __attribute__((packed)) TelemetryFrame {
+        uint16_t sync;
+        uint16_t channels;
+        uint32_t seq;
+        TelemetryChannel data[TELEMETRY_CHANNELS]; // RTD0-3, ADCs, OX MFR, F MFR, LC1
+        uint8_t  actuators;                        // bit n is solenoid n
+        uint8_t  reserved[3];
+        uint32_t crc;                              // CRC-32 of everything above
+    };
+
+    bool binary_telemetry = false;
+    uint32_t telemetry_seq = 0;
+    MbedCRC<POLY_32BIT_ANSI, 32> telemetry_crc;
+
+    void send_binary(TelemetryFrame& frame) {
+        frame.sync = TELEMETRY_SYNC;
+        frame.channels = TELEMETRY_CHANNELS;
+        frame.seq = telemetry_seq;
+        telemetry_crc.compute(&frame, offsetof(TelemetryFrame, crc), &frame.crc);
+
+        // one write so log lines from command threads can't split the frame
+        ser.write(&frame, sizeof(frame));
+    }
+// =================================================
+
 // serial rx interrupt
 volatile bool read_flag = false;
 void serial_isr() {
@@ -499,6 +537,11 @@ int main() {
                             }
                         }
 
+                        else if (buf[0] == 'B') { // Telemetry Format
+                            binary_telemetry = (buf[1] == '1');
+                            log_nb("binary telemetry %s\n", binary_telemetry ? "on" : "off");
+                        }
+
                         else if (buf[0] == 'D') { // Disk Command
                             if (buf[1] == 'E') {
                                 log_nb("Ejecting SD Card\n");
@@ -522,20 +565,23 @@ int main() {
                         }
 
                         else { // No Command Found, Log Data
-                            printf_nb("{");
+                            // gather every channel first, then send it in the selected format
+                            TelemetryFrame frame = {0};
+                            int ch = 0;
+
                             for (RTD* rtd : rtds) {
                                 int time;
                                 float value;
                                 uint16_t raw;
                                 rtd->last_data(&value, &raw, &time);
-                                printf_nb("\"%s\" : [%d, %f, %d], ", rtd->name, time, value, raw);                     
+                                frame.data[ch++] = {(uint32_t) time, value, (float) raw};
                             }
                             for (ADCSensor* adc : adcs) {
                                 int time;
                                 float value;
                                 float raw;
                                 adc->last_data(&value, &raw, &time);
-                                printf_nb("\"%s\" : [%d, %f, %f], ", adc->name, time, value, raw);                     
+                                frame.data[ch++] = {(uint32_t) time, value, raw};
                             }
 
                             float he_dpres;
@@ -569,28 +615,58 @@ int main() {
 
                             float he_mfr = mass_flow(he_dpres, he_temp, HE_VOLUME, HE_R, he_dt);
                             float ox_mfr = mass_flow(ox_dpres, ox_temp, OX_VOLUME, OX_R, ox_dt);
-                            //printf_nb("\"HE MFR\" : [%d, %f], ", he_time, he_mfr);
-                            printf_nb("\"OX MFR\" : [%d, %f], ", ox_time, ox_mfr);
+                            frame.data[ch++] = {(uint32_t) ox_time, ox_mfr, 0.0f};
 
                             float fm_value;
                             uint32_t fm_raw;
                             int fm_ms;
                             fm1.last_data(&fm_value, &fm_raw, &fm_ms);
-                            printf_nb("\"F MFR\" : [%d, %f], ", fm_ms, fm_value);
+                            frame.data[ch++] = {(uint32_t) fm_ms, fm_value, (float) fm_raw};
 
                             int time;
                             float value;
                             float raw;
                             lc1.last_data(&value, &raw, &time);
+                            frame.data[ch++] = {(uint32_t) time, value, raw};
 
-                            printf_nb("\"%s\" : [%d, %f, %f], ", lc1.name, time, value, raw);
-                            printf_nb("\"actuators\" : [%d, %d, %d, %d, %d, %d, %d, %d]",
-                                solenoids[0].read() == 1, solenoids[1].read() == 1, solenoids[2].read() == 1,
-                                solenoids[3].read() == 1, solenoids[4].read() == 1, solenoids[5].read() == 1,
-                                solenoids[6].read() == 1, solenoids[7].read() == 1
-                            );
+                            for (int s = 0; s < 8; s++) {
+                                frame.actuators |= (solenoids[s].read() == 1) << s;
+                            }
 
-                            printf_nb("}\n");
+                            if (binary_telemetry) {
+                                send_binary(frame);
+                            }
+                            else {
+                                ch = 0;
+                                // frame number first, so the GUI can tell frames lost on the way
+                                printf_nb("{\"seq\" : %lu, ", (unsigned long) telemetry_seq);
+                                for (RTD* rtd : rtds) {
+                                    TelemetryChannel c = frame.data[ch++];
+                                    printf_nb("\"%s\" : [%d, %f, %d], ", rtd->name, (int) c.ms, c.value, (int) c.raw);
+                                }
+                                for (ADCSensor* adc : adcs) {
+                                    TelemetryChannel c = frame.data[ch++];
+                                    printf_nb("\"%s\" : [%d, %f, %f], ", adc->name, (int) c.ms, c.value, c.raw);
+                                }
+
+                                TelemetryChannel ox = frame.data[ch++];
+                                //printf_nb("\"HE MFR\" : [%d, %f], ", he_time, he_mfr);
+                                printf_nb("\"OX MFR\" : [%d, %f], ", (int) ox.ms, ox.value);
+
+                                TelemetryChannel fm = frame.data[ch++];
+                                printf_nb("\"F MFR\" : [%d, %f], ", (int) fm.ms, fm.value);
+
+                                TelemetryChannel lc = frame.data[ch++];
+                                printf_nb("\"%s\" : [%d, %f, %f], ", lc1.name, (int) lc.ms, lc.value, lc.raw);
+                                printf_nb("\"actuators\" : [%d, %d, %d, %d, %d, %d, %d, %d]",
+                                    (frame.actuators >> 0) & 1, (frame.actuators >> 1) & 1, (frame.actuators >> 2) & 1,
+                                    (frame.actuators >> 3) & 1, (frame.actuators >> 4) & 1, (frame.actuators >> 5) & 1,
+                                    (frame.actuators >> 6) & 1, (frame.actuators >> 7) & 1
+                                );
+
+                                printf_nb("}\n");
+                            }
+                            telemetry_seq++;
 
                             //log_nb("mfr calc: %f, %f, %f\n", ox_dpres, ox_temp, ox_dt_s);
                         }
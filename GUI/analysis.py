@@ -0,0 +1,142 @@
+# SARP OTV DAQ GUI
+#
+# vectorized statistics for post fire review of SD logs
+#
+# every rolling function returns one value per full window, so the output is
+# window - 1 samples shorter than the input and entry i covers y[i:i + window]
+
+import numpy as np
+
+
+def _windows(y, window):
+    y = np.asarray(y, dtype=np.float64)
+    if window < 1:
+        raise ValueError("window must be at least 1 sample")
+    return y, max(len(y) - window + 1, 0)
+
+
+def _blocks(y, window):
+    """y cut into rows of `window` samples, zero padded, with a spare row."""
+    blocks = np.zeros((-(-len(y) // window) + 1, window))
+    blocks.ravel()[:len(y)] = y
+    return blocks
+
+
+def _tail_sums(blocks, count):
+    """Sum from every sample to the end of its block."""
+    return np.cumsum(blocks[:, ::-1], axis=1)[:, ::-1].ravel()[:count]
+
+
+def _head_sums(blocks, count):
+    """Sum from the start of a block up to every sample, the one `window` on
+    from each window's start, i.e. the part of the window in the next block.
+    """
+    window = blocks.shape[1]
+    head = np.zeros_like(blocks)
+    np.cumsum(blocks[:, :-1], axis=1, out=head[:, 1:])
+    return head.ravel()[window:window + count]
+
+
+# like _rolling_extreme, a window is the tail of one block plus the head of the
+# next. running sums never add more than a block, so their rounding stays at
+# the scale of a window instead of growing over the whole log
+
+def rolling_mean(y, window=100):
+    """Mean of every window, from running sums in O(n)."""
+    y, count = _windows(y, window)
+    if count == 0:
+        return np.zeros(0)
+
+    blocks = _blocks(y, window)
+    return (_tail_sums(blocks, count) + _head_sums(blocks, count)) / window
+
+
+def rolling_std(y, window=100):
+    """Population standard deviation of every window in O(n).
+
+    Tails are summed around the last sample of their block and heads around
+    the first of theirs. Both are inside the window, so the sums of squares
+    only cancel out as far as the window itself spreads, however large the
+    offset or the steps elsewhere in the log.
+    """
+    y, count = _windows(y, window)
+    if count == 0:
+        return np.zeros(0)
+
+    blocks = _blocks(y, window)
+    last = blocks[:, -1:].copy()
+    first = blocks[:, :1].copy()
+    tail = blocks - last
+    head = blocks - first
+    tail.ravel()[len(y):] = 0
+    head.ravel()[len(y):] = 0
+
+    s_tail = _tail_sums(tail, count)
+    q_tail = _tail_sums(tail * tail, count)
+    s_head = _head_sums(head, count)
+    q_head = _head_sums(head * head, count)
+
+    # move the head sums over to the tail's center
+    i = np.arange(count)
+    n = i % window # samples in the head
+    delta = (first[1:, 0] - last[:-1, 0])[i // window]
+    sums = s_tail + s_head + n * delta
+    squares = q_tail + q_head + 2 * delta * s_head + n * delta * delta
+
+    mean = sums / window
+    return np.sqrt(np.maximum(squares / window - mean * mean, 0))
+
+
+def _rolling_extreme(y, window, ufunc, pad):
+    """van Herk / Gil-Werman running min or max in O(n).
+
+    The data is cut into blocks of `window` samples. Any window spans the end
+    of one block and the start of the next, so its extreme is the suffix
+    extreme of the first block combined with the prefix extreme of the second.
+    """
+    y, count = _windows(y, window)
+    if count == 0:
+        return np.zeros(0)
+
+    blocks = -(-len(y) // window)
+    padded = np.full(blocks * window, pad)
+    padded[:len(y)] = y
+    padded = padded.reshape(blocks, window)
+
+    prefix = ufunc.accumulate(padded, axis=1).ravel()
+    suffix = ufunc.accumulate(padded[:, ::-1], axis=1)[:, ::-1].ravel()
+    return ufunc(suffix[:count], prefix[window - 1:window - 1 + count])
+
+
+def rolling_min(y, window=100):
+    """Minimum of every window in O(n)."""
+    return _rolling_extreme(y, window, np.minimum, np.inf)
+
+
+def rolling_max(y, window=100):
+    """Maximum of every window in O(n)."""
+    return _rolling_extreme(y, window, np.maximum, -np.inf)
+
+
+def max_rise(y, samples=100):
+    """Largest increase over `samples` samples, as (start index, rise).
+
+    Returns (-1, 0.0) if the data never rises or is too short.
+    """
+    y = np.asarray(y, dtype=np.float64)
+    if len(y) <= samples:
+        return -1, 0.0
+
+    delta = y[samples:] - y[:-samples]
+    if np.isnan(delta).all():
+        return -1, 0.0
+
+    i = int(np.nanargmax(delta))
+    if not delta[i] > 0:
+        return -1, 0.0
+    return i, float(delta[i])
+
+
+def peak_rises(data, samples=100):
+    """max_rise of every sensor of a loaded log, {name: (index, rise)}."""
+    return {name: max_rise(sensor["Y"], samples) for name, sensor in data.items()}
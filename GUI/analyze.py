@@ -1,42 +1,48 @@
 import matplotlib.pyplot as plt
 
-def get_data(filename):
-    data = {}
-
-    with open(filename, 'r') as file:
-        lines = file.readlines()
-
-    start_time = int(lines[0].strip().split(",")[3].strip())
-
-    for line in lines:
-        set = line.strip().split(",")
-        key = set[0][1:-1]
-        if key not in data:
-            data[key] = {"X": [], "Y": []}
-
-        data[key]["Y"].append(float(set[1].strip()))
-        data[key]["X"].append(int(set[3].strip()) - start_time)
-    return data
+from sdlog import load_cached, LogFollower
+from analysis import peak_rises
 
-def rolling_avg(data, window=100):
-    out = []
-    for i in range(len(data)-window):
-        out.append(sum(data[i:i+window]) / window)
+def get_data(filename):
+    return load_cached(filename)
 
 sensor = "FM1"
 log = "log.txt"
-
-data = get_data(log)[sensor]
-
-dp  = 0
-dpi = 0
-
-for i in range(len(data["Y"])-100):
-    delta = data["Y"][i+100] - data["Y"][i]
-    if (delta > dp):
-        dp  = delta
-        dpi = i 
-
+follow = False # plot the log live while it is still being written
+refresh = 0.5  # seconds between checks for new lines in follow mode
+
+def follow_log(filename, sensor):
+    """Plots a sensor of a growing log, parsing only what was appended."""
+    follower = LogFollower(filename)
+    line, = plt.plot([], [])
+    plt.xlabel("Time (ms)")
+    plt.ylabel("Pressure (PSI)")
+    plt.title(sensor)
+    plt.grid(True)
+
+    while plt.get_fignums():
+        if sensor in follower.poll():
+            data = follower.sensor(sensor)
+            line.set_data(data["X"], data["Y"])
+            # the data limits grow by the follower's running bounds, relim
+            # would go over the whole history again
+            x0, x1, y0, y1 = follower.bounds[sensor]
+            line.axes.update_datalim([(x0, y0), (x1, y1)])
+            line.axes.autoscale_view()
+        plt.pause(refresh)
+
+if follow:
+    follow_log(log, sensor)
+    raise SystemExit
+
+logs = get_data(log)
+data = logs[sensor]
+
+rises = peak_rises(logs, 100)
+for name, (i, rise) in rises.items():
+    print(f"{name:<8} {i:>8} {rise:12.4f}")
+
+dpi, dp = rises[sensor]
 print(dpi, dp)
 
 s = 0#dpi#int(len(data["X"]) / 2) + 15000
@@ -0,0 +1,531 @@
+# SARP OTV DAQ GUI
+#
+# end to end benchmark, from bytes on the serial port to pixels
+#
+#   python benchmarks/bench_pipeline.py [--gui daq|serial|both] [--rates 20,100,500,2000]
+#                                       [--channels 16,64] [--duration 5]
+#                                       [--output results.json] [--baseline baseline.json]
+#
+# a generator process writes synthetic telemetry into a pty at a fixed rate and
+# a GUI's receive path reads it off the port and charts it, no display needed:
+#   daq     main.py itself, imported under an offscreen QApplication. its
+#           serial_rx thread reads the port, with the sequence tracking, perf
+#           spans and session recorder it runs with, and update() draws
+#           through a DirtyAnimation in a real Qt event loop. stage times are
+#           the spans serial_rx records in main.perf
+#   serial  SerialGUI.py builds its Tk window on import, so its path is put
+#           together from the same parts: reader thread with a LineSplitter,
+#           processing thread with a FrameDecoder and ChannelStore, and a
+#           LiveGraph per GUIConfig.json graph on Agg, redrawn every ui_interval
+#
+# every frame carries the time it was written in place of the DAQ's millis(),
+# so the latency of each one from the port to the end of the first draw that
+# shows it is known. for every rate and channel count this reports the frames
+# per second that got through, dropped lines, the time spent reading, parsing,
+# storing and rendering, and latency percentiles. results are saved as JSON,
+# --baseline compares them against an earlier result file and exits with 1 if
+# anything got slower by more than --tolerance
+
+import os
+import sys
+import argparse
+import json
+import multiprocessing as mp
+import platform
+import pty
+import queue
+import threading
+import time
+import tty
+from collections import deque
+
+import numpy as np
+import matplotlib
+import serial
+
+GUI_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+SANDBOX_DIR = os.path.join(GUI_DIR, "..", "XavierSandbox")
+sys.path.append(GUI_DIR)
+sys.path.append(SANDBOX_DIR)
+
+from telemetry import FrameDecoder, LineSplitter
+from ringbuffer import ChannelStore
+
+
+READ   = "read"
+PARSE  = "parse"
+STORE  = "store"
+RENDER = "render"
+IDLE   = "idle"   # waiting on the port for the next byte
+STAGES = (READ, PARSE, STORE, RENDER, IDLE)
+
+# how long the GUI gets to catch up once the generator is done (s)
+DRAIN_TIME = 5.0
+
+# distinct frames the generator cycles through
+VARIANTS = 64
+
+BAUDRATE = 115200 # ignored by a pty
+
+
+# ====================== Frame generator ======================
+
+def channel_names(base, count):
+    """`count` channel names, the GUI's own first."""
+    return list(base[:count]) + [f"CH{i}" for i in range(len(base), count)]
+
+
+def templates(style, names):
+    """Frame lines with %s where the send time goes, in the style of either DAQ.
+
+    OTV DAQ frames start with their number, that %s comes first.
+    """
+    rng = np.random.default_rng(0)
+    lines = []
+    for _ in range(VARIANTS):
+        values = rng.uniform(-100, 5000, len(names))
+        if style == "daq":
+            parts = ['"seq" : %s'] + ['"%s" : [%%s, %f]' % (name, value) for name, value in zip(names, values)]
+            parts.append('"actuators" : [0, 0, 0, 1, 0, 0, 0, 1]')
+            lines.append("{" + ", ".join(parts) + "}\n")
+        else:
+            parts = ['"timeSent": %s'] + ['"%s": %f' % (name, value) for name, value in zip(names, values)]
+            lines.append("{" + ", ".join(parts) + "}\n")
+    return lines, (len(names) if style == "daq" else 1)
+
+
+def generate(conn, style, names, rate, duration, origin):
+    """Writes `rate` frames per second into a pty for `duration` seconds.
+
+    Runs in its own process, like the DAQ. The port path goes back over
+    `conn`, then it waits for the GUI to open it, and reports how many
+    frames it sent when done.
+    """
+    master, slave = pty.openpty()
+    tty.setraw(slave)
+    conn.send(os.ttyname(slave))
+    conn.recv()
+
+    lines, stamps = templates(style, names)
+    sent = 0
+    start = time.monotonic()
+    while True:
+        now = time.monotonic()
+        elapsed = now - start
+        if elapsed >= duration:
+            break
+
+        due = int(elapsed * rate) + 1 - sent
+        if due > 0:
+            # every frame of a batch goes out with the time it was written
+            stamp = "%.3f" % ((now - origin) * 1000)
+            seq = (lambda i: (sent + i,)) if style == "daq" else (lambda i: ())
+            data = "".join(lines[(sent + i) % VARIANTS] % (seq(i) + (stamp,) * stamps) for i in range(due)).encode()
+            view = memoryview(data)
+            while view:
+                view = view[os.write(master, view):]
+            sent += due
+
+        time.sleep(max(sent / rate - (time.monotonic() - start), 0))
+
+    conn.send(sent)
+    conn.recv() # keep the port up until everything was read
+    os.close(master)
+    os.close(slave)
+
+
+class Generator:
+    """Generator process of one run."""
+
+    def __init__(self, style, names, rate, duration, origin):
+        self.conn, child = mp.Pipe()
+        self.process = mp.Process(target=generate, args=(child, style, names, rate, duration, origin), daemon=True)
+        self.process.start()
+        self.path = self.conn.recv()
+        self.sent = None
+
+    def start(self):
+        self.conn.send("go")
+
+    @property
+    def done(self):
+        if self.sent is None and self.conn.poll():
+            self.sent = self.conn.recv()
+        return self.sent is not None
+
+    def close(self):
+        self.conn.send("close")
+        self.process.join()
+
+# ====================== Measurements ======================
+
+class Run:
+    """Counters and stage timings of one run, shared by its threads."""
+
+    def __init__(self, gui, rate, channels, origin):
+        self.gui = gui
+        self.rate = rate
+        self.channels = channels
+        self.origin = origin
+
+        self.seconds = dict.fromkeys(STAGES, 0.0)
+        self.received = 0
+        self.corrupt = 0
+        self.draws = 0
+        self.first = None
+        self.last = None
+        self.deadline = None
+
+        self.pending = deque() # send times of stored frames not drawn yet
+        self.latencies = []
+        self.stop = threading.Event()
+
+    def add(self, stage, start):
+        """Adds the time since `start` (perf_counter) to a stage."""
+        self.seconds[stage] += time.perf_counter() - start
+
+    def stored(self, ms):
+        """Counts a frame that reached the history, sent at `ms`."""
+        now = time.monotonic()
+        if self.first is None:
+            self.first = now
+        self.last = now
+        self.received += 1
+        self.pending.append(self.origin + ms / 1000)
+
+    def drawn(self, count):
+        """The oldest `count` pending frames are now on screen."""
+        now = time.monotonic()
+        self.draws += 1
+        for _ in range(count):
+            self.latencies.append(now - self.pending.popleft())
+
+    def finished(self, generator):
+        """True once every frame sent is on screen, or the GUI had DRAIN_TIME to get there."""
+        if not generator.done:
+            return False
+        if self.deadline is None:
+            self.deadline = time.monotonic() + DRAIN_TIME
+        caught_up = self.received + self.corrupt >= generator.sent and not self.pending
+        return caught_up or time.monotonic() > self.deadline
+
+    def result(self, sent):
+        span = (self.last - self.first) if self.received > 1 else 0.0
+        latency = np.array(self.latencies) * 1000
+        frames = max(self.received, 1)
+        return {
+            "gui": self.gui,
+            "rate": self.rate,
+            "channels": self.channels,
+            "sent": sent,
+            "received": self.received,
+            "dropped": sent - self.received,
+            "corrupt": self.corrupt,
+            "fps": (self.received - 1) / span if span else 0.0,
+            "draws": self.draws,
+            "draw_fps": self.draws / span if span else 0.0,
+            "stage_us": {stage: self.seconds[stage] / frames * 1e6 for stage in STAGES},
+            "latency_ms": {
+                "p50": float(np.percentile(latency, 50)) if len(latency) else None,
+                "p90": float(np.percentile(latency, 90)) if len(latency) else None,
+                "p99": float(np.percentile(latency, 99)) if len(latency) else None,
+                "max": float(latency.max()) if len(latency) else None,
+            },
+        }
+
+
+def read_port(ser, run):
+    """Reads whatever is waiting, timed as idle when it had to wait for it."""
+    waiting = ser.in_waiting
+    start = time.perf_counter()
+    data = ser.read(waiting or 1)
+    run.add(READ if waiting else IDLE, start)
+    return data
+
+# ====================== OTV DAQ GUI ======================
+
+def daq_stages(run, perf):
+    """Takes the stage times serial_rx recorded in main.perf."""
+    for stage in (READ, PARSE, STORE):
+        if stage in perf.spans:
+            run.seconds[stage] += perf.spans[stage].total
+
+
+def bench_daq(sweep, duration):
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PyQt6.QtCore import QTimer
+    from PyQt6.QtWidgets import QApplication
+
+    # main.py picks the Qt backend on import, which needs an application to exist
+    app = QApplication.instance() or QApplication(sys.argv)
+    import main
+    from matplotlib.backends.backend_qtagg import FigureCanvasQTAgg
+    from perfmon import PerfMonitor
+    from seqtrack import SequenceTracker
+
+    # frames that reach the history, with their send time, for the latencies.
+    # serial_rx puts a NaN row in front of a frame after a gap, that is no frame
+    append_row = main.history.append_row
+    def stored_row(index, xs, ys):
+        append_row(index, xs, ys)
+        if run is not None and len(xs) and not np.isnan(ys).all():
+            run.stored(xs[0] * 1000)
+    main.history.append_row = stored_row
+    run = None
+
+    class TimedAnimation(main.DirtyAnimation):
+        """DirtyAnimation that reports every draw to the current run."""
+
+        run = None
+
+        def _draw_next_frame(self, framedata, blit):
+            run = self.run
+            count = len(run.pending) if run is not None else 0
+            start = time.perf_counter()
+            super()._draw_next_frame(framedata, blit)
+            if run is not None and self._drawn_artists:
+                run.add(RENDER, start)
+                run.drawn(count)
+
+    # the window main.py puts together, less the controls
+    main.fig_charts.subplots_adjust(left=0.05, right=0.95, top=0.95, bottom=0.05, hspace=0.25, wspace=0.25)
+    canvas = FigureCanvasQTAgg(main.fig_charts)
+    canvas.mpl_connect('draw_event', main.mark_all_dirty)
+    canvas.resize(1200, 800)
+    canvas.show()
+    ani = TimedAnimation(main.fig_charts, main.update, interval=5, blit=True, cache_frame_data=False)
+
+    # get the first full draw of the window out of the way
+    app.processEvents()
+
+    results = []
+    for rate, channels in sweep:
+        origin = time.monotonic()
+        names = channel_names(main.CHARTS, channels)
+        generator = Generator("daq", names, rate, duration, origin)
+        ser = serial.Serial(generator.path, BAUDRATE, timeout=0.1)
+
+        # a fresh connection, as connect_serial starts one
+        main.history.clear()
+        main.decoder.forget()
+        main.sequence = SequenceTracker()
+        main.perf = PerfMonitor()
+        main.ser = ser
+        main.run_threads = True
+        run = Run("daq", rate, channels, origin)
+        rx = threading.Thread(target=main.serial_rx, daemon=True)
+        rx.start()
+        ani.run = run
+        generator.start()
+
+        def check():
+            run.corrupt = main.sequence.corrupt
+            if run.finished(generator):
+                app.quit()
+        timer = QTimer()
+        timer.timeout.connect(check)
+        timer.start(50)
+        app.exec()
+        timer.stop()
+
+        ani.run = None
+        main.run_threads = False
+        rx.join()
+        main.ser = None
+        ser.close()
+        generator.close()
+        daq_stages(run, main.perf)
+        results.append(run.result(generator.sent))
+        report(results[-1])
+
+    ani.event_source.stop()
+    return results
+
+# ====================== Capstone serial GUI ======================
+
+def serial_read(ser, run, batches):
+    """SerialGUI.serial_read_thread, timed."""
+    splitter = LineSplitter()
+    while not run.stop.is_set():
+        data = read_port(ser, run)
+        start = time.perf_counter()
+        lines = [line.decode('utf-8', errors='replace').strip() for line in splitter.feed(data)]
+        lines = [line for line in lines if line]
+        run.add(PARSE, start)
+        if lines:
+            batches.put(lines)
+
+
+def serial_process(run, batches, decoder, series, series_index, dirty):
+    """The frame handling of SerialGUI.data_processing_thread, timed."""
+    while not run.stop.is_set():
+        try:
+            lines = batches.get(timeout=0.1)
+        except queue.Empty:
+            continue
+
+        for line in lines:
+            start = time.perf_counter()
+            try:
+                decoder.decode(line)
+                sent = decoder.get('timeSent')
+            except (ValueError, KeyError):
+                run.corrupt += 1
+                continue
+            run.add(PARSE, start)
+
+            start = time.perf_counter()
+            timestamp = sent / 1000.0
+            keys = []
+            for key in decoder.names:
+                if key in series_index:
+                    series.append(series_index[key], timestamp, float(decoder.get(key)))
+                    keys.append(key)
+            with dirty[1]:
+                dirty[0].update(keys)
+                run.stored(sent)
+            run.add(STORE, start)
+
+
+def bench_serial(sweep, duration):
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from livegraph import LiveGraph
+
+    with open(os.path.join(SANDBOX_DIR, "GUIConfig.json")) as file:
+        gui_config = json.load(file)
+    history_length = gui_config.get('history_length', 1000)
+    ui_interval = gui_config.get('ui_interval', 100) / 1000
+    keys = [graph_config['data_keys'] for graph_config in gui_config['graphs']]
+
+    # one figure per graph, as MainPage builds them
+    graphs = {}
+    for graph_config in gui_config['graphs']:
+        fig = Figure(figsize=(4, 3), dpi=100)
+        FigureCanvasAgg(fig)
+        ax = fig.add_subplot(111, title=graph_config['label'])
+        fig.subplots_adjust(top=0.85, bottom=0.25, left=0.2, right=0.95)
+        ax.grid(True, linestyle='--', alpha=0.3)
+        graphs[graph_config['data_keys']] = LiveGraph(ax, graph_config['kwargs'])
+        fig.canvas.draw()
+
+    results = []
+    for rate, channels in sweep:
+        origin = time.monotonic()
+        names = channel_names(keys, channels)
+        generator = Generator("serial", names, rate, duration, origin)
+        ser = serial.Serial(generator.path, BAUDRATE, timeout=0.1)
+
+        series_index = {key: i for i, key in enumerate(keys)}
+        series = ChannelStore(len(series_index), history_length)
+        dirty = (set(), threading.Lock())
+        batches = queue.Queue()
+        run = Run("serial", rate, channels, origin)
+        threads = [
+            threading.Thread(target=serial_read, args=(ser, run, batches), daemon=True),
+            threading.Thread(target=serial_process, args=(run, batches, FrameDecoder(), series, series_index, dirty), daemon=True),
+        ]
+        for thread in threads:
+            thread.start()
+        generator.start()
+
+        # the UIDispatcher frames, on this thread in place of Tk's
+        while not run.finished(generator):
+            time.sleep(ui_interval)
+
+            with dirty[1]:
+                marked = set(dirty[0])
+                dirty[0].clear()
+                count = len(run.pending)
+            if not marked:
+                continue
+
+            start = time.perf_counter()
+            for key in marked:
+                graphs[key].update(*series.view(series_index[key]))
+            run.add(RENDER, start)
+            run.drawn(count)
+
+        run.stop.set()
+        for thread in threads:
+            thread.join()
+        ser.close()
+        generator.close()
+        results.append(run.result(generator.sent))
+        report(results[-1])
+
+    return results
+
+# ====================== Reporting ======================
+
+def report(result):
+    latency = result["latency_ms"]
+    stages = result["stage_us"]
+    p99 = "-" if latency["p99"] is None else f"{latency['p99']:.1f}"
+    print(f"{result['gui']:<6} {result['rate']:>6} Hz {result['channels']:>4} ch  "
+          f"{result['fps']:8.1f} fps  {result['dropped']:>5} dropped  "
+          f"read {stages[READ]:6.1f} parse {stages[PARSE]:6.1f} store {stages[STORE]:6.1f} "
+          f"render {stages[RENDER]:8.1f} us/frame  p99 {p99} ms")
+
+
+def compare(results, baseline, tolerance):
+    """Prints the change against a baseline run for run, returns True if anything got slower."""
+    old = {(r["gui"], r["rate"], r["channels"]): r for r in baseline["runs"]}
+    slower = False
+    print(f"\nagainst {baseline.get('created', 'baseline')}")
+    for result in results:
+        base = old.get((result["gui"], result["rate"], result["channels"]))
+        if base is None:
+            continue
+
+        fps = result["fps"] / base["fps"] if base["fps"] else float("nan")
+        p99, base_p99 = result["latency_ms"]["p99"], base["latency_ms"]["p99"]
+        latency = p99 / base_p99 if p99 and base_p99 else float("nan")
+        worse = fps < 1 - tolerance or latency > 1 + tolerance or result["dropped"] > base["dropped"]
+        slower |= worse
+        print(f"{result['gui']:<6} {result['rate']:>6} Hz {result['channels']:>4} ch  "
+              f"fps {fps:5.2f}x  p99 {latency:5.2f}x  dropped {base['dropped']} -> {result['dropped']}"
+              f"{'  SLOWER' if worse else ''}")
+    return slower
+
+
+def main():
+    parser = argparse.ArgumentParser(description="serial to pixel benchmark of the GUIs")
+    parser.add_argument("--gui", choices=("daq", "serial", "both"), default="both")
+    parser.add_argument("--rates", default="20,100,500,2000", help="frames per second, comma separated")
+    parser.add_argument("--channels", default="16,64", help="channels per frame, comma separated")
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds per run")
+    parser.add_argument("--output", default="pipeline.json")
+    parser.add_argument("--baseline", default=None, help="earlier output to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="allowed fps / p99 change against the baseline")
+    args = parser.parse_args()
+
+    sweep = [(int(rate), int(channels)) for channels in args.channels.split(",") for rate in args.rates.split(",")]
+
+    results = []
+    if args.gui in ("daq", "both"):
+        results += bench_daq(sweep, args.duration)
+    if args.gui in ("serial", "both"):
+        results += bench_serial(sweep, args.duration)
+
+    output = {
+        "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "matplotlib": matplotlib.__version__,
+        "duration": args.duration,
+        "runs": results,
+    }
+    with open(args.output, "w") as file:
+        json.dump(output, file, indent=2)
+    print(f"\nsaved {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        if compare(results, baseline, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+# SARP OTV DAQ GUI
+#
+# throughput of the SD log loader
+#
+#   python benchmarks/bench_sdlog.py [size in GB] [log.txt]
+#
+# with no log given a synthetic one of the requested size (default 2 GB) is
+# written to a temporary file, using the fprintf formats of the sensors'
+# sample_log. the old readlines based get_data is timed on a slice of the log
+# only, it needs several times the file size in memory. load_log parses text
+# about 3x as fast as the old loader with pandas installed, 1.2x without, the
+# opening through the cache that follows is where most of the time is saved
+
+import os
+import sys
+import random
+import shutil
+import tempfile
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from sdlog import load_log, load_cached, cache_path
+
+
+# sensor, fprintf format, log period in ms (DAQ_Firmware/main.cpp)
+SENSORS = [(name, "\"%s\", %f, %d, %d\n", 90) for name in ["RTD0", "RTD1", "RTD2", "RTD3"]] + \
+          [(name, "\"%s\", %f, %f, %d\n", 20) for name in ["HBTT", "FTPT", "OBPT", "OBTT", "HBPT", "OVPT", "OMPT", "PCPT", "FRMPT"]] + \
+          [("FM1", "\"%s\", %f, %d, %d\n", 100), ("LC1", "\"%s\", %f, %f, %d\n", 100)]
+
+BASELINE_BYTES = 200 << 20
+
+
+def synthetic_block(start_ms, duration_ms):
+    """Log lines of every sensor for duration_ms, interleaved by time."""
+    lines = []
+    for ms in range(start_ms, start_ms + duration_ms):
+        for name, fmt, period in SENSORS:
+            if ms % period == 0:
+                raw = random.randint(0, 65535) if "%d, %d" in fmt else random.random()
+                lines.append((fmt % (name, random.uniform(-100, 5000), raw, ms)).encode())
+    return b''.join(lines)
+
+
+def write_log(path, size):
+    random.seed(0)
+    block = synthetic_block(0, 60000)
+
+    # one minute of logging repeated up to the size, the timestamps repeat too
+    # but the loader does not care about their order
+    with open(path, 'wb') as file:
+        for _ in range(-(-size // len(block))):
+            file.write(block)
+
+
+def old_get_data(filename, limit):
+    """get_data as analyze.py had it, on the first `limit` bytes."""
+    data = {}
+
+    with open(filename, 'r') as file:
+        lines = file.readlines(limit)
+
+    start_time = int(lines[0].strip().split(",")[3].strip())
+
+    for line in lines:
+        set = line.strip().split(",")
+        key = set[0][1:-1]
+        if key not in data:
+            data[key] = {"X": [], "Y": []}
+
+        data[key]["Y"].append(float(set[1].strip()))
+        data[key]["X"].append(int(set[3].strip()) - start_time)
+    return data
+
+
+def main():
+    size = int(float(sys.argv[1]) * (1 << 30)) if len(sys.argv) > 1 else 2 << 30
+
+    temp = None
+    if len(sys.argv) > 2:
+        path = sys.argv[2]
+    else:
+        temp = tempfile.NamedTemporaryFile(suffix=".txt", delete=False)
+        temp.close()
+        path = temp.name
+        print(f"writing {size / (1 << 20):.0f} MB synthetic log to {path}")
+        write_log(path, size)
+
+    try:
+        total = os.path.getsize(path)
+
+        start = time.perf_counter()
+        old = old_get_data(path, min(BASELINE_BYTES, total))
+        elapsed = time.perf_counter() - start
+        base = min(BASELINE_BYTES, total) / (1 << 20) / elapsed
+        print(f"old get_data  {min(BASELINE_BYTES, total) / (1 << 20):8.0f} MB  {elapsed:7.2f} s  {base:7.1f} MB/s")
+        del old
+
+        start = time.perf_counter()
+        data = load_log(path)
+        elapsed = time.perf_counter() - start
+        rate = total / (1 << 20) / elapsed
+        print(f"load_log      {total / (1 << 20):8.0f} MB  {elapsed:7.2f} s  {rate:7.1f} MB/s  ({rate / base:.1f}x)")
+
+        sensors = len(data)
+        samples = sum(len(sensor["X"]) for sensor in data.values())
+        del data
+
+        # the first open parses and writes the cache, later ones memory map it
+        shutil.rmtree(cache_path(path), ignore_errors=True)
+        for label in ["load_cached", "  cached"]:
+            start = time.perf_counter()
+            data = load_cached(path)
+            elapsed = time.perf_counter() - start
+            rate = total / (1 << 20) / elapsed
+            print(f"{label:<13} {total / (1 << 20):8.0f} MB  {elapsed:7.2f} s  {rate:7.1f} MB/s  ({rate / base:.1f}x)")
+            del data
+
+        print(f"\n{sensors} sensors, {samples} samples")
+    finally:
+        shutil.rmtree(cache_path(path), ignore_errors=True)
+        if temp is not None:
+            os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+# SARP OTV DAQ GUI
+#
+# microbenchmark of FrameDecoder against json.loads
+#
+#   python benchmarks/bench_telemetry.py [capture.txt]
+#
+# with no capture file the frames are synthesized with the same printf formats
+# DAQ_Firmware/main.cpp uses. a capture is any text file of raw serial lines,
+# log lines and partial frames in it are skipped
+
+import os
+import sys
+import json
+import random
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from telemetry import FrameDecoder, chart_columns
+
+
+# same as main.py, which builds the GUI on import
+CHARTS = ["HBPT", "OBPT", "OVPT", "RTD0",
+          "HBTT", "OBTT", "FTPT", "RTD1",
+          "OMPT", "PCPT", "FRMPT", "RTD2",
+          "F MFR", "OX MFR", "LC1", "RTD3"]
+
+RTDS = ["RTD0", "RTD1", "RTD2", "RTD3"]
+ADCS = ["HBTT", "FTPT", "OBPT", "OBTT", "HBPT", "OVPT", "OMPT", "PCPT", "FRMPT"]
+
+
+def firmware_frame(ms, seq=0):
+    """One telemetry line, formatted the way the firmware prints it."""
+    out = "{\"seq\" : %d, " % seq
+    for name in RTDS:
+        out += "\"%s\" : [%d, %f, %d], " % (name, ms, random.uniform(-80, 160), random.randint(0, 65535))
+    for name in ADCS:
+        out += "\"%s\" : [%d, %f, %f], " % (name, ms, random.uniform(-100, 5000), random.random())
+    out += "\"OX MFR\" : [%d, %f], " % (ms, random.uniform(0, 150))
+    out += "\"F MFR\" : [%d, %f], " % (ms, random.uniform(0, 100))
+    out += "\"%s\" : [%d, %f, %f], " % ("LC1", ms, random.uniform(-200, 5000), random.random())
+    out += "\"actuators\" : [%d, %d, %d, %d, %d, %d, %d, %d]" % tuple(random.randint(0, 1) for _ in range(8))
+    out += "}"
+    return out.encode()
+
+
+def load_capture(path):
+    frames = []
+    with open(path, 'rb') as file:
+        for line in file:
+            line = line.strip()
+            try:
+                if isinstance(json.loads(line), dict):
+                    frames.append(line)
+            except ValueError:
+                pass
+    return frames
+
+
+def timed(name, frames, func, baseline=None):
+    start = time.perf_counter()
+    for line in frames:
+        func(line)
+    per_frame = (time.perf_counter() - start) / len(frames) * 1e6
+
+    speedup = "" if baseline is None else f"  ({baseline / per_frame:.2f}x)"
+    print(f"{name:<34} {per_frame:8.2f} us/frame{speedup}")
+    return per_frame
+
+
+def main():
+    if len(sys.argv) > 1:
+        frames = load_capture(sys.argv[1])
+    else:
+        random.seed(0)
+        frames = [firmware_frame(20 * i, i) for i in range(50000)]
+    print(f"{len(frames)} frames, {sum(map(len, frames)) / len(frames):.0f} bytes each\n")
+
+    # what serial_rx used to do with every frame
+    def json_charts(line):
+        parsed = json.loads(line)
+        out = []
+        for chart in CHARTS:
+            out.append((parsed[chart][0] / 1000, parsed[chart][1]))
+        return out, parsed["actuators"]
+
+    decoder = FrameDecoder()
+    decoder.decode(frames[0])
+    _, x_columns, y_columns, _ = chart_columns(decoder, CHARTS)
+
+    def decoder_charts(line):
+        decoder.decode(line)
+        return decoder.values[x_columns] / 1000, decoder.values[y_columns], decoder.get("actuators")
+
+    base = timed("json.loads", frames, json.loads)
+    timed("FrameDecoder.decode", frames, decoder.decode, base)
+    print()
+    base = timed("json.loads + chart values", frames, json_charts)
+    timed("FrameDecoder + chart columns", frames, decoder_charts, base)
+
+    print(f"\n{decoder.fast} fast path, {decoder.slow} json fallback")
+
+
+if __name__ == "__main__":
+    main()
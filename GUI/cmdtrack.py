@@ -0,0 +1,231 @@
+# SARP OTV DAQ GUI
+#
+# command round trip tracking
+#
+# every command written to the port is timestamped, then matched against what
+# comes back from the DAQ: the echo of the command ("log: recieved: ..." from
+# the OTV DAQ, {"received":"..."} from the Capstone controller) and, for
+# commands that set the actuators, the first telemetry frame that shows the
+# new states. both latencies are kept in histograms
+
+import csv
+import json
+import os
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+
+ACK   = "ack"   # command echoed back by the DAQ
+STATE = "state" # telemetry shows the commanded actuator states
+KINDS = (ACK, STATE)
+
+# histogram bin edges in seconds, log spaced from 0.1 ms to 10 s
+HISTOGRAM_BINS = np.logspace(-4, 1, 51)
+
+
+def command_key(data):
+    """Text the DAQ echoes back for a command, what is inside the braces."""
+    if isinstance(data, bytes):
+        data = data.decode('utf-8', errors='replace')
+    text = data.strip()
+    if text.startswith("{") and text.endswith("}"):
+        text = text[1:-1]
+    return text
+
+
+def solenoid_states(data):
+    """Actuator states a direct solenoid command ({S01000000}) asks for, or None."""
+    key = command_key(data)
+    if len(key) == 9 and key[0] == "S" and set(key[1:]) <= {"0", "1"}:
+        return tuple(int(c) for c in key[1:])
+    return None
+
+
+def parse_ack(line):
+    """Command text acknowledged by a received line, or None if it is no ack."""
+    if isinstance(line, bytes):
+        line = line.decode('utf-8', errors='replace')
+
+    if "recieved: " in line:
+        text = line.split("recieved: ", 1)[1]
+    elif '"received"' in line:
+        try:
+            text = json.loads(line)["received"]
+        except (ValueError, KeyError, TypeError):
+            return None
+    else:
+        return None
+
+    # heartbeats are echoed too, with nothing in them
+    text = text.strip()
+    return text or None
+
+
+class LatencyHistogram:
+    """Latencies of one kind, in seconds.
+
+    Counts go into fixed log spaced bins for export, the samples are kept
+    as well so percentiles are exact (there are only so many commands in a
+    test).
+    """
+
+    def __init__(self, bins=HISTOGRAM_BINS):
+        self.bins = bins
+        self.counts = np.zeros(len(bins) + 1, dtype=np.int64) # first and last catch out of range
+        self.samples = []
+
+    def add(self, latency):
+        self.counts[np.searchsorted(self.bins, latency, side="right")] += 1
+        self.samples.append(latency)
+
+    def __len__(self):
+        return len(self.samples)
+
+    def percentile(self, q):
+        return float(np.percentile(self.samples, q)) if self.samples else float("nan")
+
+    def max(self):
+        return max(self.samples) if self.samples else float("nan")
+
+    def summary(self):
+        if not self.samples:
+            return "none"
+        return (f"p50 {self.percentile(50) * 1000:.1f} ms, p99 {self.percentile(99) * 1000:.1f} ms, "
+                f"max {self.max() * 1000:.1f} ms ({len(self.samples)})")
+
+
+class CommandTracker:
+    """Matches commands sent to the DAQ with their acknowledgements.
+
+    `sent()` is meant as the TxEngine `on_write` hook, `received()` takes
+    every text line from the DAQ and `states()` the actuator states of every
+    telemetry frame, all three may be called from different threads. An
+    echo matches the oldest unacknowledged command with the same text, or
+    one that starts with it (the firmware cuts long log lines short).
+    `expected_state(data)` gives the actuator states a command should lead
+    to, or None for commands that are only acknowledged.
+    """
+
+    def __init__(self, timeout=5.0, expected_state=solenoid_states):
+        self.timeout = timeout
+        self.expected_state = expected_state
+
+        self.records = []       # every command, in the order it was sent
+        self.pending = deque()  # records still waiting on an ack or state
+        self.histograms = {kind: LatencyHistogram() for kind in KINDS}
+        self.timeouts = 0
+        self.lock = threading.Lock()
+
+        self._awaiting_state = 0
+
+    def sent(self, data, queued=0.0):
+        """Timestamps a command that was just written to the port."""
+        expect = self.expected_state(data) if self.expected_state else None
+        record = {
+            "time": time.time(),
+            "sent": time.monotonic(),
+            "command": command_key(data),
+            "queue": queued,
+            "expect": expect,
+            ACK: None,
+            STATE: None,
+        }
+
+        with self.lock:
+            self._expire(record["sent"])
+            self.records.append(record)
+            self.pending.append(record)
+            if expect is not None:
+                self._awaiting_state += 1
+
+    def received(self, line):
+        """Matches an echoed command, returns True if the line was an ack of one."""
+        text = parse_ack(line)
+        if text is None:
+            return False
+
+        now = time.monotonic()
+        with self.lock:
+            for record in self.pending:
+                if record[ACK] is None and record["command"].startswith(text):
+                    self._done(record, ACK, now)
+                    return True
+        return False
+
+    def states(self, states):
+        """Matches commands waiting on the actuators to reach the given states."""
+        if not self._awaiting_state:
+            return
+
+        now = time.monotonic()
+        states = tuple(int(s) for s in states)
+        with self.lock:
+            for record in self.pending:
+                if record[STATE] is None and record["expect"] == states:
+                    self._done(record, STATE, now)
+                    self._awaiting_state -= 1
+
+    def _done(self, record, kind, now):
+        latency = now - record["sent"]
+        record[kind] = latency
+        self.histograms[kind].add(latency)
+
+    def _expire(self, now):
+        # drop records that got everything they wait for, or waited too long
+        while self.pending:
+            record = self.pending[0]
+            complete = record[ACK] is not None and (record["expect"] is None or record[STATE] is not None)
+            if not complete and now - record["sent"] < self.timeout:
+                break
+
+            self.pending.popleft()
+            if not complete:
+                self.timeouts += 1
+                if record["expect"] is not None and record[STATE] is None:
+                    self._awaiting_state -= 1
+
+    def status(self):
+        """One line for the GUI."""
+        with self.lock:
+            acks = self.histograms[ACK]
+            if not len(acks):
+                return "Cmd RTT: -"
+            return (f"Cmd RTT p50 {acks.percentile(50) * 1000:.0f} / p99 {acks.percentile(99) * 1000:.0f} / "
+                    f"max {acks.max() * 1000:.0f} ms")
+
+    def summary(self):
+        with self.lock:
+            self._expire(time.monotonic())
+            return (f"{len(self.records)} commands, ack {self.histograms[ACK].summary()}, "
+                    f"state {self.histograms[STATE].summary()}, {self.timeouts} timed out")
+
+    def export(self, filename):
+        """Writes every command to a CSV file and the histograms next to it.
+
+        The histograms go to <name>_histogram.csv, one row per bin with its
+        lower edge in ms and the count of each kind.
+        """
+        with self.lock:
+            records = list(self.records)
+            counts = {kind: self.histograms[kind].counts.copy() for kind in KINDS}
+
+        def ms(value):
+            return "" if value is None else f"{value * 1000:.3f}"
+
+        with open(filename, "w", newline="") as file:
+            writer = csv.writer(file)
+            writer.writerow(["time", "command", "queue_ms", "ack_ms", "state_ms"])
+            for record in records:
+                writer.writerow([f"{record['time']:.3f}", record["command"],
+                                 ms(record["queue"]), ms(record[ACK]), ms(record[STATE])])
+
+        root, ext = os.path.splitext(filename)
+        edges = np.concatenate(([0.0], HISTOGRAM_BINS))
+        with open(f"{root}_histogram{ext or '.csv'}", "w", newline="") as file:
+            writer = csv.writer(file)
+            writer.writerow(["from_ms"] + [f"{kind}_count" for kind in KINDS])
+            for i, edge in enumerate(edges):
+                writer.writerow([f"{edge * 1000:g}"] + [int(counts[kind][i]) for kind in KINDS])
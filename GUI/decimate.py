@@ -0,0 +1,106 @@
+# SARP OTV DAQ GUI
+#
+# min/max decimation between the chart history and the Line2D objects
+
+import numpy as np
+
+from ringbuffer import ChannelStore
+
+
+def envelope(x, y, bucket):
+    """Reduces whole buckets of `bucket` samples to their min and max points.
+
+    The two points of each bucket are kept in the order they occurred so the
+    decimated line still runs forward in time. len(x) must be a multiple of
+    `bucket`.
+    """
+    xs = x.reshape(-1, bucket)
+    ys = y.reshape(-1, bucket)
+
+    # NaN samples are breaks for lost frames. argmin / argmax would pick them,
+    # so they are skipped there, and a bucket with a break ends in one instead
+    # of its second point
+    gaps = np.isnan(ys)
+    broken = gaps.any(axis=1)
+    if broken.any():
+        lo = np.where(gaps, np.inf, ys).argmin(axis=1)
+        hi = np.where(gaps, -np.inf, ys).argmax(axis=1)
+    else:
+        lo = ys.argmin(axis=1)
+        hi = ys.argmax(axis=1)
+    first = np.minimum(lo, hi)
+    second = np.maximum(lo, hi)
+
+    rows = np.arange(len(ys))
+    out_x = np.empty(2 * len(ys))
+    out_y = np.empty(2 * len(ys))
+    out_x[0::2] = xs[rows, first]
+    out_x[1::2] = xs[rows, second]
+    out_y[0::2] = ys[rows, first]
+    out_y[1::2] = ys[rows, second]
+    if broken.any():
+        out_y[1::2][broken] = np.nan
+    return out_x, out_y
+
+
+class MinMaxDecimator:
+    """Cached min/max envelope of one ChannelStore channel.
+
+    The channel history is split into buckets sized so the whole window comes
+    out at about two points per pixel of axis width. Buckets are aligned on
+    absolute sample numbers, so a finished bucket never changes: it is reduced
+    once, kept in a small ring of its own, and only buckets completed since the
+    previous call (plus the partial one at the end) are computed on each frame.
+    """
+
+    def __init__(self, store, channel):
+        self.store = store
+        self.channel = channel
+
+        self.bucket  = 0    # samples per bucket
+        self.done    = 0    # absolute sample number the cache is complete up to
+        self.buckets = None # reduced points of completed buckets
+
+    def reset(self, bucket):
+        """Drops the cache and starts over with a new bucket size."""
+        self.bucket = bucket
+        self.done = 0
+
+        # one spare bucket so a window that is not bucket aligned stays covered
+        count = -(-self.store.capacity // bucket) + 1
+        self.buckets = ChannelStore(1, 2 * count)
+
+    def series(self, pixels):
+        """Returns (x, y) to draw for an axis `pixels` wide."""
+        x, y, total = self.store.snapshot(self.channel)
+
+        bucket = -(-self.store.capacity // max(int(pixels), 1))
+        if bucket <= 2: # two points per bucket would not reduce anything
+            return x, y
+
+        if bucket != self.bucket or total < self.done:
+            self.reset(bucket)
+
+        first = total - len(x)
+        start = max(self.done, -(-first // bucket) * bucket)
+        end = (total // bucket) * bucket
+
+        if end > start:
+            bx, by = envelope(x[start - first:end - first], y[start - first:end - first], bucket)
+            self.buckets.extend(0, bx, by)
+            self.done = end
+
+        # the cache can still hold buckets from before the window, only the
+        # ones from its first aligned bucket on are drawn
+        cached_x, cached_y = self.buckets.view(0)
+        keep = 2 * (max(end - -(-first // bucket) * bucket, 0) // bucket)
+        cached_x = cached_x[len(cached_x) - keep:]
+        cached_y = cached_y[len(cached_y) - keep:]
+
+        # the bucket still filling up is reduced on every call
+        tail = max(end, first) - first
+        if tail >= len(x):
+            return cached_x, cached_y
+
+        tail_x, tail_y = envelope(x[tail:], y[tail:], len(x) - tail)
+        return np.concatenate((cached_x, tail_x)), np.concatenate((cached_y, tail_y))
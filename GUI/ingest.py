@@ -0,0 +1,314 @@
+# SARP OTV DAQ GUI
+#
+# optional multiprocess ingest. a child process owns the serial port, reads
+# and decodes telemetry, and publishes samples to the GUI over shared memory
+
+import multiprocessing as mp
+from multiprocessing import shared_memory
+import queue
+import threading
+import time
+
+import numpy as np
+import serial
+
+from telemetry import FrameDecoder, BinaryFrameReader, chart_columns, binary_columns, actuator_bits
+from txengine import TxEngine
+from cmdtrack import CommandTracker
+from session import SessionRecorder
+from perfmon import PerfMonitor, READ, PARSE, STORE
+from seqtrack import SequenceTracker, DUPLICATE, insert_breaks
+
+
+# samples the shared ring can hold before the GUI falls behind and loses data
+RING_CAPACITY = 1 << 16
+
+# header slots, stored as int64 in front of the sample records
+WRITE_COUNT = 0
+ACTUATORS   = 1 # 8 slots
+FRAMES      = 9
+WRITE_END   = 10 # write count once the batch being written is in
+HEADER_SIZE = 16
+
+
+class SampleRing:
+    """Single producer, single consumer ring of (channel, x, y) samples.
+
+    Lives in a named shared memory block so the ingest process can write while
+    the GUI reads. The writer fills the records first and only then advances
+    the write count, so a reader never sees a half written sample. Before it
+    starts on a batch it announces where the batch ends, so a reader that
+    fell a whole ring behind can tell which of the records it copied the
+    writer may have overwritten meanwhile.
+    """
+
+    def __init__(self, capacity=RING_CAPACITY, name=None):
+        size = HEADER_SIZE * 8 + capacity * 3 * 8
+        self.owner = name is None
+        self.shm = shared_memory.SharedMemory(name=name, create=self.owner, size=size)
+        self.capacity = capacity
+
+        self.header = np.ndarray((HEADER_SIZE,), dtype=np.int64, buffer=self.shm.buf)
+        self.records = np.ndarray((capacity, 3), dtype=np.float64, buffer=self.shm.buf, offset=HEADER_SIZE * 8)
+        if self.owner:
+            self.header[:] = 0
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def write(self, rows, actuators=None):
+        """Publishes a batch of (channel, x, y) rows and the latest actuator states."""
+        count = int(self.header[WRITE_COUNT])
+        n = len(rows)
+        self.header[WRITE_END] = count + n
+        if n:
+            slots = (count + np.arange(n)) % self.capacity
+            self.records[slots] = rows
+
+        if actuators is not None:
+            self.header[ACTUATORS:ACTUATORS + 8] = actuators
+            self.header[FRAMES] += 1
+
+        self.header[WRITE_COUNT] = count + n
+
+    def read(self, since):
+        """Returns (rows, count, lost) for everything written after `since`.
+
+        `lost` is the number of samples overwritten before they were read.
+        """
+        count = int(self.header[WRITE_COUNT])
+        lost = max(count - since - self.capacity, 0)
+        start = since + lost
+
+        slots = np.arange(start, count) % self.capacity
+        rows = self.records[slots]
+
+        # records the writer got to while they were copied are not theirs anymore
+        overrun = min(max(int(self.header[WRITE_END]) - self.capacity - start, 0), len(rows))
+        return rows[overrun:], count, lost + overrun
+
+    def actuators(self):
+        return [int(v) for v in self.header[ACTUATORS:ACTUATORS + 8]]
+
+    def close(self):
+        # views into the buffer have to go before it can be closed
+        del self.header
+        del self.records
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+def forward_commands(tx_queue, tx, stop):
+    """Hands commands from the GUI process to the transmit engine."""
+    while not stop.is_set():
+        try:
+            tx.send(tx_queue.get(timeout=0.1))
+        except queue.Empty:
+            continue
+
+
+def run_ingest(port, baudrate, charts, ring_name, capacity, tx_queue, stop, command_log=None, session_dir=None, perf_log=None):
+    """Child process entry, reads the port until `stop` is set."""
+    ring = SampleRing(capacity, ring_name)
+    ser = serial.Serial(port, baudrate, timeout=0.05)
+
+    # writes happen on their own thread, so reads never delay them
+    recorder = SessionRecorder.create(session_dir, charts) if session_dir else None
+    if recorder is not None:
+        print(f"Recording to {recorder.filename}")
+
+    tx = TxEngine()
+    tracker = CommandTracker()
+    def on_write(data, latency):
+        tracker.sent(data, latency)
+        if recorder is not None:
+            recorder.command(data)
+    tx.on_write = on_write
+    tx.attach(ser)
+    tx.start()
+    forward = threading.Thread(target=forward_commands, args=(tx_queue, tx, stop), daemon=True)
+    forward.start()
+
+    sequence = SequenceTracker()
+    perf = PerfMonitor(perf_log)
+    perf.watch("tx queue", tx.queue.qsize)
+    perf.watch("lost frames", lambda: sequence.lost)
+    perf.watch("corrupt frames", lambda: sequence.corrupt)
+    perf.start()
+
+    decoder = FrameDecoder(charts)
+    reader = BinaryFrameReader()
+    layout = None
+    corrupt = 0
+    binary_index, binary_channels = binary_columns(charts)
+
+    try:
+        while not stop.is_set():
+            waiting = ser.in_waiting
+            perf.gauge("port backlog", waiting)
+            start = time.perf_counter()
+            data = ser.read(waiting or 1)
+            if not data:
+                continue
+            start = perf.span(READ, start) if waiting else time.perf_counter()
+            perf.count("bytes", len(data))
+
+            frames, lines = reader.feed(data)
+            if reader.corrupt != corrupt:
+                sequence.corrupted(reader.corrupt - corrupt)
+                corrupt = reader.corrupt
+            rows = []
+            actuators = None
+
+            if len(frames):
+                perf.count("frames", len(frames))
+
+                # charts break where frames went missing, repeats are left out
+                lost = sequence.frames(frames["seq"])
+                fresh = lost != DUPLICATE
+                for i, channel in zip(binary_index, binary_channels):
+                    x, y = insert_breaks(frames["data"]["ms"][fresh, channel] / 1000,
+                                         frames["data"]["value"][fresh, channel], lost[fresh])
+                    rows.append(np.column_stack((np.full(len(x), i), x, y)))
+                actuators = actuator_bits(frames[-1])
+                if recorder is not None:
+                    recorder.binary(frames, binary_index, binary_channels)
+
+            for line in lines:
+                line = line.strip()
+
+                if not line:
+                    continue
+                perf.count("lines")
+                if line.startswith(b"log: "):
+                    line = line.decode('utf-8', errors='replace')
+                    tracker.received(line)
+                    if recorder is not None:
+                        recorder.log(line)
+                    if not (("recieved" in line) or ("UH OH" in line)):
+                        print(line)
+                    continue
+
+                try:
+                    decoder.decode(line)
+                except ValueError:
+                    perf.count("parse errors")
+                    # binary frames are counted by their CRC, a bad line is not a frame there
+                    if not reader.binary:
+                        sequence.corrupted()
+                    line = line.decode('utf-8', errors='replace')
+                    print(line[line.find("log")::])
+                    continue
+
+                if decoder.layout != layout:
+                    layout = decoder.layout
+                    chart_index, x_columns, y_columns, missing = chart_columns(decoder, charts)
+                    for chart in missing:
+                        print("Chart Failure |", chart)
+
+                seq = int(decoder.get("seq")) if "seq" in decoder else None
+                lost = sequence.frame(seq) if seq is not None else 0
+                if lost == DUPLICATE:
+                    continue
+
+                xs = decoder.values[x_columns] / 1000
+                if lost:
+                    # the charts break where frames went missing
+                    rows.append(np.column_stack((chart_index, xs, np.full(len(chart_index), np.nan))))
+                rows.append(np.column_stack((chart_index, xs, decoder.values[y_columns])))
+                if "actuators" in decoder:
+                    # a copy, the decoder's values are overwritten by the next frame
+                    actuators = decoder.get("actuators").tolist()
+                if recorder is not None:
+                    recorder.decoded(decoder, chart_index, x_columns, y_columns, actuators, seq or 0)
+                perf.count("frames")
+
+            # parsing is everything up to handing the samples to the GUI
+            start = perf.span(PARSE, start)
+            if actuators is not None:
+                tracker.states(actuators)
+            if rows or actuators is not None:
+                ring.write(np.concatenate(rows) if rows else np.zeros((0, 3)), actuators)
+                perf.span(STORE, start)
+    except Exception as e:
+        print(f"Ingest error | {e}")
+    finally:
+        perf.stop()
+        tx.detach()
+        tx.stop()
+        forward.join(timeout=1.0)
+        print(f"Ingest TX | {tx.latency.summary()}")
+        print(f"Ingest commands | {tracker.summary()}")
+        print(f"Ingest sequence | {sequence.summary()}")
+        if command_log and tracker.records:
+            tracker.export(command_log)
+        ser.close()
+        ring.close()
+        if recorder is not None:
+            recorder.close()
+
+
+class IngestProcess:
+    """GUI side handle of an ingest child process.
+
+    Stands in for the serial.Serial object while connected: commands put on
+    `tx_queue` are written by the child's transmit engine, which also sends
+    the heartbeats. Their round trip latencies are tracked in the child and
+    written to `command_log` when it stops. With a `session_dir` the child
+    also records the session, with a `perf_log` it writes its pipeline
+    timing there.
+    """
+
+    def __init__(self, port, baudrate, charts, tx_queue, command_log=None, session_dir=None, perf_log=None, capacity=RING_CAPACITY):
+        ctx = mp.get_context("spawn")
+
+        self.port = port
+        self.ring = SampleRing(capacity)
+        self.stop = ctx.Event()
+        self.read_count = 0
+        self.lost = 0
+
+        self.process = ctx.Process(
+            target=run_ingest,
+            args=(port, baudrate, list(charts), self.ring.name, capacity, tx_queue, self.stop, command_log, session_dir, perf_log),
+            daemon=True,
+        )
+        self.process.start()
+
+    def drain(self, store):
+        """Moves every published sample into a ChannelStore.
+
+        Returns the latest actuator states, or None if no frame arrived yet.
+        """
+        rows, self.read_count, lost = self.ring.read(self.read_count)
+        if lost:
+            self.lost += lost
+            print(f"Ingest overrun | {lost} samples lost")
+
+        if len(rows):
+            channels = rows[:, 0].astype(np.int64)
+            for channel in np.unique(channels):
+                mask = channels == channel
+                x, y = rows[mask, 1], rows[mask, 2]
+                if lost:
+                    # the charts break where the overrun lost samples
+                    x, y = np.insert(x, 0, x[0]), np.insert(y, 0, np.nan)
+                store.extend(int(channel), x, y)
+
+        if self.ring.header[FRAMES] == 0:
+            return None
+        return self.ring.actuators()
+
+    def close(self):
+        self.stop.set()
+        self.process.join(timeout=1.0)
+        if self.process.is_alive():
+            self.process.terminate()
+        self.ring.close()
+
+
+def new_tx_queue():
+    """Command queue that can be handed to an ingest process."""
+    return mp.get_context("spawn").Queue()
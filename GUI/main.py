@@ -4,6 +4,7 @@
 #
 # implements GUI over the serial output layer from the DAQ
 
+import numpy as np
 import matplotlib
 import matplotlib.pyplot as plt
 from matplotlib.widgets import Button
@@ -15,6 +16,7 @@ from matplotlib.backends.backend_qt5agg import NavigationToolbar2QT as Navigatio
 from PyQt6.QtGui import QIcon
 from PyQt6.QtWidgets import QApplication, QMainWindow, QWidget, QHBoxLayout, QVBoxLayout, QLineEdit, QLabel, QSpinBox
 
+import os
 import sys
 import time
 import serial
@@ -24,6 +26,18 @@ from threading import Thread
 from datetime import datetime
 from functools import partial
 
+from ringbuffer import ChannelStore
+from txengine import TxEngine
+from cmdtrack import CommandTracker
+from session import SessionRecorder
+from replay import ReplaySerial
+from perfmon import PerfMonitor, READ, PARSE, STORE, RENDER
+from seqtrack import SequenceTracker, DUPLICATE, insert_breaks
+from decimate import MinMaxDecimator
+from telemetry import FrameDecoder, BinaryFrameReader
+import telemetry
+import ingest
+
 
 # Configuration
 
@@ -84,9 +98,58 @@ BUTTONS          = ["Mount", "Eject", "Fire", "Abort", "Pulse OX", "Pulse HE", "
 ACTUATOR_INDEX   = 7
 ACTUATOR_NORMALS = [0, 0, 0, 1, 0, 0, 0, 1]
 
+# number of samples kept (and shown) per chart. charts are decimated to about
+# two points per pixel, so the window costs the same to draw at any length
+HISTORY_LENGTH = 30000
+
+# extra ring slots past the history, binary frames are extended in batches of
+# up to this many and the views update() draws from stay intact meanwhile
+HISTORY_GUARD = 4096
+
+# read and decode serial in a separate process, the GUI process then only
+# renders. when False the serial_rx thread and the transmit engine are used
+INGEST_PROCESS = False
+
+# ask the DAQ for compact binary telemetry frames ({B1}) when connecting
+# instead of the JSON text lines
+BINARY_TELEMETRY = False
+
+# every command and its round trip latencies are written here on exit, the
+# latency histograms next to it (commands_histogram.csv). None to disable
+COMMAND_LOG = "commands.csv"
+
+# every frame, command and log line of a connection is recorded to a session
+# file in here (see session.py). None to disable
+SESSION_DIR = "sessions"
+
+# pty of the virtual DAQ (simulator.py), listed with the ports while it runs
+SIMULATOR_PORT = "/tmp/ttyDAQ"
+
+# a session file (.ses) or SD card log.txt to replay, it shows up as the
+# "replay" port. REPLAY_SPEED 1 plays in real time, 0 as fast as possible.
+# while connected, "seek <s>" and "speed <x>" on the command line control it
+REPLAY_FILE  = None
+REPLAY_SPEED = 1.0
+REPLAY_PORT  = "replay"
+
+# time spent reading, parsing, storing and drawing telemetry, with line and
+# byte rates, is snapshot every PERF_INTERVAL seconds and appended here as
+# JSON lines (the "Perf" toolbar button shows the latest). the ingest process
+# writes its own next to it (perf_ingest.jsonl). None to keep it in memory
+PERF_LOG      = "perf.jsonl"
+PERF_INTERVAL = 1.0
+
 ser = None
 ser_lock = False
-tx_queue = queue.Queue()
+tx_queue = queue.Queue() # commands for the ingest process, when it owns the port
+tx = TxEngine()          # writes commands and heartbeats otherwise
+tracker = CommandTracker()
+sequence = SequenceTracker() # frame numbers of the current connection
+perf = PerfMonitor(PERF_LOG, PERF_INTERVAL)
+perf.watch("tx queue", tx.queue.qsize)
+perf.watch("lost frames", lambda: sequence.lost)
+perf.watch("corrupt frames", lambda: sequence.corrupt)
+recorder = None          # session of the current connection
 run_threads = True
 
 fire_time   = None
@@ -94,19 +157,24 @@ valve_delay = None
 pulse_time  = None   
 
 # =============== Setup MatPlotLib charts and buttons ===============
-matplotlib.use('QtAgg')
+# ingest child processes re-import this file as __mp_main__ when they are
+# spawned, they only need the parsing code so skip building the GUI there
+BUILD_GUI = __name__ != "__mp_main__"
+
+if BUILD_GUI:
+    matplotlib.use('QtAgg')
 
-# Create a separate figure for charts
-fig_charts = plt.figure(figsize=(12, 8))
-fig_charts.canvas.manager.set_window_title("SARP OTV DAQ - Charts")
-plt.get_current_fig_manager().window.setWindowIcon(QIcon("icon.png"))
-gs_plots = fig_charts.add_gridspec(4, 4, hspace=0.2)
+    # Create a separate figure for charts
+    fig_charts = plt.figure(figsize=(12, 8))
+    fig_charts.canvas.manager.set_window_title("SARP OTV DAQ - Charts")
+    plt.get_current_fig_manager().window.setWindowIcon(QIcon("icon.png"))
+    gs_plots = fig_charts.add_gridspec(4, 4, hspace=0.2)
 
-# Create a second figure for buttons
-fig_buttons = plt.figure(figsize=(3, 8))
-fig_buttons.canvas.manager.set_window_title("SARP OTV DAQ - Controls")
-plt.get_current_fig_manager().window.setWindowIcon(QIcon("icon.png"))
-gs_buttons = fig_buttons.add_gridspec(len(BUTTONS), 1, hspace=0.3)
+    # Create a second figure for buttons
+    fig_buttons = plt.figure(figsize=(3, 8))
+    fig_buttons.canvas.manager.set_window_title("SARP OTV DAQ - Controls")
+    plt.get_current_fig_manager().window.setWindowIcon(QIcon("icon.png"))
+    gs_buttons = fig_buttons.add_gridspec(len(BUTTONS), 1, hspace=0.3)
 
 
 
@@ -114,6 +182,21 @@ lines = []
 buttons = []
 actuator_states      = [0,0,0,0,0,0,0,0]
 
+def on_write(data, latency):
+    """Called by the transmit engine for every command it wrote."""
+    tracker.sent(data, latency)
+    if recorder is not None:
+        recorder.command(data)
+
+tx.on_write = on_write
+
+def send(data):
+    """Queues a command for the DAQ, abort commands go out first."""
+    if INGEST_PROCESS:
+        tx_queue.put(data)
+    else:
+        tx.send(data)
+
 # button callback
 def on_button_clicked(index, _event):
     print("Button Clicked: ", index)
@@ -123,25 +206,25 @@ def on_button_clicked(index, _event):
 
     if index == 0:
         print("Mounting at /sd/log.txt")
-        tx_queue.put(b"{DM/sd/log.txt}\n")
+        send(b"{DM/sd/log.txt}\n")
     elif index == 1:
         print("ejecting")
-        tx_queue.put(b"{DE}\n")
+        send(b"{DE}\n")
     elif index == 2:
         print("Firing")
-        tx_queue.put(f"{{CFI{fire_time.value()},{valve_delay.value()}}}\n".encode())
+        send(f"{{CFI{fire_time.value()},{valve_delay.value()}}}\n".encode())
     elif index == 3:
         print("Aborting")
-        tx_queue.put(b"{CAB}\n")
+        send(b"{CAB}\n")
     elif index == 4:
         print("Pulsing Ox")
-        tx_queue.put(f"{{COP{pulse_time.value()}}}\n".encode())
+        send(f"{{COP{pulse_time.value()}}}\n".encode())
     elif index == 5:
         print("Pulsing HE")
-        tx_queue.put(f"{{CHP{pulse_time.value()}}}\n".encode())
+        send(f"{{CHP{pulse_time.value()}}}\n".encode())
     elif index == 6:
         print("Pulsing Fuel")
-        tx_queue.put(f"{{CFP{pulse_time.value()}}}\n".encode())
+        send(f"{{CFP{pulse_time.value()}}}\n".encode())
     elif index >= 7:
         print("Toggling Actuator")
         
@@ -154,165 +237,277 @@ def on_button_clicked(index, _event):
         cmd_str = "{S" + state_str + "}\n"
         cmd_bytes = cmd_str.encode('utf-8')
 
-        tx_queue.put(cmd_bytes)
+        send(cmd_bytes)
         
 
-data_x = []
-data_y = []
-
-for chart in CHARTS:
-    data_x.append([])
-    data_y.append([])
+history = ChannelStore(len(CHARTS), HISTORY_LENGTH, guard=HISTORY_GUARD)
+decimators = [MinMaxDecimator(history, i) for i in range(len(CHARTS))]
 
 
 texts = []
 axs = []
 plot_index = 0
 
-for row in range(4):
-    for col in range(4):
-        ax = fig_charts.add_subplot(gs_plots[row, col])
-        ax.set_ylim(y_scale[plot_index][0], y_scale[plot_index][1])
-        ax.set_xlim(0, 20)
-        ax.set_title(TITLES[plot_index])
-        ax.autoscale(False)
-        ax.set_autoscale_on(False)
-        ax.set_xticklabels([])
-
-        line, = ax.plot(0, 0)
-        line.set_animated(True)
-        lines.append(line)
-
-        text = ax.text(0.95, 0.95, '', transform=ax.transAxes,
-            ha='right', va='top', fontsize=8, color='red')
-        text.set_animated(True)
-        texts.append(text)
-
-        axs.append(ax)
-        plot_index += 1
-
-plt.tight_layout()
-
-
-for i, label in enumerate(BUTTONS):
-    ax_btn = fig_buttons.add_subplot(gs_buttons[i, 0])
-    btn = Button(ax_btn, label)
-    btn.on_clicked(partial(on_button_clicked, i))
-    buttons.append(btn)
+if BUILD_GUI:
+    for row in range(4):
+        for col in range(4):
+            ax = fig_charts.add_subplot(gs_plots[row, col])
+            ax.set_ylim(y_scale[plot_index][0], y_scale[plot_index][1])
+            ax.set_xlim(0, 20)
+            ax.set_title(TITLES[plot_index])
+            ax.autoscale(False)
+            ax.set_autoscale_on(False)
+            ax.set_xticklabels([])
+
+            line, = ax.plot(0, 0)
+            line.set_animated(True)
+            lines.append(line)
+
+            text = ax.text(0.95, 0.95, '', transform=ax.transAxes,
+                ha='right', va='top', fontsize=8, color='red')
+            text.set_animated(True)
+            texts.append(text)
+
+            axs.append(ax)
+            plot_index += 1
+
+    plt.tight_layout()
+
+
+    for i, label in enumerate(BUTTONS):
+        ax_btn = fig_buttons.add_subplot(gs_buttons[i, 0])
+        btn = Button(ax_btn, label)
+        btn.on_clicked(partial(on_button_clicked, i))
+        buttons.append(btn)
+
+# generation of each chart last drawn, and the actuator states last shown
+drawn_generation = [-1] * len(CHARTS)
+shown_actuators  = None
+
+def mark_all_dirty(_event=None):
+    """Forces every chart to be redrawn on the next frame.
+
+    A full canvas draw wipes the animated lines, so this is hooked to the
+    chart canvas' draw_event.
+    """
+    for i in range(len(drawn_generation)):
+        drawn_generation[i] = -1
+
+class DirtyAnimation(FuncAnimation):
+    """FuncAnimation that only clears and blits the axes update() returned.
+
+    The stock implementation restores the background of every axes drawn on
+    the previous frame before calling update(), so any chart left out of the
+    returned artists would be erased. Here axes are only touched when update()
+    hands back artists for them, and a frame with nothing new costs nothing.
+    """
+
+    def _draw_next_frame(self, framedata, blit):
+        start = time.perf_counter()
+        self._draw_frame(framedata)
+        if not self._drawn_artists:
+            return
+
+        # erase the old lines of the charts being redrawn. update() has already
+        # moved their limits, so the background is restored regardless of view
+        # and _blit_draw then recaches it for the new one
+        for ax in {a.axes for a in self._drawn_artists}:
+            if ax in self._blit_cache:
+                ax.figure.canvas.restore_region(self._blit_cache[ax][1])
+
+        self._post_draw(framedata, blit)
+        perf.span(RENDER, start)
+        perf.count("draws")
 
 def update(frame):
+    global shown_actuators
     global actuator_states
-    for i in range(ACTUATOR_INDEX, len(BUTTONS)):
-        color = "#90EE90" if (actuator_states[i-ACTUATOR_INDEX] != ACTUATOR_NORMALS[i-ACTUATOR_INDEX]) else "#FFA500"
-        hcolor = "#BDFCC9" if (color == "#90EE90") else "#FFD580"
-        if buttons[i].color != color:
-            buttons[i].color = color
-            buttons[i].hovercolor = hcolor
-            buttons[i].ax.set_facecolor(color)  # Set the Axes background directly
-            buttons[i].ax.figure.canvas.draw_idle()
 
+    # pull in whatever the ingest process decoded since the last frame
+    source = ser
+    if INGEST_PROCESS and source is not None:
+        start = time.perf_counter()
+        published = source.drain(history)
+        perf.span(STORE, start)
+        if published is not None:
+            actuator_states = published
+
+    if actuator_states != shown_actuators:
+        shown_actuators = actuator_states
+        for i in range(ACTUATOR_INDEX, len(BUTTONS)):
+            color = "#90EE90" if (actuator_states[i-ACTUATOR_INDEX] != ACTUATOR_NORMALS[i-ACTUATOR_INDEX]) else "#FFA500"
+            hcolor = "#BDFCC9" if (color == "#90EE90") else "#FFD580"
+            if buttons[i].color != color:
+                buttons[i].color = color
+                buttons[i].hovercolor = hcolor
+                buttons[i].ax.set_facecolor(color)  # Set the Axes background directly
+                buttons[i].ax.figure.canvas.draw_idle()
+
+    drawn = []
     for i, line in enumerate(lines):
-        # New x and y data
+        # skip charts that have not received anything since their last draw
+        generation = history.generation[i]
+        if generation == drawn_generation[i]:
+            continue
+        drawn_generation[i] = generation
 
+        ax = line.axes
 
-        line.set_data(data_x[i], data_y[i])
+        # New x and y data, reduced to what the axis can actually show
+        data_x, data_y = decimators[i].series(ax.bbox.width)
+        line.set_data(data_x, data_y)
 
-        ax = line.axes
-        if len(data_x[i]) > 1:
-            ax.set_xlim(data_x[i][0], data_x[i][-1])
+        if len(data_x) > 1:
+            ax.set_xlim(data_x[0], data_x[-1])
 
-            current_value = data_y[i][-1]
+            current_value = history.last(i)[1]
             texts[i].set_text(f"{current_value:.2f}")
         #ax.set_ylim(data_y[i][0], data_y[i][-1] + 1)
 
+        drawn.append(line)
+        drawn.append(texts[i])
 
-    return lines + texts
+    return drawn
 
 # ===================================================================
 
 # ====================== Setup Serial Threads =======================
 
+decoder = FrameDecoder(CHARTS)
+reader = BinaryFrameReader()
+binary_charts = telemetry.binary_columns(CHARTS)
+
+def chart_columns(decoder):
+    """Locates every chart in a newly learned frame layout."""
+    chart_index, x_columns, y_columns, missing = telemetry.chart_columns(decoder, CHARTS)
+    for chart in missing:
+        print("Chart Failure |", chart)
+        print("\t", decoder.names)
+    return chart_index, x_columns, y_columns
+
+def replay_seek():
+    """Starts the charts and the frame numbering over after a replay seek."""
+    history.clear()
+    sequence.restart()
+
 def serial_rx():
     """Continuously reads from serial and logs complete lines."""
-    buffer = b''
     global run_threads
     global actuator_states
+
+    # where each chart's time and value sit in the decoder's values
+    layout = None
+    corrupt = reader.corrupt
+    chart_index = None
+    x_columns = None
+    y_columns = None
+
     while run_threads:
         if ser == None or ser_lock:
             time.sleep(0.5)
             continue
         try:
-            data = ser.read(ser.in_waiting or 1)
+            # bytes already waiting are the port's backlog, only reading them
+            # counts as read time. waiting for the next byte is idle
+            waiting = ser.in_waiting
+            perf.gauge("port backlog", waiting)
+            start = time.perf_counter()
+            data = ser.read(waiting or 1)
             if data:
-                buffer += data
-                while b'\n' in buffer:
-                    line, buffer = buffer.split(b'\n', 1)
-                    line = line.strip().decode('utf-8', errors='replace')
+                if waiting:
+                    start = perf.span(READ, start)
+                else:
+                    start = time.perf_counter()
+                perf.count("bytes", len(data))
+
+                # parse and store time of every line of the read add up to one span each
+                frames, text_lines = reader.feed(data)
+                if reader.corrupt != corrupt:
+                    sequence.corrupted(reader.corrupt - corrupt)
+                    corrupt = reader.corrupt
+                now = time.perf_counter()
+                parse = now - start
+                store = 0.0
+
+                # binary frames come in batches, each chart is unpacked in one go
+                if len(frames):
+                    perf.count("frames", len(frames))
+                    actuator_states = telemetry.actuator_bits(frames[-1])
+                    tracker.states(actuator_states)
+                    if recorder is not None:
+                        recorder.binary(frames, *binary_charts)
+
+                    # charts break where frames went missing, repeats are left out
+                    lost = sequence.frames(frames["seq"])
+                    fresh = lost != DUPLICATE
+                    for i, channel in zip(*binary_charts):
+                        history.extend(i, *insert_breaks(frames["data"]["ms"][fresh, channel] / 1000,
+                                                         frames["data"]["value"][fresh, channel], lost[fresh]))
+                    store += time.perf_counter() - now
+
+                for line in text_lines:
+                    line = line.strip()
                     
                     if line:
-                        if not line.startswith("log: "):
+                        perf.count("lines")
+                        if not line.startswith(b"log: "):
+                            start = time.perf_counter()
                             try:
-                                parsed = json.loads(line)
-                                parsed["EMPTY"] = [0, 0]
-                                #print(parsed)
-
-                                actuator_states = parsed["actuators"]
-
-                                for i, chart in enumerate(CHARTS):
-                                    if TITLES[i] == '---':
-                                        continue
-
-                                    try:
-                                        data_x[i].append(parsed[chart][0] / 1000)
-                                        data_y[i].append(parsed[chart][1])
-
-                                        if (len(data_x[i]) > 75):
-                                            data_x[i].pop(0)
-                                        if (len(data_y[i]) > 75):
-                                            data_y[i].pop(0)
-
-                                            
-                                    except Exception as e:
-                                        print("Chart Failure |", chart)
-                                        print("\t", parsed)
-                                        print(e)
-
-                            except json.JSONDecodeError as e:
+                                decoder.decode(line)
+
+                                if decoder.layout != layout:
+                                    layout = decoder.layout
+                                    chart_index, x_columns, y_columns = chart_columns(decoder)
+
+                                # SD log replays have no actuators, they keep their last states
+                                if "actuators" in decoder:
+                                    actuator_states = [int(v) for v in decoder.get("actuators")]
+                                seq = int(decoder.get("seq")) if "seq" in decoder else None
+                                lost = sequence.frame(seq) if seq is not None else 0
+                                now = time.perf_counter()
+                                parse += now - start
+                                if lost == DUPLICATE:
+                                    continue
+
+                                tracker.states(actuator_states)
+                                if recorder is not None:
+                                    recorder.decoded(decoder, chart_index, x_columns, y_columns, actuator_states, seq or 0)
+                                xs = decoder.values[x_columns] / 1000
+                                if lost:
+                                    # the charts break where frames went missing
+                                    history.append_row(chart_index, xs, np.full(len(chart_index), np.nan))
+                                history.append_row(chart_index, xs, decoder.values[y_columns])
+                                store += time.perf_counter() - now
+                                perf.count("frames")
+
+                            except (ValueError, KeyError) as e:
+                                parse += time.perf_counter() - start
+                                perf.count("parse errors")
+                                # binary frames are counted by their CRC, a bad line is not a frame there
+                                if not reader.binary:
+                                    sequence.corrupted()
+                                line = line.decode('utf-8', errors='replace')
                                 print(line[line.find("log")::])
                                 
                         else:
                             #if in_use and ("done" in line.lower()):
                             #    in_use = False
+                            line = line.decode('utf-8', errors='replace')
+                            tracker.received(line)
+                            if recorder is not None:
+                                recorder.log(line)
                             if not (("recieved" in line) or ("UH OH" in line)):
                                 print(f"[{datetime.now()}] {line}")
-        except Exception as e:
-            print(f"[{datetime.now()}] Read error: {e}")
 
-def serial_tx():
-    """Sends data periodically over the serial port."""
-    global run_threads
-    last_execute = time.time()
-    while run_threads:
-        if ser == None or ser_lock:
-            time.sleep(0.5)
-            continue
-
-        try:
-            while not tx_queue.empty():            
-                ser.write(tx_queue.get_nowait())
-                ser.flush()
-                print("sent command")
-
-            if time.time() - last_execute > 0.06:
-                ser.write(b"{}")
-                last_execute = time.time()
+                perf.add(PARSE, parse)
+                if store:
+                    perf.add(STORE, store)
         except Exception as e:
-            print(f"TX Error | {e}")
-        time.sleep(0.0005)
+            print(f"[{datetime.now()}] Read error: {e}")
 
 # ===================================================================
 
-from PyQt6.QtCore import Qt
+from PyQt6.QtCore import Qt, QTimer
 from PyQt6.QtWidgets import QComboBox, QPushButton, QHBoxLayout, QWidget, QToolButton
 from matplotlib.backends.backend_qt5agg import NavigationToolbar2QT
 import serial.tools.list_ports
@@ -364,7 +559,7 @@ class CommandLineEdit(QLineEdit):
         self.command_index = None
 
         print(f"sending \"{{{cmd}}}\\n\"")
-        tx_queue.put(f"{{{cmd}}}\n".encode())
+        send(f"{{{cmd}}}\n".encode())
 
         self.clear()
 
@@ -395,6 +590,20 @@ class CustomToolbar(NavigationToolbar2QT):
         self.title_label.setStyleSheet("font-weight: bold; font-size: 14px;")
         self.title_label.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Preferred)
 
+        # command round trip latency, refreshed by a timer
+        self.latency_label = QLabel(tracker.status())
+
+        # pipeline timing drawn over the charts, refreshed while it is shown
+        self.perf_button = QPushButton("Perf")
+        self.perf_button.setCheckable(True)
+        self.perf_button.toggled.connect(self.toggle_perf)
+        self.perf_overlay = QLabel(canvas)
+        self.perf_overlay.setStyleSheet("background-color: rgba(0, 0, 0, 170); color: white; "
+                                        "font-family: monospace; padding: 6px;")
+        self.perf_overlay.hide()
+        self.perf_timer = QTimer()
+        self.perf_timer.timeout.connect(self.update_perf)
+
         # add layout container
         container = QWidget()
         layout = QHBoxLayout()
@@ -407,6 +616,8 @@ class CustomToolbar(NavigationToolbar2QT):
         layout.addWidget(self.title_label, alignment=Qt.AlignmentFlag.AlignCenter)
         layout.addStretch()  # spacer after title
 
+        layout.addWidget(self.perf_button)
+        layout.addWidget(self.latency_label)
         layout.addWidget(self.command_box)
         layout.addWidget(self.command_submit)
 
@@ -424,10 +635,28 @@ class CustomToolbar(NavigationToolbar2QT):
         super().__del__()
         self.running = False
 
+    def toggle_perf(self, shown):
+        self.perf_overlay.setVisible(shown)
+        if shown:
+            self.update_perf()
+            self.perf_timer.start(int(PERF_INTERVAL * 1000))
+        else:
+            self.perf_timer.stop()
+
+    def update_perf(self):
+        self.perf_overlay.setText(perf.text())
+        self.perf_overlay.adjustSize()
+        self.perf_overlay.move(10, 10)
+        self.perf_overlay.raise_()
+
     def refresh_ports(self):
         ports = []
         for port in serial.tools.list_ports.comports():
             ports.append(port.device)
+        if os.path.exists(SIMULATOR_PORT):
+            ports.append(SIMULATOR_PORT)
+        if REPLAY_FILE:
+            ports.append(REPLAY_PORT)
 
         curr_ports = []
         for i in range(len(self.port_dropdown)):
@@ -443,21 +672,52 @@ class CustomToolbar(NavigationToolbar2QT):
     def connect_serial(self):
         global ser
         global ser_lock
+        global recorder
+        global sequence
 
         if ser == None: # connect
             try:
                 selected_port = self.port_dropdown.currentText()
-                ser = serial.Serial(selected_port, 115200, timeout=1)
+                sequence = SequenceTracker()
+                decoder.forget()
+                reader.clear()
+                if selected_port == REPLAY_PORT:
+                    if INGEST_PROCESS:
+                        raise ValueError("replay runs in the GUI process, set INGEST_PROCESS = False")
+                    # frames go through serial_rx like live ones, a seek starts the charts over
+                    ser = ReplaySerial(REPLAY_FILE, REPLAY_SPEED)
+                    ser.on_seek = replay_seek
+                    tx.attach(ser)
+                elif INGEST_PROCESS:
+                    # the child times its reading and parsing to a log of its own
+                    perf_log = "%s_ingest%s" % os.path.splitext(PERF_LOG) if PERF_LOG else None
+                    ser = ingest.IngestProcess(selected_port, 115200, CHARTS, tx_queue, COMMAND_LOG, SESSION_DIR, perf_log)
+                else:
+                    ser = serial.Serial(selected_port, 115200, timeout=1)
+                    if SESSION_DIR:
+                        recorder = SessionRecorder.create(SESSION_DIR, CHARTS)
+                        print(f"Recording to {recorder.filename}")
+                    tx.attach(ser)
                 time.sleep(0.1)
+
+                send(b"{B1}\n" if BINARY_TELEMETRY else b"{B0}\n")
                 self.connect_button.setText("Disconnect")
             except Exception as e:
                 print(f"Serial Connect Error | {e}")
         else:
             ser_lock = True
+            tx.detach()
             time.sleep(0.1)
             
+            if isinstance(ser, ReplaySerial):
+                print(f"Replay | {ser.stats()}")
+            if not INGEST_PROCESS:
+                print(f"Sequence | {sequence.summary()}")
             ser.close()
             ser = None
+            if recorder is not None:
+                rec, recorder = recorder, None
+                rec.close()
 
             ser_lock = False
 
@@ -471,15 +731,20 @@ class CustomToolbar(NavigationToolbar2QT):
             time.sleep(0.5)
 
 if __name__ == "__main__":
+    ingest.mp.freeze_support()
+    if INGEST_PROCESS:
+        tx_queue = ingest.new_tx_queue()
+
     app = QApplication(sys.argv)
 
     # Configure Charts to be animated, and have proper margins
     fig_charts.subplots_adjust(left=0.05, right=0.95, top=0.95, bottom=0.05, hspace=0.25, wspace=0.25)
-    ani = FuncAnimation(fig_charts, update, interval=5, blit=True)
+    ani = DirtyAnimation(fig_charts, update, interval=5, blit=True)
 
     # Setup Canvas' and Layouts
     canvas_charts = FigureCanvas(fig_charts)
     canvas_buttons = FigureCanvas(fig_buttons)
+    canvas_charts.mpl_connect('draw_event', mark_all_dirty)
 
     main_window = QMainWindow()
     main_widget = QWidget()
@@ -529,13 +794,22 @@ if __name__ == "__main__":
     main_window.setWindowIcon(QIcon("icon.png"))
 
 
-    # Start threads
+    # Start threads, the ingest process does the serial work when enabled
     trx = Thread(target=serial_rx, daemon=True)
-    ttx = Thread(target=serial_tx, daemon=True)
     ttb = Thread(target=toolbar.update_ports_thread)
-    trx.start()
-    ttx.start()
+    if not INGEST_PROCESS:
+        trx.start()
+        tx.start()
     ttb.start()
+    perf.start()
+
+    # command latencies are only tracked here when this process owns the port
+    if not INGEST_PROCESS:
+        latency_timer = QTimer()
+        latency_timer.timeout.connect(lambda: toolbar.latency_label.setText(tracker.status()))
+        latency_timer.start(1000)
+    else:
+        toolbar.latency_label.hide()
 
     # run GUI
     main_window.show()
@@ -543,7 +817,18 @@ if __name__ == "__main__":
 
     # Threads cleanup
     run_threads = False
-    trx.join()
-    ttx.join()
+    if not INGEST_PROCESS:
+        trx.join()
+        tx.stop()
+        print(f"TX | {tx.latency.summary()}")
+        print(f"Commands | {tracker.summary()}")
+        print(f"Sequence | {sequence.summary()}")
+        if COMMAND_LOG and tracker.records:
+            tracker.export(COMMAND_LOG)
+        if recorder is not None:
+            recorder.close()
     ttb.join()
+    perf.stop()
+    if INGEST_PROCESS and ser is not None:
+        ser.close()
     sys.exit(exit_code)
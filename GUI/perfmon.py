@@ -0,0 +1,217 @@
+# SARP OTV DAQ GUI
+#
+# lightweight timing of the telemetry pipeline
+#
+# each stage (read, parse, store, render) reports how long it took with
+# perf_counter spans. spans go into fixed size histograms with log spaced bins,
+# so recording one costs a log10 and a list increment however long the GUI
+# runs. counters (lines, bytes, parse errors) and gauges (queue depths) are
+# kept next to them. every `interval` the monitor takes a snapshot of the
+# interval that just ended, appends it to a JSON lines file and keeps it for
+# the GUI's overlay
+
+import json
+import math
+import threading
+import time
+
+
+READ   = "read"
+PARSE  = "parse"
+STORE  = "store"
+RENDER = "render"
+STAGES = (READ, PARSE, STORE, RENDER)
+
+# histogram bins, 10 per decade from 1 us to 10 s
+BINS_PER_DECADE = 10
+MIN_DECADE = -6
+MAX_DECADE = 1
+BINS = (MAX_DECADE - MIN_DECADE) * BINS_PER_DECADE
+
+
+class SpanHistogram:
+    """Durations of one stage, in seconds, counted in log spaced bins.
+
+    Percentiles are the upper edge of the bin they fall in, so they are
+    within about 25% of the real value.
+    """
+
+    def __init__(self):
+        self.counts = [0] * (BINS + 2) # first and last catch out of range
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        if seconds > 0:
+            i = int((math.log10(seconds) - MIN_DECADE) * BINS_PER_DECADE) + 1
+            i = min(max(i, 0), BINS + 1)
+        else:
+            i = 0
+        self.counts[i] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, q):
+        if not self.count:
+            return float("nan")
+        target = q / 100 * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if count and seen >= target:
+                if i > BINS: # past the last bin, there is no upper edge
+                    return self.max
+                return min(10 ** (MIN_DECADE + i / BINS_PER_DECADE), self.max)
+        return self.max
+
+
+class PerfMonitor:
+    """Spans, counters and gauges of the pipeline, snapshot every `interval`.
+
+    `start()` runs a thread that takes the snapshots and appends them to
+    `filename` (none for memory only) as one JSON object per line, the
+    latest one is in `latest`. Recording takes no lock, a span that lands
+    right as an interval is swapped out may be lost, which does not matter
+    for statistics.
+    """
+
+    def __init__(self, filename=None, interval=1.0):
+        self.filename = filename
+        self.interval = interval
+
+        self.spans = {}    # stage -> SpanHistogram of the current interval
+        self.counters = {} # name -> count in the current interval
+        self.gauges = {}   # name -> highest value in the current interval
+        self.watches = {}  # name -> function polled at every snapshot
+        self.totals = {}   # name -> count since start
+        self.latest = None
+
+        self.window_start = time.monotonic()
+        self.running = False
+        self.wake = threading.Event()
+        self.thread = None
+
+    # ============ Recording ============
+
+    def add(self, stage, seconds):
+        """Records a span of `seconds` for a stage."""
+        histogram = self.spans.get(stage)
+        if histogram is None:
+            histogram = self.spans[stage] = SpanHistogram()
+        histogram.add(seconds)
+
+    def span(self, stage, start):
+        """Records a span from `start` (time.perf_counter()) to now, returns now."""
+        now = time.perf_counter()
+        self.add(stage, now - start)
+        return now
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def gauge(self, name, value):
+        """Reports a level like a queue depth, the highest of each interval is kept."""
+        if value > self.gauges.get(name, 0):
+            self.gauges[name] = value
+
+    def watch(self, name, func):
+        """Polls `func()` for a gauge at every snapshot."""
+        self.watches[name] = func
+
+    # ============ Snapshots ============
+
+    def snapshot(self):
+        """Statistics of the interval since the previous snapshot, which starts a new one."""
+        now = time.monotonic()
+        elapsed = max(now - self.window_start, 1e-9)
+        self.window_start = now
+        spans, self.spans = self.spans, {}
+        counters, self.counters = self.counters, {}
+        gauges, self.gauges = self.gauges, {}
+
+        for name, func in self.watches.items():
+            try:
+                gauges[name] = func()
+            except Exception:
+                pass
+        for name, count in counters.items():
+            self.totals[name] = self.totals.get(name, 0) + count
+
+        stages = {}
+        for stage, histogram in spans.items():
+            stages[stage] = {
+                "count": histogram.count,
+                "rate": histogram.count / elapsed,
+                "p50_ms": histogram.percentile(50) * 1000,
+                "p99_ms": histogram.percentile(99) * 1000,
+                "max_ms": histogram.max * 1000,
+                "busy": histogram.total / elapsed,
+            }
+
+        self.latest = {
+            "time": time.time(),
+            "elapsed": elapsed,
+            "stages": stages,
+            "rates": {name: count / elapsed for name, count in counters.items()},
+            "totals": dict(self.totals),
+            "gauges": gauges,
+        }
+        return self.latest
+
+    def text(self):
+        """The latest snapshot as a small table, for the overlay."""
+        snap = self.latest
+        if snap is None:
+            return "waiting for data"
+
+        out = [f"{'stage':<7}{'/s':>7}{'p50 ms':>9}{'p99 ms':>9}{'max ms':>9}{'busy':>6}"]
+        for stage in STAGES + tuple(s for s in snap["stages"] if s not in STAGES):
+            if stage in snap["stages"]:
+                s = snap["stages"][stage]
+                out.append(f"{stage:<7}{s['rate']:>7.0f}{s['p50_ms']:>9.2f}{s['p99_ms']:>9.2f}"
+                           f"{s['max_ms']:>9.1f}{s['busy'] * 100:>5.0f}%")
+        for name, rate in sorted(snap["rates"].items()):
+            out.append(f"{name:<14}{rate:>9.0f}/s  ({snap['totals'].get(name, 0)})")
+        for name, value in sorted(snap["gauges"].items()):
+            out.append(f"{name:<14}{value:>9}")
+        return "\n".join(out)
+
+    # ============ Thread ============
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        self.wake.clear()
+        self.window_start = time.monotonic()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        self.wake.set()
+        if self.thread is not None:
+            self.thread.join(timeout=1.0)
+            self.thread = None
+
+    def _run(self):
+        file = None
+        if self.filename:
+            try:
+                file = open(self.filename, "a")
+            except OSError as e:
+                print(f"Perf log | cannot open {self.filename}: {e}")
+
+        try:
+            while self.running:
+                self.wake.wait(self.interval)
+                snap = self.snapshot()
+                if file is not None:
+                    file.write(json.dumps(snap) + "\n")
+                    file.flush()
+        finally:
+            if file is not None:
+                file.close()
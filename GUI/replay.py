@@ -0,0 +1,285 @@
+# SARP OTV DAQ GUI
+#
+# replay of recorded sessions and SD logs through the live ingest path
+#
+# ReplaySerial stands in for serial.Serial. it turns a session file (.ses) or
+# an SD card log.txt back into the text lines the DAQ prints, and releases
+# them at the pace they were recorded at, sped up by `speed` (0 for as fast as
+# the reader takes them). the GUI reads it like a port, so what is replayed
+# goes through exactly the code live telemetry does.
+#
+# written commands are ignored, except for replay control:
+#   {seek 120.5}   jump to 120.5 s into the recording
+#   {speed 10}     play 10x (0 for as fast as possible)
+
+import math
+import time
+
+import numpy as np
+
+import session
+import sdlog
+
+
+# frames per read when replaying as fast as possible
+MAX_SPEED_CHUNK = 200
+
+# longest a waiting read sleeps before it checks for replay control (s)
+CONTROL_POLL = 0.05
+
+# SD logs have no frames, every sensor is sampled on its own. they are
+# replayed as frames of every sensor's latest sample, this far apart (s)
+LOG_FRAME_PERIOD = 0.02
+
+# formats of the replayed lines, as the two GUIs expect them
+STYLE_DAQ      = "daq"      # OTV DAQ: "name" : [ms, value], actuators array
+STYLE_CAPSTONE = "capstone" # Capstone controller: "name": value, timeSent
+
+
+class Recording:
+    """Frames and text lines of a recording on one time axis, in seconds.
+
+    `ms` and `values` are (frames, channels), NaN values are channels a
+    frame did not have. `actuators` is the packed actuator byte per frame
+    and `seq` the DAQ's frame number, either None if the recording has none.
+    """
+
+    def __init__(self, channels, times, ms, values, actuators=None, texts=(), seq=None):
+        self.channels = list(channels)
+        self.times = np.asarray(times, dtype=np.float64)
+        self.ms = np.asarray(ms)
+        self.values = np.asarray(values)
+        self.actuators = actuators
+        self.seq = seq
+        self.text_times = np.array([t for t, _ in texts], dtype=np.float64)
+        self.texts = [text for _, text in texts]
+
+    @property
+    def duration(self):
+        end = self.times[-1] if len(self.times) else 0.0
+        if len(self.text_times):
+            end = max(end, self.text_times[-1])
+        return float(end)
+
+    @classmethod
+    def from_session(cls, filename):
+        rec = session.Session(filename)
+        records = rec.records
+        frames = records[records["kind"] == session.KIND_FRAME]
+        logs = records[records["kind"] == session.KIND_LOG]
+        texts = [(float(r["time"]), r["data"].tobytes()[:r["length"]].decode("utf-8", errors="replace")) for r in logs]
+        # frames recorded without a number have 0 throughout
+        seq = frames["seq"] if frames["seq"].any() else None
+        return cls(rec.channels, frames["time"], frames["data"]["ms"], frames["data"]["value"], frames["actuators"], texts, seq)
+
+    @classmethod
+    def from_log(cls, filename, period=LOG_FRAME_PERIOD):
+        data = sdlog.load_cached(filename)
+        channels = list(data)
+        end = max((int(sensor["X"][-1]) for sensor in data.values() if len(sensor["X"])), default=0)
+
+        # what the DAQ would have sent if asked every `period`: the last sample of each sensor
+        grid = np.arange(0, end + 1, period * 1000)
+        ms = np.zeros((len(grid), len(channels)), dtype=np.int64)
+        values = np.full((len(grid), len(channels)), np.nan)
+        for c, name in enumerate(channels):
+            x = np.asarray(data[name]["X"])
+            latest = np.searchsorted(x, grid, side="right") - 1
+            sampled = latest >= 0
+            ms[sampled, c] = x[latest[sampled]]
+            values[sampled, c] = np.asarray(data[name]["Y"])[latest[sampled]]
+        return cls(channels, grid / 1000, ms, values)
+
+    @classmethod
+    def load(cls, filename):
+        if filename.endswith(".ses"):
+            return cls.from_session(filename)
+        return cls.from_log(filename)
+
+
+class ReplaySerial:
+    """Read side of a serial port, fed from a recording.
+
+    Supports what the GUIs use of serial.Serial: `read()`, `readline()`,
+    `in_waiting`, `write()`, `flush()`, `open()` / `close()` / `is_open`
+    and the buffer resets. `on_seek` is called from the reading thread after
+    a seek, before the first line from the new position is returned.
+    """
+
+    def __init__(self, filename, speed=1.0, start=0.0, style=STYLE_DAQ, timeout=1.0):
+        self.port = "replay"
+        self.filename = filename
+        self.style = style
+        self.timeout = timeout
+        self.recording = Recording.load(filename)
+        self.formats = [self._format(name) for name in self.recording.channels]
+
+        self.speed = speed
+        self.buffer = bytearray()
+        self.is_open = True
+        self.on_seek = None
+        self.control = [] # (seek or speed, value) from write(), applied by the reader
+
+        self.frames = 0
+        self.started = time.monotonic()
+        self.seek(start)
+
+    # ============ Playback ============
+
+    def seek(self, t):
+        """Continues the replay from `t` seconds into the recording."""
+        self.frame = int(np.searchsorted(self.recording.times, t, side="left"))
+        self.text = int(np.searchsorted(self.recording.text_times, t, side="left"))
+        self.base_time = t
+        self.base_clock = time.monotonic()
+        self.buffer.clear()
+
+    def set_speed(self, speed):
+        self.base_time = self.position
+        self.base_clock = time.monotonic()
+        self.speed = speed
+
+    @property
+    def position(self):
+        """Recording time being played, in seconds."""
+        if self.speed <= 0:
+            return float(self.recording.times[self.frame - 1]) if self.frame else self.base_time
+        return self.base_time + (time.monotonic() - self.base_clock) * self.speed
+
+    @property
+    def finished(self):
+        """True once everything was replayed and read."""
+        return self.frame >= len(self.recording.times) and self.text >= len(self.recording.texts) and not self.buffer
+
+    def _due(self):
+        # moves every frame and line that is due into the buffer
+        while self.control:
+            command, value = self.control.pop(0)
+            if command == "speed":
+                self.set_speed(value)
+            else:
+                self.seek(value)
+                if self.on_seek is not None:
+                    self.on_seek()
+
+        if self.speed <= 0:
+            end = min(self.frame + MAX_SPEED_CHUNK, len(self.recording.times))
+            # the lines after the last frame go out with it
+            now = self.recording.times[end - 1] if end < len(self.recording.times) else math.inf
+        else:
+            now = self.position
+            end = int(np.searchsorted(self.recording.times, now, side="right"))
+
+        texts = int(np.searchsorted(self.recording.text_times, now, side="right"))
+        if texts > self.text:
+            for line in self.recording.texts[self.text:texts]:
+                self.buffer += line.encode("utf-8", errors="replace") + b"\n"
+            self.text = texts
+
+        if end > self.frame:
+            self.buffer += self._encode(self.frame, end)
+            self.frames += end - self.frame
+            self.frame = end
+
+    def _wait(self):
+        # seconds until the next frame or line is due, inf once there are none
+        upcoming = []
+        if self.frame < len(self.recording.times):
+            upcoming.append(self.recording.times[self.frame])
+        if self.text < len(self.recording.text_times):
+            upcoming.append(self.recording.text_times[self.text])
+        if not upcoming:
+            return math.inf
+        if self.speed <= 0:
+            return 0.0
+        return max((min(upcoming) - self.position) / self.speed, 0.0)
+
+    # ============ Lines ============
+
+    def _format(self, name):
+        if self.style == STYLE_CAPSTONE:
+            return '"%s": %%f' % name
+        return '"%s" : [%%d, %%f]' % name
+
+    def _encode(self, start, end):
+        rec = self.recording
+        lines = []
+        for i in range(start, end):
+            values = rec.values[i]
+            ms = rec.ms[i]
+            parts = [fmt % (ms[c], values[c]) if self.style == STYLE_DAQ else fmt % values[c]
+                     for c, fmt in enumerate(self.formats) if not math.isnan(values[c])]
+
+            if self.style == STYLE_CAPSTONE:
+                parts.insert(0, '"timeSent": %d' % int(ms.max()))
+            else:
+                if rec.seq is not None:
+                    parts.insert(0, '"seq" : %d' % rec.seq[i])
+                if rec.actuators is not None:
+                    bits = int(rec.actuators[i])
+                    parts.append('"actuators" : [%s]' % ", ".join(str((bits >> s) & 1) for s in range(8)))
+            lines.append("{" + ", ".join(parts) + "}\n")
+        return "".join(lines).encode()
+
+    # ============ serial.Serial ============
+
+    @property
+    def in_waiting(self):
+        self._due()
+        return len(self.buffer)
+
+    def read(self, size=1):
+        """Returns up to `size` bytes, waiting up to `timeout` for the first one.
+
+        Like an idle port, a finished replay blocks for the whole timeout.
+        """
+        deadline = time.monotonic() + (self.timeout or 0)
+        self._due()
+        while not self.buffer and self.is_open:
+            wait = min(self._wait(), deadline - time.monotonic())
+            if wait <= 0 and not self.control:
+                break
+            # a seek or speed change is picked up within CONTROL_POLL
+            time.sleep(min(max(wait, 0), CONTROL_POLL))
+            self._due()
+
+        data = bytes(self.buffer[:size])
+        del self.buffer[:size]
+        return data
+
+    def readline(self):
+        line = bytearray()
+        while True:
+            data = self.read(1)
+            line += data
+            if not data or data == b"\n":
+                return bytes(line)
+
+    def write(self, data):
+        """Takes replay control commands, everything else is dropped."""
+        text = data.decode("utf-8", errors="replace").strip().strip("{}").split()
+        if len(text) == 2 and text[0] in ("seek", "speed"):
+            try:
+                self.control.append((text[0], float(text[1])))
+            except ValueError:
+                pass
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def reset_input_buffer(self):
+        self.buffer.clear()
+
+    def reset_output_buffer(self):
+        pass
+
+    def open(self):
+        self.is_open = True
+
+    def close(self):
+        self.is_open = False
+
+    def stats(self):
+        elapsed = max(time.monotonic() - self.started, 1e-9)
+        return f"{self.frames} frames in {elapsed:.1f} s ({self.frames / elapsed:.0f}/s), at {self.position:.1f} s of {self.recording.duration:.1f} s"
@@ -0,0 +1,121 @@
+# SARP OTV DAQ GUI
+#
+# fixed capacity ring buffers for chart history
+
+import numpy as np
+
+
+class ChannelStore:
+    """Preallocated (x, y) history for a fixed number of channels.
+
+    Every sample is written twice, once at its slot and once a full capacity
+    further along, so the newest `capacity` samples of a channel are always a
+    single contiguous slice of the backing array. `view()` hands that slice out
+    without copying, and appending never moves existing data.
+
+    The ring has `guard` slots more than it shows. The slots the next `guard`
+    samples go to are outside every published view, so a reader on another
+    thread never sees its oldest sample replaced by the newest one while the
+    writer appends up to `guard` samples.
+    """
+
+    def __init__(self, channels, capacity, guard=1):
+        self.channels = channels
+        self.capacity = capacity
+        self.slots = capacity + guard
+
+        self.x = np.zeros((channels, 2 * self.slots))
+        self.y = np.zeros((channels, 2 * self.slots))
+
+        # samples ever appended, per channel. the next slot to write is
+        # always total % slots, so this is the only bookkeeping needed
+        self.total = [0] * channels
+
+        # bumped on every change to a channel, so readers can cheaply tell
+        # whether anything happened since they last looked
+        self.generation = [0] * channels
+
+    def append(self, channel, x, y):
+        """Appends one sample to a channel in O(1)."""
+        slots = self.slots
+        h = self.total[channel] % slots
+
+        self.x[channel, h] = x
+        self.x[channel, h + slots] = x
+        self.y[channel, h] = y
+        self.y[channel, h + slots] = y
+
+        self.total[channel] += 1
+        self.generation[channel] += 1
+
+    def append_row(self, channels, xs, ys):
+        """Appends one sample to each of several channels at once.
+
+        `channels` is an integer array, xs / ys hold one sample per entry.
+        """
+        h = np.array([self.total[c] for c in channels]) % self.slots
+
+        self.x[channels, h] = xs
+        self.x[channels, h + self.slots] = xs
+        self.y[channels, h] = ys
+        self.y[channels, h + self.slots] = ys
+
+        for c in channels:
+            self.total[c] += 1
+            self.generation[c] += 1
+
+    def extend(self, channel, xs, ys):
+        """Appends a batch of samples to a channel."""
+        xs = np.asarray(xs, dtype=float)
+        ys = np.asarray(ys, dtype=float)
+        n = len(xs)
+        if n == 0:
+            return
+
+        # only the newest `capacity` samples can survive the write
+        cap = self.capacity
+        skip = max(n - cap, 0)
+        xs = xs[skip:]
+        ys = ys[skip:]
+
+        h = (self.total[channel] + skip + np.arange(len(xs))) % self.slots
+        self.x[channel, h] = xs
+        self.x[channel, h + self.slots] = xs
+        self.y[channel, h] = ys
+        self.y[channel, h + self.slots] = ys
+
+        self.total[channel] += n
+        self.generation[channel] += 1
+
+    def size(self, channel):
+        """Number of samples currently held for a channel."""
+        return min(self.total[channel], self.capacity)
+
+    def view(self, channel):
+        """Returns zero-copy (x, y) views of a channel, oldest sample first."""
+        x, y, _ = self.snapshot(channel)
+        return x, y
+
+    def snapshot(self, channel):
+        """Returns (x, y, total) for a channel from a single read of its count.
+
+        `total` is the absolute index one past the newest sample in the views,
+        which lets consumers line the views up with samples they have already
+        processed even while the reader thread keeps appending.
+        """
+        total = self.total[channel]
+        end = total % self.slots + self.slots
+        start = end - min(total, self.capacity)
+        return self.x[channel, start:end], self.y[channel, start:end], total
+
+    def last(self, channel):
+        """Returns the newest (x, y) sample of a channel."""
+        i = self.total[channel] % self.slots + self.slots - 1
+        return self.x[channel, i], self.y[channel, i]
+
+    def clear(self, channel=None):
+        """Drops the history of one channel, or of every channel."""
+        channels = range(self.channels) if channel is None else [channel]
+        for i in channels:
+            self.total[i] = 0
+            self.generation[i] += 1
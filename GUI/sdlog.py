@@ -0,0 +1,365 @@
+# SARP OTV DAQ GUI
+#
+# chunked, vectorized loader for the DAQ's SD card logs
+#
+# every sensor's sample_log writes one line per sample:
+#
+#   "NAME", value, raw, ms
+#
+# the file is read in large chunks, which keeps memory at a few times the chunk
+# size however big the log is. with pandas installed a chunk goes through its C
+# csv parser, names come out as categorical codes and the numbers as float
+# columns without a Python object per line. that is about 3x the line by line
+# loader (benchmarks/bench_sdlog.py). without pandas, or when a chunk has torn
+# or corrupt lines, the chunk is split on its quotes once, so the names and the
+# numbers come out as two flat runs: the numbers are parsed in one np.fromstring
+# call and the names are mapped to small integer codes. that only gets about
+# 1.2x, converting the text to floats is most of its time
+#
+# parsed logs can also be cached next to the log as a directory of .npy files,
+# one per sensor and column, which load back memory mapped in milliseconds
+
+import io
+import json
+import os
+import shutil
+
+import numpy as np
+
+try:
+    import pandas as pd
+except ImportError: # parse_chunk falls back to its NumPy parser
+    pd = None
+
+
+CHUNK_SIZE = 16 << 20
+
+# bumped whenever the cache layout or the parsing changes
+CACHE_VERSION = 1
+CACHE_SUFFIX = ".cache"
+COLUMNS = ["X", "Y", "RAW"]
+
+# the commas and newlines between the numbers become whitespace
+_SEPARATORS = bytes.maketrans(b',\n', b'  ')
+
+
+def parse_chunk(chunk):
+    """Parses whole log lines into (names, codes, samples).
+
+    names lists each sensor once, in order of appearance, codes holds the
+    index into names for every line, samples is an (n, 3) array of value,
+    raw, ms. Lines that do not parse are dropped. chunk must end on a line
+    boundary.
+    """
+    if pd is not None:
+        parsed = _parse_csv(chunk)
+        if parsed is not None:
+            return parsed
+
+    parts = chunk.split(b'"')
+    labels = parts[1::2]
+    count = len(labels)
+
+    # every line contributes exactly one quoted name and three numbers, anything
+    # else means a torn or corrupt line somewhere in the chunk
+    numbers = b''.join(parts[2::2])
+    samples = None
+    if not parts[0] and len(parts) % 2 == 1 and numbers.count(b'\n') == count and numbers.count(b',') == 3 * count:
+        try:
+            samples = np.fromstring(numbers.translate(_SEPARATORS), sep=' ')
+        except ValueError:
+            pass
+        if samples is not None and len(samples) != 3 * count:
+            samples = None
+
+    if samples is None:
+        labels, samples = _parse_lines(chunk)
+        count = len(labels)
+
+    index = {name: i for i, name in enumerate(dict.fromkeys(labels))}
+    codes = np.fromiter(map(index.__getitem__, labels), dtype=np.intp, count=count)
+    names = [name.decode('utf-8', errors='replace') for name in index]
+    return names, codes, samples.reshape(count, 3)
+
+
+def _parse_csv(chunk):
+    """pandas path of parse_chunk, None if the chunk has a line it can not take."""
+    try:
+        frame = pd.read_csv(io.BytesIO(chunk), header=None, names=["name", "value", "raw", "ms"],
+                            skipinitialspace=True, engine="c",
+                            dtype={"name": "category", "value": np.float64, "raw": np.float64, "ms": np.float64})
+    except (ValueError, pd.errors.ParserError, pd.errors.EmptyDataError):
+        return None
+
+    # a line with too few fields comes out padded with NaN
+    samples = frame[["value", "raw", "ms"]].to_numpy()
+    if not len(samples) or np.isnan(samples).any():
+        return None
+
+    # categories are sorted, codes are renumbered in order of appearance
+    codes = frame["name"].cat.codes.to_numpy()
+    if (codes < 0).any():
+        return None
+    present, first = np.unique(codes, return_index=True)
+    order = present[np.argsort(first)]
+    renumber = np.empty(len(frame["name"].cat.categories), dtype=np.intp)
+    renumber[order] = np.arange(len(order))
+    names = [str(frame["name"].cat.categories[code]) for code in order]
+    return names, renumber[codes], samples
+
+
+def _parse_lines(chunk):
+    """Slow path, parses a chunk line by line and skips the bad ones."""
+    labels = []
+    samples = []
+    for line in chunk.split(b'\n'):
+        fields = line.strip().split(b',')
+        if len(fields) != 4:
+            continue
+
+        name = fields[0].strip()
+        if len(name) < 2 or name[:1] != b'"' or name[-1:] != b'"':
+            continue
+
+        try:
+            numbers = [float(field) for field in fields[1:]]
+        except ValueError:
+            continue
+
+        labels.append(name[1:-1])
+        samples.extend(numbers)
+    return labels, np.array(samples, dtype=np.float64)
+
+
+def read_chunks(file, chunk_size=CHUNK_SIZE, tail=True):
+    """Yields the contents of a binary file in chunks of whole lines.
+
+    A final line without a newline (an SD card pulled mid write) is still
+    yielded, the parser drops it if it is incomplete. With `tail` False it
+    is left out, for a file whose last line may still be being written.
+    """
+    rest = b''
+    while True:
+        data = file.read(chunk_size)
+        if not data:
+            break
+
+        end = data.rfind(b'\n')
+        if end < 0:
+            rest += data
+            continue
+
+        yield rest + data[:end + 1]
+        rest = data[end + 1:]
+
+    if tail and rest.strip():
+        yield rest + b'\n'
+
+
+def load_log(filename, chunk_size=CHUNK_SIZE):
+    """Loads an SD log into per sensor NumPy arrays.
+
+    Returns {name: {"X": ms since the first line, "Y": value, "RAW": raw}},
+    X is int64, the rest float64.
+    """
+    pieces = {}
+    start_time = None
+
+    with open(filename, 'rb') as file:
+        for chunk in read_chunks(file, chunk_size):
+            names, codes, samples = parse_chunk(chunk)
+            if not len(codes):
+                continue
+
+            if start_time is None:
+                start_time = int(samples[0, 2])
+
+            # a stable sort by sensor keeps every sensor's samples in file order
+            order = np.argsort(codes, kind='stable')
+            bounds = np.cumsum(np.bincount(codes, minlength=len(names)))[:-1]
+            for name, group in zip(names, np.split(samples[order], bounds)):
+                pieces.setdefault(name, []).append(group)
+
+    data = {}
+    for name, groups in pieces.items():
+        samples = np.concatenate(groups)
+        data[name] = {
+            "X": samples[:, 2].astype(np.int64) - start_time,
+            "Y": samples[:, 0],
+            "RAW": samples[:, 1],
+        }
+    return data
+
+
+def cache_path(filename):
+    """Directory the columnar cache of a log lives in."""
+    return filename + CACHE_SUFFIX
+
+
+def _source_key(filename):
+    stat = os.stat(filename)
+    return {"version": CACHE_VERSION, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def write_cache(filename, data):
+    """Writes a loaded log to its cache directory.
+
+    The cache is built under a temporary name and renamed into place, so an
+    interrupted write never leaves a cache that looks complete.
+    """
+    path = cache_path(filename)
+    temp = path + ".tmp"
+    shutil.rmtree(temp, ignore_errors=True)
+    os.makedirs(temp)
+
+    # sensor names are not safe file names ("OX MFR"), the files are numbered
+    meta = _source_key(filename)
+    meta["sensors"] = list(data)
+    for i, sensor in enumerate(data.values()):
+        for column in COLUMNS:
+            np.save(os.path.join(temp, f"{i}_{column}.npy"), sensor[column])
+
+    with open(os.path.join(temp, "meta.json"), 'w') as file:
+        json.dump(meta, file)
+
+    shutil.rmtree(path, ignore_errors=True)
+    os.rename(temp, path)
+
+
+def read_cache(filename):
+    """Memory maps the cache of a log, or returns None if it is missing or stale."""
+    path = cache_path(filename)
+    try:
+        with open(os.path.join(path, "meta.json"), 'r') as file:
+            meta = json.load(file)
+    except (OSError, ValueError):
+        return None
+
+    sensors = meta.pop("sensors", None)
+    if meta != _source_key(filename) or not isinstance(sensors, list):
+        return None
+
+    data = {}
+    try:
+        for i, name in enumerate(sensors):
+            data[name] = {column: np.load(os.path.join(path, f"{i}_{column}.npy"), mmap_mode='r') for column in COLUMNS}
+    except (OSError, ValueError):
+        return None
+    return data
+
+
+def load_cached(filename, chunk_size=CHUNK_SIZE):
+    """load_log through the columnar cache.
+
+    A fresh cache (same size and modification time as the log) is memory
+    mapped instead of parsing the text. Otherwise the log is parsed and the
+    cache rewritten, a log on read only storage is simply parsed every time.
+    """
+    data = read_cache(filename)
+    if data is not None:
+        return data
+
+    data = load_log(filename, chunk_size)
+    try:
+        write_cache(filename, data)
+    except OSError as e:
+        print(f"Log cache failure | {e}")
+    return data
+
+
+class LogFollower:
+    """Incrementally loads a log that is still being written.
+
+    Keeps the byte offset it has parsed up to, and every `poll()` parses only
+    the complete lines appended since. Samples go into per sensor arrays that
+    grow by doubling, `data` hands out views of their filled part in the same
+    layout load_log returns. `bounds` keeps every sensor's running
+    (x min, x max, y min, y max), so a plot can extend its limits without
+    going over the whole history.
+    """
+
+    def __init__(self, filename, chunk_size=CHUNK_SIZE):
+        self.filename = filename
+        self.chunk_size = chunk_size
+        self.reset()
+
+    def reset(self):
+        """Forgets everything, the next poll starts from the top of the file."""
+        self.offset = 0
+        self.start_time = None
+        self.columns = {} # name -> {"X", "Y", "RAW"} arrays with spare room
+        self.sizes = {}   # name -> filled length of those arrays
+        self.bounds = {}  # name -> (x min, x max, y min, y max)
+
+    def poll(self):
+        """Parses newly appended lines.
+
+        Returns {name: (start, end)}, the rows of each sensor that got
+        samples. After a reset (the log was restarted) they start at 0.
+        """
+        try:
+            size = os.path.getsize(self.filename)
+        except OSError:
+            return {}
+
+        # a log that shrank was restarted (the DAQ truncates it on boot)
+        if size < self.offset:
+            self.reset()
+        if size == self.offset:
+            return {}
+
+        ranges = {}
+        with open(self.filename, 'rb') as file:
+            file.seek(self.offset)
+            # a line still being written is picked up again on the next poll
+            for chunk in read_chunks(file, self.chunk_size, tail=False):
+                self.offset += len(chunk)
+                names, codes, samples = parse_chunk(chunk)
+                if not len(codes):
+                    continue
+
+                if self.start_time is None:
+                    self.start_time = int(samples[0, 2])
+
+                order = np.argsort(codes, kind='stable')
+                bounds = np.cumsum(np.bincount(codes, minlength=len(names)))[:-1]
+                for name, group in zip(names, np.split(samples[order], bounds)):
+                    start, end = self._append(name, group)
+                    ranges[name] = (ranges.get(name, (start,))[0], end)
+        return ranges
+
+    def _append(self, name, rows):
+        used = self.sizes.get(name, 0)
+        columns = self.columns.get(name)
+
+        if columns is None or used + len(rows) > len(columns["X"]):
+            size = max(2 * used + len(rows), 1024)
+            grown = {"X": np.empty(size, dtype=np.int64), "Y": np.empty(size), "RAW": np.empty(size)}
+            if columns is not None:
+                for column in COLUMNS:
+                    grown[column][:used] = columns[column][:used]
+            columns = self.columns[name] = grown
+
+        end = used + len(rows)
+        x = columns["X"][used:end]
+        y = columns["Y"][used:end]
+        x[:] = rows[:, 2].astype(np.int64) - self.start_time
+        y[:] = rows[:, 0]
+        columns["RAW"][used:end] = rows[:, 1]
+        self.sizes[name] = end
+
+        # fmin / fmax skip NaN values, a sensor of only NaN has NaN bounds
+        new = (x.min(), x.max(), np.fmin.reduce(y), np.fmax.reduce(y))
+        old = self.bounds.get(name, new)
+        self.bounds[name] = (min(old[0], new[0]), max(old[1], new[1]),
+                             np.fmin(old[2], new[2]), np.fmax(old[3], new[3]))
+        return used, end
+
+    def sensor(self, name):
+        """Views of one sensor's filled arrays, {"X", "Y", "RAW"} like load_log."""
+        used = self.sizes[name]
+        return {column: values[:used] for column, values in self.columns[name].items()}
+
+    @property
+    def data(self):
+        return {name: self.sensor(name) for name in self.columns}
@@ -0,0 +1,119 @@
+# SARP OTV DAQ GUI
+#
+# telemetry sequence tracking
+#
+# the DAQ numbers its frames (telemetry_seq, "seq" in text frames), counting up
+# by one per frame. a jump forward means frames were lost on the way: lines cut
+# short or garbled at the baud rate, overrun buffers, corrupt binary frames. the
+# same number again is a duplicate and a jump back is the DAQ restarting.
+# lost frames are returned to the reader, which puts a NaN sample in the chart
+# history there so the charts show a break instead of a line across the gap
+
+from collections import deque
+import time
+
+import numpy as np
+
+
+# returned for a frame that was already received
+DUPLICATE = -1
+
+# most recent gaps kept for the summary
+MAX_GAPS = 1000
+
+
+def insert_breaks(x, y, lost):
+    """Puts a NaN sample in front of every sample with frames lost before it.
+
+    `lost` is the per frame result of SequenceTracker.frames(), the NaN
+    sample gets the x of the frame after the gap so x keeps increasing.
+    """
+    before = np.flatnonzero(lost > 0)
+    if not len(before):
+        return x, y
+    return np.insert(x, before, x[before]), np.insert(np.asarray(y, dtype=np.float64), before, np.nan)
+
+
+class SequenceTracker:
+    """Counts lost, duplicated and corrupt telemetry frames of one connection.
+
+    `frame(seq)` takes the number of each frame in the order they arrive and
+    returns how many frames were lost right before it, or DUPLICATE.
+    `frames(seqs)` does the same for a batch of binary frames. Frames that
+    could not be decoded at all are reported with `corrupted()`. All of it
+    runs on the reading thread, the counters are only read elsewhere.
+    """
+
+    def __init__(self):
+        self.last = None
+        self.received = 0
+        self.lost = 0
+        self.gap_count = 0
+        self.duplicates = 0
+        self.resets = 0
+        self.corrupt = 0
+        self.gaps = deque(maxlen=MAX_GAPS) # (monotonic time, first lost seq, frames lost)
+        self.started = time.monotonic()
+
+    def frame(self, seq):
+        seq = int(seq)
+        last, self.last = self.last, seq
+        self.received += 1
+        if last is None:
+            return 0
+
+        step = seq - last
+        if step == 1:
+            return 0
+        if step == 0:
+            self.duplicates += 1
+            self.received -= 1
+            return DUPLICATE
+        if step < 0:
+            # counting starts over after a DAQ reset
+            self.resets += 1
+            return 0
+
+        self.lost += step - 1
+        self.gap_count += 1
+        self.gaps.append((time.monotonic(), last + 1, step - 1))
+        return step - 1
+
+    def frames(self, seqs):
+        """Checks a batch of sequence numbers, returns an array of what frame() would."""
+        seqs = np.asarray(seqs, dtype=np.int64)
+        if not len(seqs):
+            return np.zeros(0, dtype=np.int64)
+
+        first = seqs[0] - 1 if self.last is None else self.last
+        step = np.diff(seqs, prepend=first)
+        lost = np.where(step > 1, step - 1, 0)
+        lost[step == 0] = DUPLICATE
+
+        duplicates = int(np.count_nonzero(step == 0))
+        self.received += len(seqs) - duplicates
+        self.duplicates += duplicates
+        self.resets += int(np.count_nonzero(step < 0))
+        self.lost += int(lost[lost > 0].sum())
+        self.gap_count += int(np.count_nonzero(lost > 0))
+        now = time.monotonic()
+        for i in np.flatnonzero(lost > 0):
+            self.gaps.append((now, int(seqs[i] - lost[i]), int(lost[i])))
+        self.last = int(seqs[-1])
+        return lost
+
+    def corrupted(self, count=1):
+        """Counts frames that arrived too garbled to decode."""
+        self.corrupt += count
+
+    def restart(self):
+        """Forgets the last number, after a replay seek for one."""
+        self.last = None
+
+    def summary(self):
+        expected = self.received + self.lost
+        ratio = self.lost / expected if expected else 0.0
+        longest = max((count for _, _, count in self.gaps), default=0) # of the recent ones
+        return (f"{self.received} frames, {self.lost} lost ({ratio:.2%}) in {self.gap_count} gaps "
+                f"(longest {longest}), {self.duplicates} duplicates, {self.corrupt} corrupt, "
+                f"{self.resets} DAQ restarts")
@@ -0,0 +1,380 @@
+# SARP OTV DAQ GUI
+#
+# session recording of live telemetry and commands
+#
+#   python session.py session.ses [start end]
+#
+# every decoded frame, command and DAQ log line goes into an append only file
+# of fixed size records. the live path only copies a record into a buffer, a
+# writer thread moves the buffer to disk a few times a second. records are
+# checksummed in blocks, and every finished block gets an entry in a sparse
+# time index next to the session (.idx), so a time range is found with a
+# binary search over the index and the blocks it points at, without a scan
+#
+# records are in the order they were taken, and timed with the monotonic clock
+# in seconds since the session started (the wall time of that is in the header)
+
+import json
+import os
+import sys
+import threading
+import time
+import zlib
+from datetime import datetime
+
+import numpy as np
+
+
+MAGIC = b"SARPSES\n"
+VERSION = 1
+HEADER_SIZE = 4096
+
+# records per checksummed block, and per index entry
+BLOCK_RECORDS = 1024
+
+# records buffered in memory before the writer thread gets them
+BUFFER_RECORDS = 8192
+
+# seconds between writes to disk, at most this much is lost in a crash
+FLUSH_INTERVAL = 0.25
+
+KIND_FRAME   = 0
+KIND_COMMAND = 1 # bytes sent to the DAQ
+KIND_LOG     = 2 # text line received from the DAQ
+
+INDEX_ENTRY = np.dtype([
+    ("first", "<u8"), # first record of the block
+    ("count", "<u4"),
+    ("crc",   "<u4"), # CRC-32 of the block's records
+    ("start", "<f8"), # time of its first and last record
+    ("end",   "<f8"),
+])
+
+
+def record_dtype(channels):
+    """Record layout for a session with `channels` channels.
+
+    Frames keep the device time and value of every channel (NaN for channels
+    the frame did not have), commands and log lines keep their text in the
+    bytes of the channel data, `length` long.
+    """
+    return np.dtype([
+        ("time",      "<f8"),
+        ("kind",      "u1"),
+        ("actuators", "u1"),
+        ("length",    "<u2"),
+        ("seq",       "<u4"),
+        ("data",      [("ms", "<u4"), ("value", "<f4")], (channels,)),
+    ])
+
+
+def actuator_byte(states):
+    """Actuator states (0 / 1 per solenoid) packed like the binary frame does."""
+    return sum(int(bit) << i for i, bit in enumerate(states))
+
+
+def session_filename(directory):
+    return os.path.join(directory, datetime.now().strftime("session_%Y%m%d_%H%M%S.ses"))
+
+
+class SessionRecorder:
+    """Appends frames, commands and log lines to a session file.
+
+    `frame()`, `frames()`, `command()` and `log()` may be called from any
+    thread, they only copy the record into a memory buffer. A writer thread
+    appends the buffered records to the file every FLUSH_INTERVAL, keeps the
+    running CRC of the current block and writes an index entry whenever a
+    block fills up. `close()` writes what is left.
+    """
+
+    def __init__(self, filename, channels):
+        self.filename = filename
+        self.channels = list(channels)
+        self.dtype = record_dtype(len(self.channels))
+        self.text_size = self.dtype["data"].itemsize
+
+        self.started = time.monotonic()
+        self.started_wall = time.time()
+
+        self.file = open(filename, "wb")
+        self.index = open(filename + ".idx", "wb")
+        header = json.dumps({
+            "version": VERSION,
+            "record_size": self.dtype.itemsize,
+            "block_records": BLOCK_RECORDS,
+            "channels": self.channels,
+            "started": self.started_wall,
+        }).encode()
+        if len(MAGIC) + len(header) + 1 > HEADER_SIZE:
+            raise ValueError("too many channels for the session header")
+        self.file.write((MAGIC + header).ljust(HEADER_SIZE - 1) + b"\n")
+
+        self.lock = threading.Lock()
+        self.buffer = np.zeros(BUFFER_RECORDS, dtype=self.dtype)
+        self.count = 0
+        self.full = [] # filled buffers the writer has not taken yet
+
+        # writer thread state
+        self.written = 0   # records on disk
+        self.block_crc = 0
+        self.block_start = 0.0
+        self.block_end = 0.0
+
+        self.records = 0
+        self.running = True
+        self.wake = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True, name="SessionWriter")
+        self.thread.start()
+
+    @classmethod
+    def create(cls, directory, channels):
+        """Starts a new session in `directory`, named after the current time."""
+        os.makedirs(directory, exist_ok=True)
+        return cls(session_filename(directory), channels)
+
+    # ============ Live path ============
+
+    def _slots(self, n):
+        # room for n records in the buffer, caller holds the lock
+        if self.count + n > len(self.buffer):
+            self.full.append(self.buffer[:self.count])
+            self.buffer = np.zeros(max(BUFFER_RECORDS, n), dtype=self.dtype)
+            self.count = 0
+            self.wake.set()
+
+        start = self.count
+        self.count += n
+        self.records += n
+        return self.buffer[start:self.count]
+
+    def frame(self, ms, values, actuators=0, seq=0):
+        """Records one frame, `ms` and `values` per channel (ms may be one number)."""
+        with self.lock:
+            record = self._slots(1)
+            record["time"] = time.monotonic() - self.started
+            record["kind"] = KIND_FRAME
+            record["actuators"] = actuators
+            record["seq"] = seq
+            record["data"]["ms"] = ms
+            record["data"]["value"] = values
+
+    def frames(self, ms, values, actuators=0, seq=0):
+        """Records a batch of frames, `ms` and `values` are (frames, channels)."""
+        n = len(values)
+        if n == 0:
+            return
+        with self.lock:
+            records = self._slots(n)
+            records["time"] = time.monotonic() - self.started
+            records["kind"] = KIND_FRAME
+            records["actuators"] = actuators
+            records["seq"] = seq
+            records["data"]["ms"] = ms
+            records["data"]["value"] = values
+
+    def binary(self, frames, index, channels):
+        """Records BINARY_FRAME frames, frame channel `channels[k]` is session channel `index[k]`."""
+        n = len(frames)
+        ms = np.zeros((n, len(self.channels)), dtype=np.uint32)
+        values = np.full((n, len(self.channels)), np.nan, dtype=np.float32)
+        ms[:, index] = frames["data"]["ms"][:, channels]
+        values[:, index] = frames["data"]["value"][:, channels]
+        self.frames(ms, values, frames["actuators"], frames["seq"])
+
+    def decoded(self, decoder, index, x_columns, y_columns, actuators=None, seq=0):
+        """Records the frame in a FrameDecoder, columns as from telemetry.chart_columns."""
+        ms = np.zeros(len(self.channels), dtype=np.uint32)
+        values = np.full(len(self.channels), np.nan, dtype=np.float32)
+        ms[index] = decoder.values[x_columns]
+        values[index] = decoder.values[y_columns]
+        self.frame(ms, values, actuator_byte(actuators) if actuators is not None else 0, seq)
+
+    def _text(self, kind, text):
+        if isinstance(text, str):
+            text = text.encode("utf-8", errors="replace")
+        text = text[:self.text_size]
+        with self.lock:
+            record = self._slots(1)
+            record["time"] = time.monotonic() - self.started
+            record["kind"] = kind
+            record["length"] = len(text)
+            record["data"] = np.frombuffer(text.ljust(self.text_size, b"\0"), dtype=self.dtype["data"].base, count=len(self.channels))
+
+    def command(self, data, latency=None):
+        """Records bytes sent to the DAQ, fits the TxEngine on_write hook."""
+        self._text(KIND_COMMAND, data)
+
+    def log(self, line):
+        """Records a text line from the DAQ."""
+        self._text(KIND_LOG, line)
+
+    # ============ Writer ============
+
+    def _run(self):
+        while self.running:
+            self.wake.wait(FLUSH_INTERVAL)
+            self.wake.clear()
+            self.flush()
+        self.flush()
+
+    def flush(self):
+        """Writes every buffered record, writer thread (or after close) only."""
+        with self.lock:
+            chunks = self.full
+            if self.count:
+                chunks.append(self.buffer[:self.count])
+                self.buffer = np.zeros(BUFFER_RECORDS, dtype=self.dtype)
+                self.count = 0
+            self.full = []
+
+        for chunk in chunks:
+            while len(chunk):
+                # split at block ends, every block is checksummed on its own
+                n = min(len(chunk), BLOCK_RECORDS - self.written % BLOCK_RECORDS)
+                self._write(chunk[:n])
+                chunk = chunk[n:]
+
+        if chunks:
+            self.file.flush()
+            self.index.flush()
+
+    def _write(self, records):
+        data = records.tobytes()
+        self.file.write(data)
+
+        if self.written % BLOCK_RECORDS == 0:
+            self.block_crc = 0
+            self.block_start = float(records["time"][0])
+        self.block_crc = zlib.crc32(data, self.block_crc)
+        self.block_end = float(records["time"][-1])
+        self.written += len(records)
+
+        if self.written % BLOCK_RECORDS == 0:
+            entry = np.array([(self.written - BLOCK_RECORDS, BLOCK_RECORDS, self.block_crc,
+                               self.block_start, self.block_end)], dtype=INDEX_ENTRY)
+            self.index.write(entry.tobytes())
+
+    def close(self):
+        self.running = False
+        self.wake.set()
+        self.thread.join()
+        self.file.close()
+        self.index.close()
+
+
+class Session:
+    """Read only view of a session file, also while it is being recorded.
+
+    Records are memory mapped, nothing is read until it is used. Blocks
+    without an index entry (the last, unfinished one, or all of them if the
+    index is lost) are found by their times like indexed ones.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        with open(filename, "rb") as file:
+            head = file.read(HEADER_SIZE)
+        if not head.startswith(MAGIC):
+            raise ValueError(f"{filename} is not a session file")
+
+        self.header = json.loads(head[len(MAGIC):].strip())
+        if self.header["version"] != VERSION:
+            raise ValueError(f"unsupported session version {self.header['version']}")
+        self.channels = self.header["channels"]
+        self.started = self.header["started"]
+        self.dtype = record_dtype(len(self.channels))
+        self.block_records = self.header["block_records"]
+
+        # a record cut short by a crash is left out
+        count = (os.path.getsize(filename) - HEADER_SIZE) // self.dtype.itemsize
+        self.records = np.memmap(filename, dtype=self.dtype, mode="r", offset=HEADER_SIZE, shape=(count,)) \
+                       if count else np.zeros(0, dtype=self.dtype)
+
+        self.index = np.zeros(0, dtype=INDEX_ENTRY)
+        if os.path.exists(filename + ".idx"):
+            index = np.fromfile(filename + ".idx", dtype=np.uint8)
+            usable = len(index) // INDEX_ENTRY.itemsize * INDEX_ENTRY.itemsize
+            self.index = index[:usable].view(INDEX_ENTRY)
+            self.index = self.index[self.index["first"] + self.index["count"] <= count]
+
+    def __len__(self):
+        return len(self.records)
+
+    @property
+    def duration(self):
+        return float(self.records["time"][-1]) if len(self.records) else 0.0
+
+    def _find(self, t):
+        """First record at or after time t."""
+        # the index narrows it down to one block, the rest is searched in place
+        indexed = int(self.index["first"][-1] + self.index["count"][-1]) if len(self.index) else 0
+        if len(self.index) and t <= self.index["end"][-1]:
+            block = int(np.searchsorted(self.index["end"], t, side="left"))
+            lo = int(self.index["first"][block])
+            hi = lo + int(self.index["count"][block])
+        else:
+            lo, hi = indexed, len(self.records)
+        return lo + int(np.searchsorted(self.records["time"][lo:hi], t, side="left"))
+
+    def range(self, start=None, end=None, kind=None):
+        """Records with start <= time < end, of one kind if given."""
+        lo = 0 if start is None else self._find(start)
+        hi = len(self.records) if end is None else self._find(end)
+        records = self.records[lo:max(lo, hi)]
+        if kind is not None:
+            records = records[records["kind"] == kind]
+        return records
+
+    def frames(self, start=None, end=None):
+        """(time, ms, values, actuators) of the frames in a time range.
+
+        ms and values are (frames, channels) arrays, in `channels` order.
+        """
+        records = self.range(start, end, KIND_FRAME)
+        return records["time"], records["data"]["ms"], records["data"]["value"], records["actuators"]
+
+    def channel(self, name, start=None, end=None):
+        """(time, device ms, value) of one channel, frames that lacked it left out."""
+        records = self.range(start, end, KIND_FRAME)
+        i = self.channels.index(name)
+        values = records["data"]["value"][:, i]
+        keep = ~np.isnan(values)
+        return records["time"][keep], records["data"]["ms"][keep, i], values[keep]
+
+    def texts(self, kind, start=None, end=None):
+        """[(time, text)] of the commands (KIND_COMMAND) or log lines (KIND_LOG)."""
+        records = self.range(start, end, kind)
+        return [(float(record["time"]), record["data"].tobytes()[:record["length"]].decode("utf-8", errors="replace"))
+                for record in records]
+
+    def verify(self):
+        """Checks every indexed block, returns the numbers of the bad ones."""
+        size = self.dtype.itemsize
+        bad = []
+        with open(self.filename, "rb") as file:
+            for i, entry in enumerate(self.index):
+                file.seek(HEADER_SIZE + int(entry["first"]) * size)
+                if zlib.crc32(file.read(int(entry["count"]) * size)) != entry["crc"]:
+                    bad.append(i)
+        return bad
+
+
+def main():
+    session = Session(sys.argv[1])
+    print(f"{session.filename} | started {datetime.fromtimestamp(session.started)}, "
+          f"{session.duration:.1f} s, {len(session)} records, {len(session.index)} indexed blocks")
+    print("Channels |", ", ".join(session.channels))
+
+    bad = session.verify()
+    print(f"Checksums | {len(session.index) - len(bad)} good, {len(bad)} bad {bad if bad else ''}")
+
+    if len(sys.argv) > 3:
+        start, end = float(sys.argv[2]), float(sys.argv[3])
+        times, _, _, _ = session.frames(start, end)
+        print(f"{start:g} s to {end:g} s | {len(times)} frames")
+        for t, text in session.texts(KIND_COMMAND, start, end):
+            print(f"  {t:10.3f} >> {text.strip()}")
+
+
+if __name__ == "__main__":
+    main()
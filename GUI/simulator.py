@@ -0,0 +1,524 @@
+# SARP OTV DAQ GUI
+#
+# virtual DAQ on a pseudo terminal, for testing the GUIs without hardware
+#
+#   python simulator.py [--capstone] [--rate HZ] [--channels N] [--corrupt P]
+#                       [--burst P] [--burst-size N] [--stall P] [--stall-time S]
+#
+# opens a pty and speaks the DAQ_Firmware/main.cpp protocol on it: commands in
+# braces, "log: recieved: ..." echoes, text or binary ({B1}) telemetry frames
+# and the solenoid, fire, abort and pulse sequences. the pty is linked to
+# SIMULATOR_PORT, which the port lists of both GUIs pick up.
+#
+# like the firmware, a frame is sent for every heartbeat ({}) by default. with
+# --rate the simulator streams frames on its own at that rate instead, with
+# no baud rate limit. faults are injected per frame with the given odds
+#
+# with --capstone it is the Capstone controller (XavierSandbox/XavierSandbox.ino)
+# instead: a frame every 100 ms with timeSent, three sensors as plain numbers
+# and three commands as [state, commanded, inProgress], rotating through all
+# of them. commands are lines of 14 comma separated 1 / 0 (or true / false),
+# echoed back as {"received":"..."}
+
+import argparse
+import os
+import pty
+import random
+import select
+import threading
+import time
+import tty
+import zlib
+
+import numpy as np
+
+from telemetry import BINARY_CHANNELS, BINARY_FRAME, BINARY_SYNC_WORD
+from replay import STYLE_DAQ, STYLE_CAPSTONE
+
+
+SIMULATOR_PORT = "/tmp/ttyDAQ"
+
+# solenoid channels, as in DAQ_Firmware/main.cpp
+FMV_CHANNEL = 0
+OMV_CHANNEL = 1
+IGN_CHANNEL = 2
+FVV_CHANNEL = 3
+HBV_CHANNEL = 4
+OPV_CHANNEL = 5
+OBV_CHANNEL = 6
+OVV_CHANNEL = 7
+VALVES = ["FMV", "OMV", "IGN", "FVV", "HBV", "OPV", "OBV", "OVV"]
+
+RTDS = ["RTD0", "RTD1", "RTD2", "RTD3"]
+MFRS = ["OX MFR", "F MFR"]
+
+# the firmware formats log lines into a 64 byte buffer
+LOG_LENGTH = 63
+
+# most frames written in one go when streaming, so commands are still read
+MAX_BATCH = 1000
+
+# the Capstone controller, as in XavierSandbox/XavierSandbox.ino
+CAPSTONE_SENSORS = ["HBPT", "FTPT", "OBPT", "OVPT", "FMPT", "OMPT", "FRMPT",
+                    "FRMRTD", "FMRTD", "HBTT", "OBTT", "LC", "RRTD1", "RRTD2"]
+CAPSTONE_COMMANDS = ["FIRE", "ABORT", "SW ARM", "HW ARM", "HBV", "FVV", "OBV", "OPV", "OVV", "OMV",
+                     "FMV", "IGNITER", "PULSE OX 100ms", "PULSE FUEL 100ms"]
+CAPSTONE_LOOP = 100    # ms between frames
+CAPSTONE_PACKETS = 5   # frames it takes to send every sensor and command
+CAPSTONE_PACKET = 3    # sensors and commands per frame
+
+
+def channel_names(count):
+    """Channels of a text frame, the firmware's first, then made up ones."""
+    names = BINARY_CHANNELS[:count]
+    names += [f"SIM{i}" for i in range(len(names), count)]
+    return names
+
+
+def channel_format(name):
+    """printf format the firmware uses for a channel."""
+    if name in RTDS:
+        return '"%s" : [%%d, %%f, %%d], ' % name
+    if name in MFRS:
+        return '"%s" : [%%d, %%f], ' % name
+    return '"%s" : [%%d, %%f, %%f], ' % name
+
+
+class VirtualDAQ:
+    """Simulated DAQ board behind a pseudo terminal.
+
+    `open()` creates the pty and returns the path of the port end, `serve()`
+    (or `start()` for a background thread) runs it until `stop()`. Counters
+    of what was sent are kept in `frames`, `bytes_sent`, `corrupted`,
+    `bursts` and `stalls`. With `style` STYLE_CAPSTONE it is the Capstone
+    controller, which streams at 10 Hz unless given a `rate`, and has its
+    fixed sensors whatever `channels` says.
+    """
+
+    def __init__(self, rate=0, channels=len(BINARY_CHANNELS), corrupt=0.0, burst=0.0, burst_size=50,
+                 stall=0.0, stall_time=0.5, seed=None, style=STYLE_DAQ):
+        self.style = style
+        self.rate = rate
+        self.names = channel_names(channels)
+        if style == STYLE_CAPSTONE:
+            self.rate = rate or 1000 / CAPSTONE_LOOP
+            self.names = list(CAPSTONE_SENSORS)
+        self.corrupt = corrupt
+        self.burst = burst
+        self.burst_size = burst_size
+        self.stall = stall
+        self.stall_time = stall_time
+
+        self.random = random.Random(seed)
+        rng = np.random.default_rng(seed)
+        self.base = rng.uniform(10, 1000, len(self.names))
+        self.amplitude = self.base * rng.uniform(0.01, 0.1, len(self.names))
+        self.period = rng.uniform(2, 30, len(self.names))
+        self.noise = rng.normal(0, 1, (4096, len(self.names))) * self.amplitude[None, :] * 0.05
+        self.rtd = np.array([name in RTDS for name in self.names])
+        self.mfr = np.array([name in MFRS for name in self.names])
+        self.template = '{"seq" : %d, ' + "".join(channel_format(name) for name in self.names) \
+                        + '"actuators" : [%d, %d, %d, %d, %d, %d, %d, %d]}\n'
+
+        self.actuators = [0] * 8
+        self.command_states = [[False, False, False] for _ in CAPSTONE_COMMANDS] # state, commanded, inProgress
+        self.binary = False
+        self.seq = 0
+        self.started = time.monotonic()
+
+        self.master = None
+        self.slave = None
+        self.path = None
+        self.link = None
+        self.lock = threading.Lock() # one writer at a time, frames stay whole
+        self.running = False
+        self.thread = None
+        self.cancel = threading.Event() # set to stop the running command sequence
+
+        self.frames = 0
+        self.bytes_sent = 0
+        self.corrupted = 0
+        self.bursts = 0
+        self.stalls = 0
+        self.commands = 0
+
+    # ============ Port ============
+
+    def open(self, link=SIMULATOR_PORT):
+        """Creates the pty, returns the path a serial.Serial can open."""
+        self.master, self.slave = pty.openpty()
+        # no echo and no newline translation, bytes pass through untouched
+        tty.setraw(self.slave)
+        self.path = os.ttyname(self.slave)
+
+        if link:
+            try:
+                if os.path.islink(link):
+                    os.remove(link)
+                os.symlink(self.path, link)
+                self.link = link
+            except OSError as e:
+                print(f"Simulator link failure | {e}")
+        return self.path
+
+    def close(self):
+        if self.link is not None and os.path.islink(self.link):
+            os.remove(self.link)
+        for fd in (self.master, self.slave):
+            if fd is not None:
+                os.close(fd)
+        self.master = self.slave = None
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self.serve, daemon=True, name="VirtualDAQ")
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        self.cancel.set()
+        if self.thread is not None:
+            self.thread.join(timeout=1.0)
+
+    def _write(self, data):
+        with self.lock:
+            view = memoryview(data)
+            while view:
+                n = os.write(self.master, view)
+                view = view[n:]
+            self.bytes_sent += len(data)
+
+    def log(self, text):
+        """Sends a "log: " line, cut short like the firmware's buffer does."""
+        self._write(b"log: " + text.encode()[:LOG_LENGTH])
+
+    def printf(self, text):
+        self._write(text.encode()[:LOG_LENGTH])
+
+    # ============ Telemetry ============
+
+    def _values(self, ms):
+        t = ms[:, None] / 1000
+        noise = self.noise[(ms % len(self.noise)).astype(np.int64)]
+        return self.base + self.amplitude * np.sin(2 * np.pi * t / self.period) + noise
+
+    def text_frames(self, ms):
+        """Text frames for an array of timestamps, as one block of bytes."""
+        values = self._values(ms)
+        raws = np.where(self.rtd, np.abs(values) * 100 % 65536, values / 1000)
+        actuators = tuple(self.actuators)
+
+        out = []
+        for k, (stamp, row, raw) in enumerate(zip(ms.tolist(), values.tolist(), raws.tolist())):
+            args = [self.seq + k]
+            for value, r, rtd, mfr in zip(row, raw, self.rtd, self.mfr):
+                if mfr:
+                    args += (stamp, value)
+                else:
+                    args += (stamp, value, int(r) if rtd else r)
+            out.append(self.template % (*args, *actuators))
+        return "".join(out).encode()
+
+    def capstone_frames(self, ms):
+        """Capstone controller frames for an array of timestamps, as one block of bytes."""
+        self._refresh_commands()
+        values = self._values(ms)
+
+        out = []
+        for k, (stamp, row) in enumerate(zip(ms.tolist(), values.tolist())):
+            # the controller counts its loop up before picking the packet
+            packet = (self.seq + k + 1) % CAPSTONE_PACKETS
+            parts = ['"LoopTime":%d' % CAPSTONE_LOOP, '"timeSent":%d' % stamp]
+            for i in range(CAPSTONE_PACKET):
+                sensor = (packet * CAPSTONE_PACKET + i) % len(self.names)
+                parts.append('"%s":%.2f' % (self.names[sensor], row[sensor]))
+            for i in range(CAPSTONE_PACKET):
+                command = (packet * CAPSTONE_PACKET + i) % len(CAPSTONE_COMMANDS)
+                bits = ",".join("true" if bit else "false" for bit in self.command_states[command])
+                parts.append('"%s":[%s]' % (CAPSTONE_COMMANDS[command], bits))
+            out.append("{" + ",".join(parts) + "}\r\n")
+        return "".join(out).encode()
+
+    def binary_frames(self, ms):
+        """Binary frames for an array of timestamps, with valid CRCs."""
+        frames = np.zeros(len(ms), dtype=BINARY_FRAME)
+        count = min(len(self.names), len(BINARY_CHANNELS))
+        values = self._values(ms)[:, :count]
+
+        frames["sync"] = BINARY_SYNC_WORD
+        frames["channels"] = len(BINARY_CHANNELS)
+        frames["seq"] = self.seq + np.arange(len(ms))
+        frames["data"]["ms"][:, :count] = ms[:, None]
+        frames["data"]["value"][:, :count] = values
+        frames["data"]["raw"][:, :count] = values / 1000
+        frames["actuators"] = sum(bit << i for i, bit in enumerate(self.actuators))
+
+        raw = frames.tobytes()
+        size = BINARY_FRAME.itemsize
+        crcs = [zlib.crc32(raw[i * size:(i + 1) * size - 4]) for i in range(len(ms))]
+        frames["crc"] = crcs
+        return frames.tobytes()
+
+    def send_frames(self, count=1):
+        """Sends `count` telemetry frames, faults included."""
+        if self.stall and self.random.random() < self.stall:
+            # the board hangs: nothing goes out and commands wait
+            self.stalls += 1
+            time.sleep(self.stall_time)
+
+        if self.burst and self.random.random() < self.burst:
+            self.bursts += 1
+            count += self.burst_size
+
+        # frames of a batch are spread back over the time they were due in
+        now = (time.monotonic() - self.started) * 1000
+        step = 1000 / self.rate if self.rate else 0
+        ms = (now - np.arange(count - 1, -1, -1) * step).clip(0).astype(np.int64)
+        if self.style == STYLE_CAPSTONE:
+            data = self.capstone_frames(ms)
+        else:
+            data = self.binary_frames(ms) if self.binary else self.text_frames(ms)
+
+        if self.corrupt and self.random.random() < self.corrupt:
+            data = self._corrupt(data)
+
+        self._write(data)
+        self.seq += count
+        self.frames += count
+
+    def _corrupt(self, data):
+        self.corrupted += 1
+        data = bytearray(data)
+        kind = self.random.randrange(3)
+        i = self.random.randrange(len(data) - 1)
+        if kind == 0:
+            data[i] = self.random.randrange(256) # flipped byte
+        elif kind == 1:
+            del data[i:i + self.random.randrange(1, 64)] # lost bytes
+        else:
+            data.insert(i, ord("\n")) # line split in two
+        return bytes(data)
+
+    # ============ Commands ============
+
+    def serve(self):
+        self.running = True
+        self.started = time.monotonic()
+        packet = None
+        line = b""
+        next_frame = self.started
+
+        while self.running:
+            timeout = 0.1
+            if self.rate:
+                timeout = max(next_frame - time.monotonic(), 0)
+
+            readable, _, _ = select.select([self.master], [], [], timeout)
+            if readable:
+                try:
+                    data = os.read(self.master, 4096)
+                except OSError:
+                    data = b""
+
+                if self.style == STYLE_CAPSTONE:
+                    # the controller reads up to each newline
+                    *lines, line = (line + data).split(b"\n")
+                    for command in lines:
+                        self.handle_capstone(command.decode("latin-1"))
+                    data = b""
+
+                # same parsing as the firmware: { starts a packet, } ends it
+                for c in data.decode("latin-1"):
+                    if c == "{":
+                        packet = []
+                    elif c == "}":
+                        if packet is not None:
+                            self.handle("".join(packet))
+                        packet = None
+                    elif packet is not None:
+                        packet.append(c)
+
+            if self.rate:
+                now = time.monotonic()
+                if now >= next_frame:
+                    due = min(int((now - next_frame) * self.rate) + 1, MAX_BATCH)
+                    self.send_frames(due)
+                    next_frame += due / self.rate
+                    # drop what can not be caught up with instead of bursting later
+                    if next_frame < now - 1:
+                        next_frame = now
+
+    def handle(self, command):
+        """Acts on one packet, the text between the braces."""
+        self.commands += 1
+        self.log(f"recieved: {command}\n")
+
+        if command.startswith('"') and ":" in command: # tare
+            name = command.split('"')[1]
+            self.printf(f"taring: {name} to {command.split(':', 1)[1].strip()}\n" if name in self.names
+                        else "Sensor does not exist\n")
+            self.printf("DONE\n")
+
+        elif command.startswith("S"):
+            self.sequence(None)
+            for i, c in enumerate(command[1:9]):
+                self.actuators[i] = int(c == "1")
+
+        elif command.startswith("C"):
+            op = command[1:3]
+            if op == "FI":
+                fire_time, valve_delay = 15000, 480
+                numbers = command[3:].split(",")
+                try:
+                    fire_time = int(numbers[0])
+                    valve_delay = int(numbers[1])
+                except (ValueError, IndexError):
+                    pass
+                self.sequence(self.cmd_fire, fire_time, valve_delay)
+            elif op == "AB":
+                self.sequence(self.cmd_abort)
+            elif op in ("FP", "HP", "OP"):
+                try:
+                    pulse_ms = int(command[3:])
+                except ValueError:
+                    pulse_ms = 100
+                valve, name = {"FP": (FMV_CHANNEL, "Fuel"), "HP": (HBV_CHANNEL, "Helium"), "OP": (OMV_CHANNEL, "Oxygen")}[op]
+                self.sequence(self.cmd_pulse, valve, name, pulse_ms)
+            else:
+                self.printf("Invalid Command\n")
+
+        elif command.startswith("B"):
+            self.binary = command[1:2] == "1"
+            self.log(f"binary telemetry {'on' if self.binary else 'off'}\n")
+
+        elif command.startswith("D"):
+            if command[1:2] == "E":
+                self.log("Ejecting SD Card\n")
+                self.log("Ejected\n")
+            elif command[1:2] == "M":
+                self.log("Mounting SD Card\n")
+                self.log(f"path: {command[2:]}\n")
+                self.log("Mounted Succesfully\n")
+            else:
+                self.log("Disk Command Not Found\n")
+
+        elif not self.rate:
+            # anything else asks for a frame, the heartbeat included
+            self.send_frames()
+
+    def handle_capstone(self, line):
+        """Acts on one line of the Capstone controller's commands."""
+        self.commands += 1
+        self._write(('{"received":"%s"}\r\n' % line).encode("latin-1"))
+
+        for i, token in enumerate(line.split(",")[:len(CAPSTONE_COMMANDS)]):
+            commanded = token.strip() in ("1", "true")
+            state, current, _ = self.command_states[i]
+            if commanded != current:
+                self.command_states[i] = [state, commanded, True]
+
+    def _refresh_commands(self):
+        # the controller completes commands in progress between two frames
+        for i, (state, commanded, in_progress) in enumerate(self.command_states):
+            if in_progress:
+                self.command_states[i] = [commanded, commanded, False]
+
+    def sequence(self, target, *args):
+        """Replaces the running command sequence, like the firmware's cmd_thread."""
+        self.cancel.set()
+        self.cancel = threading.Event()
+        if target is not None:
+            threading.Thread(target=target, args=(self.cancel, *args), daemon=True).start()
+
+    def _step(self, start, text):
+        self.log("(%d ms) %s\n" % ((time.monotonic() - start) * 1000, text))
+
+    def cmd_fire(self, cancel, fire_time_ms, valve_delay_ms):
+        igniter_time = 2800
+        start = time.monotonic()
+        self._step(start, "Firing")
+
+        if fire_time_ms < igniter_time + 200:
+            self._step(start, "Error Firing, fire_time is less than igniter time")
+            return
+        if valve_delay_ms > igniter_time:
+            self._step(start, "Error Firing, valve delay is less than igniter time")
+            return
+
+        steps = [
+            (0,                     [(IGN_CHANNEL, 1)], "igniter on"),
+            (2.0,                   [(FMV_CHANNEL, 1)], "FMV open"),
+            (valve_delay_ms / 1000, [(OMV_CHANNEL, 1)], "OMV open"),
+            (fire_time_ms / 1000,   [(IGN_CHANNEL, 0)], "igniter off"),
+            (0,                     [(OBV_CHANNEL, 0)], "OBV closed"),
+            (0,                     [(OPV_CHANNEL, 1)], "OPV open"),
+            (30.0,                  [(HBV_CHANNEL, 0)], "OPV and HBV closed"),
+            (30.0,                  [(OPV_CHANNEL, 0), (OMV_CHANNEL, 0), (FMV_CHANNEL, 0)], "OPV, OMV and FMV closed"),
+        ]
+        for wait, writes, text in steps:
+            if cancel.wait(wait):
+                return
+            for channel, value in writes:
+                self.actuators[channel] = value
+            self._step(start, text)
+        self._step(start, "Done Firing")
+
+    def cmd_abort(self, cancel):
+        start = time.monotonic()
+        self._step(start, "Aborting")
+        for channel in (OMV_CHANNEL, FMV_CHANNEL, HBV_CHANNEL, OBV_CHANNEL, IGN_CHANNEL):
+            self.actuators[channel] = 0
+        self._step(start, "OMV, FMV, HBV, OBV and IGN closed")
+        self._step(start, "Done Aborting")
+
+    def cmd_pulse(self, cancel, valve, name, pulse_ms):
+        start = time.monotonic()
+        self._step(start, f"Pulsing {name}")
+        self.actuators[valve] = 1
+        self._step(start, f"{VALVES[valve]} Open")
+        # a new command stops the sequence, the valve stays where it is then
+        if cancel.wait(pulse_ms / 1000):
+            return
+        self.actuators[valve] = 0
+        self._step(start, f"{VALVES[valve]} Closed")
+        self._step(start, f"Done Pulsing {name}")
+
+    def stats(self):
+        elapsed = max(time.monotonic() - self.started, 1e-9)
+        return (f"{self.frames} frames ({self.frames / elapsed:.0f}/s), {self.bytes_sent / elapsed / 1e6:.2f} MB/s, "
+                f"{self.commands} commands, {self.corrupted} corrupted, {self.bursts} bursts, {self.stalls} stalls")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Virtual OTV DAQ on a pseudo terminal")
+    parser.add_argument("--capstone", action="store_true", help="be the Capstone controller instead of the OTV DAQ")
+    parser.add_argument("--rate", type=float, default=0, help="frames per second, 0 sends one per heartbeat like the firmware")
+    parser.add_argument("--channels", type=int, default=len(BINARY_CHANNELS), help="channels per text frame")
+    parser.add_argument("--corrupt", type=float, default=0.0, help="odds a write is corrupted")
+    parser.add_argument("--burst", type=float, default=0.0, help="odds a write carries a burst of extra frames")
+    parser.add_argument("--burst-size", type=int, default=50, help="frames in a burst")
+    parser.add_argument("--stall", type=float, default=0.0, help="odds the board stalls before a write")
+    parser.add_argument("--stall-time", type=float, default=0.5, help="seconds a stall lasts")
+    parser.add_argument("--link", default=SIMULATOR_PORT, help="symlink to the port, empty for none")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    daq = VirtualDAQ(args.rate, args.channels, args.corrupt, args.burst, args.burst_size,
+                     args.stall, args.stall_time, args.seed, STYLE_CAPSTONE if args.capstone else STYLE_DAQ)
+    path = daq.open(args.link)
+    print(f"Virtual {'Capstone controller' if args.capstone else 'DAQ'} on {path}" + (f" ({daq.link})" if daq.link else ""))
+
+    daq.start()
+    try:
+        while daq.thread.is_alive():
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        daq.stop()
+        print(daq.stats())
+        daq.close()
+
+
+if __name__ == "__main__":
+    main()
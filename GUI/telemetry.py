@@ -0,0 +1,319 @@
+# SARP OTV DAQ GUI
+#
+# fast decoding of the fixed layout telemetry frames printed by the DAQ
+#
+# every frame the firmware prints has the same keys in the same order, only the
+# numbers change. the first frame is parsed with json.loads to learn the layout,
+# later frames are split on their quotes, checked against the learned keys and
+# have their numbers written straight into one preallocated array
+
+import json
+import zlib
+
+import numpy as np
+
+
+# everything between the keys that is not a number becomes whitespace
+_SEPARATORS = bytes.maketrans(b':,[]{}', b'      ')
+
+
+class FrameDecoder:
+    """Decodes telemetry lines into a preallocated array of floats.
+
+    After a successful `decode()` the numbers of the frame sit in `values`,
+    in frame order. `offset()` / `get()` find a key's numbers in there. Any
+    line that does not match the learned layout goes through json.loads, and
+    becomes the new layout if it is a valid frame, so firmware changes are
+    picked up without a restart. `layout` is bumped every time that happens.
+
+    Keys in `required` (the charts) that the current layout has must be in
+    a new one too, with as many numbers, so a garbled line that still parses
+    (a mangled key, a lost [ms, value, raw] entry) is rejected instead of
+    remapping the charts. `forget()` lets the next frame set the layout
+    again, for a new connection.
+    """
+
+    def __init__(self, required=()):
+        self.required = list(required) # keys a new layout has to keep
+        self.names   = []   # keys in frame order
+        self.offsets = {}   # key -> (index into values, list length or None)
+        self.values  = np.zeros(0)
+        self.layout  = 0
+
+        self.fast = 0       # frames decoded without json.loads
+        self.slow = 0       # frames that needed json.loads
+
+        self._keys = None   # encoded keys, compared against every frame
+        self._bools = False # layout has true / false values
+
+    def decode(self, line):
+        """Decodes one frame (str or bytes) into `values`.
+
+        Raises ValueError (json.JSONDecodeError) if the line is not a frame,
+        `values` is left untouched in that case.
+        """
+        if isinstance(line, str):
+            line = line.encode()
+
+        if self._keys is not None:
+            parts = line.split(b'"')
+            if parts[1::2] == self._keys:
+                numbers = b''.join(parts[2::2])
+                if self._bools:
+                    numbers = numbers.replace(b'true', b'1').replace(b'false', b'0')
+
+                tokens = numbers.translate(_SEPARATORS).split()
+                if len(tokens) == len(self.values):
+                    try:
+                        self.values[:] = tokens
+                        self.fast += 1
+                        return
+                    except ValueError:
+                        pass # let json.loads have a go at it
+
+        self.learn(json.loads(line))
+        self.slow += 1
+
+    def learn(self, parsed):
+        """Takes the layout and values of an already parsed frame."""
+        if not isinstance(parsed, dict):
+            raise ValueError("telemetry frame is not an object")
+
+        names = []
+        offsets = {}
+        numbers = []
+        bools = False
+        for key, value in parsed.items():
+            items = value if isinstance(value, list) else [value]
+            for item in items:
+                if isinstance(item, bool):
+                    bools = True
+                elif not isinstance(item, (int, float)):
+                    raise ValueError(f"unsupported value for {key} in telemetry frame")
+
+            names.append(key)
+            offsets[key] = (len(numbers), len(items) if isinstance(value, list) else None)
+            numbers.extend(items)
+
+        values = np.array(numbers, dtype=np.float64)
+        if names == self.names and len(values) == len(self.values):
+            self.values[:] = values
+            return
+
+        for key in self.required:
+            if key in self.offsets and (key not in offsets or offsets[key][1] != self.offsets[key][1]):
+                raise ValueError(f"telemetry frame lacks {key} of the current layout")
+
+        # quotes inside a key would break splitting frames on them
+        if any('"' in key for key in names):
+            self._keys = None
+        else:
+            self._keys = [json.dumps(key)[1:-1].encode() for key in names]
+
+        self.names = names
+        self.offsets = offsets
+        self.values = values
+        self._bools = bools
+        self.layout += 1
+
+    def forget(self):
+        """Drops the learned layout, the next frame sets a new one."""
+        self.names = []
+        self.offsets = {}
+        self.values = np.zeros(0)
+        self._keys = None
+        self._bools = False
+
+    def offset(self, key, element=0):
+        """Index of `key`'s element in `values`, or -1 if the frame lacks it."""
+        if key not in self.offsets:
+            return -1
+
+        index, count = self.offsets[key]
+        if element >= (1 if count is None else count):
+            return -1
+        return index + element
+
+    def get(self, key):
+        """Returns a scalar key's number, or a view of a list key's numbers."""
+        index, count = self.offsets[key]
+        if count is None:
+            return self.values[index]
+        return self.values[index:index + count]
+
+    def __contains__(self, key):
+        return key in self.offsets
+
+
+def chart_columns(decoder, charts):
+    """Finds the time and value of each chart's [ms, value, raw] entry.
+
+    Returns (chart indexes, time columns, value columns, missing charts) for
+    the decoder's current layout, the arrays only cover the charts it has.
+    """
+    index = []
+    missing = []
+    for i, chart in enumerate(charts):
+        if decoder.offset(chart, 1) < 0:
+            missing.append(chart)
+        else:
+            index.append(i)
+
+    x_columns = [decoder.offset(charts[i], 0) for i in index]
+    y_columns = [decoder.offset(charts[i], 1) for i in index]
+    return np.array(index, dtype=np.int64), np.array(x_columns, dtype=np.int64), np.array(y_columns, dtype=np.int64), missing
+
+
+class LineSplitter:
+    """Splits a serial byte stream into lines.
+
+    Bytes are collected in one reusable bytearray. `feed()` returns every line
+    its data completed, at once, and keeps the unfinished tail for the next
+    call. A tail that grows past `max_line` without a newline is garbage and
+    gets dropped.
+    """
+
+    def __init__(self, max_line=1 << 16):
+        self.buffer = bytearray()
+        self.max_line = max_line
+        self.dropped = 0
+
+    def feed(self, data):
+        """Adds received bytes, returns the completed lines as bytes without the newline."""
+        self.buffer += data
+
+        end = self.buffer.rfind(b'\n')
+        if end < 0:
+            if len(self.buffer) > self.max_line:
+                self.dropped += 1
+                self.buffer.clear()
+            return []
+
+        lines = self.buffer[:end].split(b'\n')
+        del self.buffer[:end + 1]
+        return [bytes(line) for line in lines]
+
+
+# ============ Binary Telemetry ============
+# selected on the DAQ with {B1} (binary) / {B0} (text). layout must match
+# TelemetryFrame in DAQ_Firmware/main.cpp, everything little endian
+
+BINARY_SYNC = b'\xa5\x5a'
+BINARY_SYNC_WORD = 0x5AA5
+
+# channel order of the frame
+BINARY_CHANNELS = ["RTD0", "RTD1", "RTD2", "RTD3",
+                   "HBTT", "FTPT", "OBPT", "OBTT", "HBPT", "OVPT", "OMPT", "PCPT", "FRMPT",
+                   "OX MFR", "F MFR", "LC1"]
+
+BINARY_FRAME = np.dtype([
+    ("sync",      "<u2"),
+    ("channels",  "<u2"),
+    ("seq",       "<u4"),
+    ("data",      [("ms", "<u4"), ("value", "<f4"), ("raw", "<f4")], (len(BINARY_CHANNELS),)),
+    ("actuators", "u1"),
+    ("reserved",  "u1", (3,)),
+    ("crc",       "<u4"),
+])
+
+
+class BinaryFrameReader:
+    """Splits a serial byte stream into binary frames and text lines.
+
+    The DAQ keeps printing text (log lines, tare replies, or whole JSON frames
+    in text mode) alongside binary frames, so both come out of `feed()`. Frames
+    are located by their sync word, and runs of back to back frames are unpacked
+    in one go with NumPy. Frames that fail their CRC are counted and skipped.
+    `binary` is set once a frame turned up, good or corrupt, from then on the
+    CRC is what tells corrupt frames apart.
+    """
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self.text = bytearray()
+        self.binary = False
+
+        self.frames = 0
+        self.corrupt = 0
+
+    def clear(self):
+        """Drops buffered bytes for a new connection, the counters keep running."""
+        self.buffer.clear()
+        self.text.clear()
+        self.binary = False
+
+    def feed(self, data):
+        """Adds received bytes, returns (frames, lines) completed by them.
+
+        frames is a BINARY_FRAME array, lines a list of bytes without the
+        trailing newline.
+        """
+        self.buffer += data
+        size = BINARY_FRAME.itemsize
+        batches = []
+
+        while True:
+            start = self.buffer.find(BINARY_SYNC)
+            if start < 0:
+                # a trailing first sync byte may be the start of the next frame
+                keep = 1 if self.buffer.endswith(BINARY_SYNC[:1]) else 0
+                self.text += self.buffer[:len(self.buffer) - keep]
+                del self.buffer[:len(self.buffer) - keep]
+                break
+
+            self.text += self.buffer[:start]
+            del self.buffer[:start]
+
+            count = len(self.buffer) // size
+            if count == 0:
+                break
+            self.binary = True
+
+            # the leading run of frames that all start with a sync word
+            raw = bytes(self.buffer[:count * size])
+            block = np.frombuffer(raw, dtype=BINARY_FRAME)
+            synced = block["sync"] == BINARY_SYNC_WORD
+            run = count if synced.all() else int(synced.argmin())
+
+            good = np.ones(run, dtype=bool)
+            for i in range(run):
+                good[i] = zlib.crc32(raw[i * size:(i + 1) * size - 4]) == block["crc"][i]
+
+            if good.all():
+                batches.append(block[:run])
+                del self.buffer[:run * size]
+                continue
+
+            # keep the frames before the bad one and drop the bad one up to
+            # the next sync word. a frame that lost bytes is shorter, so the
+            # next sync may be inside its `size` bytes. none of it is text
+            bad = int(good.argmin())
+            batches.append(block[:bad])
+            self.corrupt += 1
+            skip = self.buffer.find(BINARY_SYNC, bad * size + len(BINARY_SYNC), (bad + 1) * size)
+            del self.buffer[:skip if skip >= 0 else (bad + 1) * size]
+
+        frames = np.concatenate(batches) if batches else np.zeros(0, dtype=BINARY_FRAME)
+        self.frames += len(frames)
+
+        lines = []
+        if b'\n' in self.text:
+            *lines, rest = self.text.split(b'\n')
+            self.text = bytearray(rest)
+            lines = [bytes(line) for line in lines]
+        return frames, lines
+
+
+def actuator_bits(frame):
+    """Actuator states of one binary frame as a list of 0 / 1."""
+    return [(int(frame["actuators"]) >> i) & 1 for i in range(8)]
+
+
+def binary_columns(charts):
+    """Maps charts to channels of the binary frame.
+
+    Returns (chart indexes, frame channel indexes) for the charts it carries.
+    """
+    index = [i for i, chart in enumerate(charts) if chart in BINARY_CHANNELS]
+    channels = [BINARY_CHANNELS.index(charts[i]) for i in index]
+    return index, channels
@@ -0,0 +1,8 @@
+# SARP OTV DAQ GUI
+#
+# the GUI modules import each other by name, like when main.py runs from GUI/
+
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
@@ -0,0 +1,58 @@
+# SARP OTV DAQ GUI
+#
+# tests of the rolling statistics against straightforward window by window
+# references
+
+import numpy as np
+import pytest
+from numpy.lib.stride_tricks import sliding_window_view
+
+from analysis import rolling_mean, rolling_std, rolling_min, rolling_max, max_rise, peak_rises
+
+
+@pytest.fixture(scope="module")
+def pressure():
+    """A slow random walk on a large offset, like a PT channel."""
+    rng = np.random.default_rng(8)
+    return 1e5 + np.cumsum(rng.normal(0, 1, 20011))
+
+
+@pytest.mark.parametrize("window", [1, 2, 7, 100, 1000, 20011])
+def test_rolling_against_reference(pressure, window):
+    windows = sliding_window_view(pressure, window)
+    assert np.allclose(rolling_mean(pressure, window), windows.mean(axis=1), rtol=0, atol=1e-8)
+    assert np.allclose(rolling_std(pressure, window), windows.std(axis=1), rtol=0, atol=1e-6)
+    assert np.array_equal(rolling_min(pressure, window), windows.min(axis=1))
+    assert np.array_equal(rolling_max(pressure, window), windows.max(axis=1))
+
+
+def test_flat_data_has_no_spread():
+    y = np.full(5000, 1234.5678)
+    y[2500:] = 1e6 / 3
+    for window in (1, 10, 100):
+        std = rolling_std(y, window)
+        assert np.all(std[:2500 - window + 1] == 0)
+        assert np.all(std[2500:] == 0)
+
+
+def test_short_input():
+    for function in (rolling_mean, rolling_std, rolling_min, rolling_max):
+        assert len(function([1.0, 2.0], 3)) == 0
+        with pytest.raises(ValueError):
+            function([1.0, 2.0], 0)
+
+
+def test_max_rise(pressure):
+    samples = 100
+    rises = [pressure[i + samples] - pressure[i] for i in range(len(pressure) - samples)]
+    i, rise = max_rise(pressure, samples)
+    assert i == int(np.argmax(rises))
+    assert rise == max(rises)
+
+    assert max_rise(np.arange(10.0)[::-1], 3) == (-1, 0.0)
+    assert max_rise(np.arange(10.0), 10) == (-1, 0.0)
+
+
+def test_peak_rises():
+    data = {"FM1": {"Y": np.array([0.0, 1.0, 5.0, 5.0])}, "HBPT": {"Y": np.zeros(4)}}
+    assert peak_rises(data, 1) == {"FM1": (1, 4.0), "HBPT": (-1, 0.0)}
@@ -0,0 +1,113 @@
+# SARP OTV DAQ GUI
+#
+# tests of the simulator's Capstone controller mode through the serial GUI's
+# decode path
+
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pytest
+
+from telemetry import FrameDecoder, LineSplitter
+from cmdtrack import CommandTracker, parse_ack
+from replay import STYLE_CAPSTONE
+from simulator import VirtualDAQ, CAPSTONE_SENSORS, CAPSTONE_COMMANDS
+
+SANDBOX = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "XavierSandbox")
+sys.path.append(SANDBOX)
+from controller import is_echo, read_frame
+
+
+@pytest.fixture(scope="module")
+def config():
+    with open(os.path.join(SANDBOX, "GUIConfig.json")) as file:
+        config = json.load(file)
+    series_index = {graph["data_keys"]: i for i, graph in enumerate(config["graphs"])}
+    return series_index, config["state"]
+
+
+def decode(lines, config):
+    """What SerialGUI's data thread takes from every line."""
+    series_index, state_keys = config
+    decoder = FrameDecoder()
+    frames = []
+    echoes = []
+    for line in lines:
+        if is_echo(line):
+            echoes.append(line)
+        else:
+            frames.append(read_frame(decoder, line, series_index, state_keys))
+    return frames, echoes
+
+
+def test_frames_decode(config):
+    daq = VirtualDAQ(style=STYLE_CAPSTONE, seed=20)
+    assert daq.rate == 10
+    out = bytearray()
+    daq._write = out.extend
+    daq.send_frames(10)
+
+    lines = [line.decode().strip() for line in LineSplitter().feed(bytes(out))]
+    frames, echoes = decode(lines, config)
+    assert len(frames) == 10 and not echoes
+
+    # every sensor and command comes round within five frames
+    graphed = set()
+    commands = set()
+    for sent, samples, states in frames:
+        assert sent is not None
+        assert all(isinstance(value, float) for value in samples.values())
+        graphed |= set(samples)
+        commands |= set(states)
+    assert graphed == set(CAPSTONE_SENSORS) & set(config[0])
+    assert commands == set(CAPSTONE_COMMANDS)
+
+
+def test_commands_through_a_port(config):
+    serial = pytest.importorskip("serial")
+    daq = VirtualDAQ(rate=200, style=STYLE_CAPSTONE, seed=20)
+    path = daq.open(link=None)
+    daq.start()
+    port = serial.Serial(path, timeout=0.05)
+    tracker = CommandTracker(expected_state=None)
+    try:
+        # FIRE and HBV, the way SerialGUI formats its commands
+        command = [0] * len(CAPSTONE_COMMANDS)
+        command[0] = command[4] = True
+        data = (str(command).replace("True", "true").replace("False", "false")
+                .replace("[", "").replace("]", "") + "\n").encode()
+        port.write(data)
+        tracker.sent(data)
+
+        splitter = LineSplitter()
+        lines = []
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline and len(lines) < 40:
+            lines += [line.decode().strip() for line in splitter.feed(port.read(port.in_waiting or 1))]
+    finally:
+        port.close()
+        daq.stop()
+        daq.close()
+
+    frames, echoes = decode([line for line in lines if line], config)
+    assert len(echoes) == 1
+    assert parse_ack(echoes[0]) == "true, 0, 0, 0, true, 0, 0, 0, 0, 0, 0, 0, 0, 0"
+    assert tracker.received(echoes[0])
+
+    times = [sent for sent, _, _ in frames]
+    assert times == sorted(times)
+    fire = [states["FIRE"] for _, _, states in frames if "FIRE" in states]
+    hbv = [states["HBV"] for _, _, states in frames if "HBV" in states]
+    assert fire[-1] == {"currentState": True, "commandedState": True, "inProgress": False}
+    assert hbv[-1]["currentState"] and not hbv[-1]["inProgress"]
+
+
+def test_daq_frames_are_rejected(config):
+    # the OTV DAQ's [ms, value, raw] lists can not go on a graph
+    daq = VirtualDAQ(seed=20)
+    line = daq.text_frames(np.array([1000])).decode().strip()
+    with pytest.raises(ValueError):
+        decode([line], config)
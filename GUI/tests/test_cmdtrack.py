@@ -0,0 +1,104 @@
+# SARP OTV DAQ GUI
+#
+# tests of command round trip matching
+
+import time
+
+from cmdtrack import CommandTracker, ACK, STATE, command_key, parse_ack, solenoid_states
+
+
+def test_command_text():
+    assert command_key(b"{S01000000}\n") == "S01000000"
+    assert solenoid_states("{S01000001}") == (0, 1, 0, 0, 0, 0, 0, 1)
+    assert solenoid_states(b"{CAB}") is None
+    assert solenoid_states("{S0100000}") is None
+
+    assert parse_ack("log: recieved: S01000000") == "S01000000"
+    assert parse_ack(b'{"received":"OPEN_VALVE"}') == "OPEN_VALVE"
+    assert parse_ack("log: recieved: ") is None # heartbeat echo
+    assert parse_ack('{"received": 5') is None
+    assert parse_ack('{"HBPT": 1.0}') is None
+
+
+def test_ack_matches_oldest_command():
+    tracker = CommandTracker()
+    tracker.sent(b"{A1}")
+    tracker.sent(b"{A1}")
+    tracker.sent(b'{"HBPT": 4.500000}')
+
+    assert tracker.received("log: recieved: A1")
+    first, second, tare = tracker.records
+    assert first[ACK] is not None and second[ACK] is None
+
+    # the firmware cuts long echoes short
+    assert tracker.received('log: recieved: "HBPT": 4.5')
+    assert tracker.received("log: recieved: A1")
+    assert not tracker.received("log: recieved: A1") # nothing left to match
+    assert not tracker.received("log: tare: done")
+    assert all(record[ACK] >= 0 for record in tracker.records)
+    assert len(tracker.histograms[ACK]) == 3
+
+
+def test_state_matches_commanded_actuators():
+    tracker = CommandTracker()
+    tracker.sent(b"{S10000000}")
+    tracker.sent(b"{S11000000}")
+    tracker.sent(b"{CAB}")
+
+    tracker.states([0] * 8)
+    tracker.states([1, 0, 0, 0, 0, 0, 0, 0])
+    first, second, abort = tracker.records
+    assert first[STATE] is not None and second[STATE] is None
+
+    tracker.states([1, 1, 0, 0, 0, 0, 0, 0])
+    assert second[STATE] is not None
+    assert abort["expect"] is None and abort[STATE] is None
+    assert tracker._awaiting_state == 0
+    assert len(tracker.histograms[STATE]) == 2
+
+
+def test_expiry():
+    tracker = CommandTracker(timeout=0.05)
+    tracker.sent(b"{A1}")          # never acknowledged
+    tracker.sent(b"{S10000000}")   # acknowledged, the state never shows
+    tracker.sent(b"{A2}")          # completes
+    tracker.received("log: recieved: S10000000")
+    tracker.received("log: recieved: A2")
+
+    time.sleep(0.06)
+    tracker.sent(b"{A3}")
+    assert tracker.timeouts == 2
+    assert [record["command"] for record in tracker.pending] == ["A3"]
+    assert tracker._awaiting_state == 0
+
+    # an expired command is not matched by a late echo
+    assert not tracker.received("log: recieved: A1")
+    assert "4 commands" in tracker.summary()
+
+
+def test_completed_commands_leave_pending_before_timeout():
+    tracker = CommandTracker(timeout=60)
+    tracker.sent(b"{A1}")
+    tracker.received("log: recieved: A1")
+    tracker.sent(b"{A2}")
+    assert [record["command"] for record in tracker.pending] == ["A2"]
+    assert tracker.timeouts == 0
+
+
+def test_export(tmp_path):
+    tracker = CommandTracker()
+    tracker.sent(b"{S10000000}", 0.002)
+    tracker.received("log: recieved: S10000000")
+    tracker.sent(b"{A1}")
+
+    filename = tmp_path / "commands.csv"
+    tracker.export(str(filename))
+    rows = filename.read_text().splitlines()
+    assert rows[0] == "time,command,queue_ms,ack_ms,state_ms"
+    assert rows[1].split(",")[1:3] == ["S10000000", "2.000"]
+    assert rows[1].split(",")[4] == ""
+    assert rows[2].split(",")[3] == ""
+
+    histogram = (tmp_path / "commands_histogram.csv").read_text().splitlines()
+    assert histogram[0] == "from_ms,ack_count,state_count"
+    assert sum(int(row.split(",")[1]) for row in histogram[1:]) == 1
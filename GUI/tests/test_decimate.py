@@ -0,0 +1,81 @@
+# SARP OTV DAQ GUI
+#
+# tests of the min/max chart decimation
+
+import numpy as np
+
+from decimate import MinMaxDecimator, envelope
+from ringbuffer import ChannelStore
+
+
+def reference(x, y, first, bucket):
+    """Min and max point of every whole, aligned bucket of the window, in time order."""
+    out_x, out_y = [], []
+    start = -(-first // bucket) * bucket
+    total = first + len(x)
+    for b in range(start, total - total % bucket, bucket):
+        xs = x[b - first:b - first + bucket]
+        ys = y[b - first:b - first + bucket]
+        for i in sorted((int(np.argmin(ys)), int(np.argmax(ys)))):
+            out_x.append(xs[i])
+            out_y.append(ys[i])
+    return np.array(out_x), np.array(out_y)
+
+
+def test_envelope_keeps_order():
+    x = np.arange(8.0)
+    y = np.array([3, 1, 5, 2, 9, 0, 4, 4.0])
+    out_x, out_y = envelope(x, y, 4)
+    assert list(out_x) == [1, 2, 4, 5]
+    assert list(out_y) == [1, 5, 9, 0]
+
+
+def test_envelope_breaks():
+    x = np.arange(8.0)
+    y = np.array([3, np.nan, 5, 2, 9, 0, 4, 4.0])
+    _, out_y = envelope(x, y, 4)
+    assert out_y[0] == 5 and np.isnan(out_y[1])
+    assert list(out_y[2:]) == [9, 0]
+
+
+def test_long_history_is_decimated():
+    rng = np.random.default_rng(0)
+    store = ChannelStore(1, 20000)
+    decimator = MinMaxDecimator(store, 0)
+    pixels = 400 # 50 samples per bucket
+
+    total = 0
+    for _ in range(60):
+        n = int(rng.integers(1, 3000))
+        store.extend(0, np.arange(total, total + n), rng.normal(0, 1, n))
+        total += n
+
+        out_x, out_y = decimator.series(pixels)
+        x, y, seen = store.snapshot(0)
+        assert len(out_x) <= 2 * pixels + 4
+        # nothing from before the window is drawn, and time runs forward
+        assert out_x[0] >= x[0]
+        assert np.all(np.diff(out_x) >= 0)
+
+        # the cached buckets match reducing the whole window from scratch
+        ref_x, ref_y = reference(x, y, seen - len(x), decimator.bucket)
+        assert np.array_equal(out_x[:len(ref_x)], ref_x)
+        assert np.array_equal(out_y[:len(ref_y)], ref_y)
+    assert total > 2 * store.capacity
+
+
+def test_short_history_is_drawn_as_is():
+    store = ChannelStore(1, 75)
+    store.extend(0, np.arange(75), np.arange(75))
+    out_x, _ = MinMaxDecimator(store, 0).series(400)
+    assert len(out_x) == 75
+
+
+def test_new_width_starts_over():
+    store = ChannelStore(1, 10000)
+    store.extend(0, np.arange(10000), np.sin(np.arange(10000)))
+    decimator = MinMaxDecimator(store, 0)
+    wide = decimator.series(1000)
+    narrow = decimator.series(100)
+    assert len(narrow[0]) < len(wide[0])
+    assert decimator.bucket == 100
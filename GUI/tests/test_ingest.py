@@ -0,0 +1,62 @@
+# SARP OTV DAQ GUI
+#
+# tests of the shared memory sample ring between the ingest process and the GUI
+
+import numpy as np
+import pytest
+
+from ingest import SampleRing, WRITE_COUNT, WRITE_END
+
+
+@pytest.fixture
+def rings():
+    writer = SampleRing(8)
+    reader = SampleRing(8, writer.name)
+    yield writer, reader
+    reader.close()
+    writer.close()
+
+
+def rows(start, end):
+    return np.column_stack((np.zeros(end - start), np.arange(start, end), -np.arange(start, end)))
+
+
+def test_read_what_was_written(rings):
+    writer, reader = rings
+    writer.write(rows(0, 5), [1, 0, 0, 0, 0, 0, 0, 1])
+    got, count, lost = reader.read(0)
+    assert list(got[:, 1]) == [0, 1, 2, 3, 4]
+    assert (count, lost) == (5, 0)
+    assert reader.actuators() == [1, 0, 0, 0, 0, 0, 0, 1]
+
+    # the read wraps around the end of the ring
+    writer.write(rows(5, 11))
+    got, count, lost = reader.read(count)
+    assert list(got[:, 1]) == [5, 6, 7, 8, 9, 10]
+    assert (count, lost) == (11, 0)
+
+
+def test_overrun_is_counted(rings):
+    writer, reader = rings
+    writer.write(rows(0, 5))
+    writer.write(rows(5, 15))
+    got, count, lost = reader.read(0)
+    assert list(got[:, 1]) == list(range(7, 15))
+    assert (count, lost) == (15, 7)
+
+
+def test_records_overwritten_during_the_copy_are_dropped(rings):
+    writer, reader = rings
+    writer.write(rows(0, 8))
+
+    # the writer has started on 3 more, they go over samples 0-2 of the ring
+    writer.header[WRITE_END] = 11
+    writer.records[[0, 1, 2]] = rows(8, 11)
+    got, count, lost = reader.read(0)
+    assert list(got[:, 1]) == [3, 4, 5, 6, 7]
+    assert (count, lost) == (8, 3)
+
+    writer.header[WRITE_COUNT] = 11
+    got, count, lost = reader.read(count)
+    assert list(got[:, 1]) == [8, 9, 10]
+    assert lost == 0
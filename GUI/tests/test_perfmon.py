@@ -0,0 +1,85 @@
+# SARP OTV DAQ GUI
+#
+# tests of the pipeline timing histograms and snapshots
+
+import json
+import time
+
+import numpy as np
+import pytest
+
+from perfmon import PerfMonitor, SpanHistogram, READ, PARSE, RENDER
+
+
+def test_percentiles_within_a_bin():
+    rng = np.random.default_rng(24)
+    samples = rng.lognormal(np.log(2e-3), 1.0, 5000)
+    histogram = SpanHistogram()
+    for seconds in samples:
+        histogram.add(seconds)
+
+    assert histogram.count == len(samples)
+    assert histogram.total == pytest.approx(samples.sum())
+    assert histogram.max == samples.max()
+    for q in (1, 50, 90, 99):
+        exact = np.percentile(samples, q)
+        # the upper edge of its bin, one bin is a factor 10 ** 0.1
+        assert exact * 0.97 <= histogram.percentile(q) <= exact * 10 ** 0.1 * 1.03
+    assert histogram.percentile(100) == samples.max()
+
+
+def test_out_of_range_spans():
+    histogram = SpanHistogram()
+    assert np.isnan(histogram.percentile(50))
+    histogram.add(0.0)
+    histogram.add(1e-9)
+    assert histogram.percentile(50) == 1e-9 # capped at the max
+    histogram.add(100.0)
+    assert histogram.percentile(100) == 100.0
+    assert histogram.counts[0] == 2 and histogram.counts[-1] == 1
+
+
+def test_snapshot():
+    perf = PerfMonitor()
+    perf.watch("tx queue", lambda: 3)
+    perf.watch("broken", lambda: 1 / 0)
+    for _ in range(10):
+        perf.add(READ, 0.001)
+        perf.count("lines", 5)
+    perf.add(PARSE, 0.01)
+    perf.gauge("backlog", 40)
+    perf.gauge("backlog", 10)
+    start = time.perf_counter()
+    assert perf.span(RENDER, start) >= start
+
+    perf.window_start -= 1.0 # an interval of about a second
+    snap = perf.snapshot()
+    assert snap["stages"][READ]["count"] == 10
+    assert snap["stages"][READ]["p50_ms"] == pytest.approx(1.0, rel=0.26)
+    assert snap["stages"][READ]["busy"] == pytest.approx(0.01, rel=0.01)
+    assert snap["stages"][PARSE]["max_ms"] == pytest.approx(10.0)
+    assert snap["rates"]["lines"] == pytest.approx(50, rel=0.01)
+    assert snap["gauges"] == {"backlog": 40, "tx queue": 3}
+    assert "read" in perf.text() and "backlog" in perf.text()
+
+    # every snapshot starts a new interval, totals keep counting
+    perf.count("lines", 2)
+    snap = perf.snapshot()
+    assert snap["stages"] == {}
+    assert snap["totals"]["lines"] == 52
+    assert "backlog" not in snap["gauges"]
+
+
+def test_log_file(tmp_path):
+    filename = tmp_path / "perf.jsonl"
+    perf = PerfMonitor(str(filename), interval=0.05)
+    assert perf.text() == "waiting for data"
+    perf.start()
+    perf.count("frames", 3)
+    time.sleep(0.2)
+    perf.stop()
+
+    snaps = [json.loads(line) for line in filename.read_text().splitlines()]
+    assert len(snaps) >= 3
+    assert snaps[-1]["totals"]["frames"] == 3
+    assert perf.latest == snaps[-1]
@@ -0,0 +1,93 @@
+# SARP OTV DAQ GUI
+#
+# tests of replays through the GUI's receive path
+
+import os
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from replay import Recording, ReplaySerial
+
+
+def write_log(path, duration_ms=1000):
+    """An SD log of HBPT every 20 ms and RTD0 every 90 ms, as sample_log writes them."""
+    with open(path, "w") as file:
+        for ms in range(duration_ms):
+            if ms % 20 == 0:
+                file.write('"HBPT", %f, %f, %d\n' % (60 + ms / 100, 4.5, ms))
+            if ms % 90 == 0:
+                file.write('"RTD0", %f, %d, %d\n' % (45.0, 310, ms))
+    return str(path)
+
+
+@pytest.fixture(scope="module")
+def main():
+    pytest.importorskip("PyQt6")
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PyQt6.QtWidgets import QApplication
+
+    # main.py picks the Qt backend on import, which needs an application to exist
+    app = QApplication.instance() or QApplication([])
+    import main
+    yield main
+    main.ser = None
+
+
+def replay_through(main, ser):
+    """Runs main.serial_rx on `ser` until the whole recording was read."""
+    from perfmon import PerfMonitor
+    from seqtrack import SequenceTracker
+
+    main.history.clear()
+    main.decoder.forget()
+    main.sequence = SequenceTracker()
+    main.perf = PerfMonitor()
+    main.ser = ser
+    main.run_threads = True
+    rx = threading.Thread(target=main.serial_rx, daemon=True)
+    rx.start()
+
+    deadline = time.monotonic() + 10
+    while not ser.finished and time.monotonic() < deadline:
+        time.sleep(0.05)
+    main.run_threads = False
+    rx.join()
+    main.ser = None
+
+
+def test_sd_log_replay(main, tmp_path):
+    log = write_log(tmp_path / "log.txt")
+    recording = Recording.from_log(log)
+    assert "actuators" not in ReplaySerial(log, speed=0)._encode(0, 1).decode()
+
+    ser = ReplaySerial(log, speed=0, timeout=0.1)
+    replay_through(main, ser)
+    assert ser.finished
+    assert main.perf.counters.get("parse errors", 0) == 0
+    assert main.sequence.corrupt == 0
+
+    x, y = main.history.view(main.CHARTS.index("HBPT"))
+    assert len(x) == len(recording.times)
+    assert np.allclose(y[-1], recording.values[-1, recording.channels.index("HBPT")])
+    x, y = main.history.view(main.CHARTS.index("RTD0"))
+    assert np.all(y == 45.0)
+
+
+def test_finished_replay_blocks_like_an_idle_port(tmp_path):
+    ser = ReplaySerial(write_log(tmp_path / "log.txt", 200), speed=0, timeout=0.2)
+    while ser.read(4096):
+        pass
+    assert ser.finished
+
+    start = time.monotonic()
+    assert ser.read(4096) == b""
+    assert time.monotonic() - start >= 0.15
+
+    # replay control still gets through while it waits
+    ser.write(b"{seek 0}\n")
+    start = time.monotonic()
+    assert ser.read(4096)
+    assert time.monotonic() - start < 0.15
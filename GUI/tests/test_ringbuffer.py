@@ -0,0 +1,70 @@
+# SARP OTV DAQ GUI
+#
+# tests of the chart history ring buffers
+
+import numpy as np
+
+from ringbuffer import ChannelStore
+
+
+def test_wraparound():
+    store = ChannelStore(2, 5)
+    expected = []
+    for i in range(23):
+        store.append(0, i, -i)
+        expected.append(i)
+        x, y = store.view(0)
+        assert list(x) == expected[-5:]
+        assert list(y) == [-v for v in expected[-5:]]
+        assert store.last(0) == (i, -i)
+    assert store.size(0) == 5
+    assert store.size(1) == 0
+    assert len(store.view(1)[0]) == 0
+
+
+def test_append_row_and_extend():
+    store = ChannelStore(3, 4)
+    for i in range(3):
+        store.append_row(np.array([0, 2]), np.array([i, i]), np.array([i * 10, i * 20]))
+    store.extend(0, np.arange(3, 10), np.arange(3, 10) * 10)
+    assert list(store.view(0)[0]) == [6, 7, 8, 9]
+    assert list(store.view(0)[1]) == [60, 70, 80, 90]
+    assert list(store.view(2)[1]) == [0, 20, 40]
+    assert store.snapshot(0)[2] == 10
+
+    # a batch larger than the history only keeps its newest samples
+    store.extend(1, np.arange(100), np.arange(100))
+    assert list(store.view(1)[0]) == [96, 97, 98, 99]
+    assert store.snapshot(1)[2] == 100
+
+
+def test_published_view_survives_the_next_append():
+    store = ChannelStore(1, 8)
+    for i in range(8 * 5 + 3):
+        x, y, total = store.snapshot(0)
+        before = x.copy()
+        store.append(0, i, i)
+        # what a reader got hold of is left alone by the writer
+        assert np.array_equal(x, before)
+        assert np.all(np.diff(x) > 0)
+
+
+def test_guard_covers_batches():
+    store = ChannelStore(1, 6, guard=6)
+    store.extend(0, np.arange(9), np.arange(9))
+    x, _, _ = store.snapshot(0)
+    before = x.copy()
+    store.extend(0, np.arange(9, 15), np.arange(9, 15))
+    assert np.array_equal(x, before)
+    assert list(store.view(0)[0]) == list(range(9, 15))
+
+
+def test_clear():
+    store = ChannelStore(2, 3)
+    store.append(0, 1, 1)
+    store.append(1, 1, 1)
+    generation = store.generation[0]
+    store.clear(0)
+    assert store.size(0) == 0
+    assert store.size(1) == 1
+    assert store.generation[0] > generation
@@ -0,0 +1,153 @@
+# SARP OTV DAQ GUI
+#
+# tests of the SD log loader, its cache and the follower of growing logs
+
+import os
+
+import numpy as np
+import pytest
+
+import sdlog
+from sdlog import parse_chunk, load_log, load_cached, read_cache, cache_path, LogFollower
+
+
+LINES = (b'"HBPT", 60.000000, 4.500000, 1000\n'
+         b'"OX MFR", 0.125000, 310.000000, 1005\n'
+         b'"RTD0", 45.000000, 310, 1010\n'
+         b'"HBPT", 60.500000, 4.600000, 1020\n')
+
+
+def write_log(path, count=500):
+    with open(path, "wb") as file:
+        for ms in range(count):
+            file.write(b'"HBPT", %f, %f, %d\n' % (60 + ms / 100, 4.5, ms * 10))
+            if ms % 3 == 0:
+                file.write(b'"RTD0", %f, %d, %d\n' % (45.0 - ms / 7, 310, ms * 10 + 1))
+    return str(path)
+
+
+def test_parse_chunk():
+    names, codes, samples = parse_chunk(LINES)
+    assert names == ["HBPT", "OX MFR", "RTD0"]
+    assert list(codes) == [0, 1, 2, 0]
+    assert samples.shape == (4, 3)
+    assert list(samples[3]) == [60.5, 4.6, 1020]
+
+
+def test_parse_paths_agree(monkeypatch):
+    pytest.importorskip("pandas")
+    chunk = LINES * 50 + b'"LC1", -1.5e3, 2, 9999\n'
+    fast = parse_chunk(chunk)
+    monkeypatch.setattr(sdlog, "pd", None)
+    slow = parse_chunk(chunk)
+
+    assert fast[0] == slow[0]
+    assert np.array_equal(fast[1], slow[1])
+    assert np.array_equal(fast[2], slow[2])
+
+
+def test_torn_lines_are_dropped():
+    chunk = LINES + b'"HBPT", 61.0\n' + b'PT", 1, 2, 3\n' + b'"RTD0", 46.0, 310, 1030\n'
+    names, codes, samples = parse_chunk(chunk)
+    assert names == ["HBPT", "OX MFR", "RTD0"]
+    assert list(codes) == [0, 1, 2, 0, 2]
+    assert samples[-1, 0] == 46.0
+
+
+def test_load_log_chunks(tmp_path):
+    log = write_log(tmp_path / "log.txt")
+    whole = load_log(log)
+    small = load_log(log, chunk_size=100) # chunks split mid line
+    assert list(whole) == ["HBPT", "RTD0"]
+    for name in whole:
+        for column in sdlog.COLUMNS:
+            assert np.array_equal(whole[name][column], small[name][column])
+    assert whole["HBPT"]["X"][0] == 0
+    assert whole["RTD0"]["X"][1] == 31
+
+
+def test_cache_is_reused(tmp_path, monkeypatch):
+    log = write_log(tmp_path / "log.txt")
+    data = load_cached(log)
+    assert os.path.isdir(cache_path(log))
+
+    def no_parsing(*args):
+        raise AssertionError("a fresh cache was parsed again")
+    monkeypatch.setattr(sdlog, "load_log", no_parsing)
+    cached = load_cached(log)
+    assert isinstance(cached["HBPT"]["Y"], np.memmap)
+    assert np.array_equal(cached["RTD0"]["Y"], data["RTD0"]["Y"])
+
+
+def test_cache_goes_stale_when_the_log_grows(tmp_path):
+    log = write_log(tmp_path / "log.txt")
+    load_cached(log)
+    with open(log, "ab") as file:
+        file.write(b'"HBPT", 99.000000, 4.500000, 99999\n')
+    assert read_cache(log) is None
+
+    data = load_cached(log)
+    assert data["HBPT"]["Y"][-1] == 99.0
+    assert read_cache(log) is not None
+
+
+def test_cache_goes_stale_when_the_log_is_touched(tmp_path):
+    log = write_log(tmp_path / "log.txt")
+    load_cached(log)
+    stat = os.stat(log)
+    os.utime(log, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert read_cache(log) is None
+
+
+def test_cache_of_another_version_is_stale(tmp_path, monkeypatch):
+    log = write_log(tmp_path / "log.txt")
+    load_cached(log)
+    monkeypatch.setattr(sdlog, "CACHE_VERSION", sdlog.CACHE_VERSION + 1)
+    assert read_cache(log) is None
+
+
+def test_follower_ranges_and_bounds(tmp_path):
+    log = str(tmp_path / "log.txt")
+    with open(log, "wb") as file:
+        file.write(LINES)
+    follower = LogFollower(log)
+    assert follower.poll() == {"HBPT": (0, 2), "OX MFR": (0, 1), "RTD0": (0, 1)}
+    assert follower.bounds["HBPT"] == (0, 20, 60.0, 60.5)
+
+    with open(log, "ab") as file:
+        file.write(b'"HBPT", 58.0, 4.5, 1100\n"HBPT", nan, 4.5, 1110\n')
+    assert follower.poll() == {"HBPT": (2, 4)}
+    assert follower.bounds["HBPT"] == (0, 110, 58.0, 60.5)
+    assert list(follower.sensor("HBPT")["X"]) == [0, 20, 100, 110]
+    assert follower.poll() == {}
+
+
+def test_follower_waits_for_partial_lines(tmp_path):
+    log = str(tmp_path / "log.txt")
+    with open(log, "wb") as file:
+        file.write(LINES + b'"RTD0", 46.0, 3')
+    follower = LogFollower(log, chunk_size=16)
+    assert set(follower.poll()) == {"HBPT", "OX MFR", "RTD0"}
+    assert follower.offset == len(LINES)
+    assert follower.poll() == {}
+
+    with open(log, "ab") as file:
+        file.write(b'10, 1030\n')
+    assert follower.poll() == {"RTD0": (1, 2)}
+    assert list(follower.sensor("RTD0")["Y"]) == [45.0, 46.0]
+
+
+def test_follower_restarts_on_truncation(tmp_path):
+    log = write_log(tmp_path / "log.txt", 100)
+    follower = LogFollower(log, chunk_size=256)
+    follower.poll()
+    whole = load_log(log)
+    assert np.array_equal(follower.sensor("HBPT")["Y"], whole["HBPT"]["Y"])
+
+    # the DAQ truncates the log on boot
+    with open(log, "wb") as file:
+        file.write(b'"HBPT", 1.0, 4.5, 500\n')
+    assert follower.poll() == {"HBPT": (0, 1)}
+    assert list(follower.data) == ["HBPT"]
+    assert list(follower.sensor("HBPT")["X"]) == [0]
+    assert follower.bounds["HBPT"] == (0, 0, 1.0, 1.0)
@@ -0,0 +1,76 @@
+# SARP OTV DAQ GUI
+#
+# tests of sequence tracking and the chart breaks it leads to
+
+import numpy as np
+
+from seqtrack import SequenceTracker, DUPLICATE, insert_breaks
+
+
+SEQS = [5, 6, 7, 10, 11, 11, 12, 20, 3, 4, 4, 4, 8]
+
+
+def test_frame():
+    tracker = SequenceTracker()
+    results = [tracker.frame(seq) for seq in SEQS]
+    assert results == [0, 0, 0, 2, 0, DUPLICATE, 0, 7, 0, 0, DUPLICATE, DUPLICATE, 3]
+    assert tracker.lost == 12
+    assert tracker.gap_count == 3
+    assert tracker.duplicates == 3
+    assert tracker.resets == 1
+    assert tracker.received == len(SEQS) - 3
+    assert [(first, count) for _, first, count in tracker.gaps] == [(8, 2), (13, 7), (5, 3)]
+
+
+def test_batches_match_single_frames():
+    rng = np.random.default_rng(25)
+    steps = rng.choice([1, 1, 1, 1, 0, 2, 5, -40], size=2000)
+    seqs = np.cumsum(steps) + 1000
+
+    single = SequenceTracker()
+    expected = [single.frame(seq) for seq in seqs]
+
+    batched = SequenceTracker()
+    lost = np.concatenate([batched.frames(batch) for batch in np.array_split(seqs, [1, 7, 8, 500, 1300])])
+    assert list(lost) == expected
+    for counter in ("received", "lost", "gap_count", "duplicates", "resets", "last"):
+        assert getattr(batched, counter) == getattr(single, counter)
+    assert [gap[1:] for gap in batched.gaps] == [gap[1:] for gap in single.gaps]
+
+
+def test_restart_and_corrupt():
+    tracker = SequenceTracker()
+    tracker.frames([1, 2, 3])
+    tracker.restart()
+    assert tracker.frame(90) == 0
+    assert tracker.lost == 0 and tracker.resets == 0
+
+    tracker.corrupted()
+    tracker.corrupted(4)
+    assert tracker.corrupt == 5
+    assert "5 corrupt" in tracker.summary()
+    assert len(tracker.frames([])) == 0
+
+
+def test_insert_breaks():
+    tracker = SequenceTracker()
+    tracker.frame(0)
+    seqs = np.array([1, 2, 5, 6, 6, 9])
+    lost = tracker.frames(seqs)
+    fresh = lost != DUPLICATE
+
+    x = seqs[fresh] * 10.0
+    y = seqs[fresh] + 0.5
+    x, y = insert_breaks(x, y, lost[fresh])
+
+    # a NaN at the x of the frame after each gap, the duplicate left out
+    assert list(x) == [10, 20, 50, 50, 60, 90, 90]
+    assert np.array_equal(np.isnan(y), [False, False, True, False, False, True, False])
+    assert np.all(np.diff(x) >= 0)
+    assert list(y[~np.isnan(y)]) == [1.5, 2.5, 5.5, 6.5, 9.5]
+
+
+def test_no_breaks_returns_the_input():
+    x, y = np.arange(3.0), np.ones(3)
+    out_x, out_y = insert_breaks(x, y, np.zeros(3, dtype=np.int64))
+    assert out_x is x and out_y is y
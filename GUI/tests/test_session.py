@@ -0,0 +1,134 @@
+# SARP OTV DAQ GUI
+#
+# tests of session recording and the time index lookups
+
+import os
+
+import numpy as np
+import pytest
+
+import session
+from session import SessionRecorder, Session, BLOCK_RECORDS, KIND_FRAME, KIND_COMMAND, KIND_LOG
+
+
+CHANNELS = ["HBPT", "RTD0", "OX MFR"]
+
+
+class Clock:
+    """Stands in for the time module, so record times are known."""
+
+    def __init__(self):
+        self.now = 50.0
+
+    def monotonic(self):
+        return self.now
+
+    def time(self):
+        return 1.7e9
+
+
+@pytest.fixture
+def recording(tmp_path, monkeypatch):
+    """A session of 4.5 blocks. Frames come singly and in batches that share
+    a time, some batches straddle a block end, commands and log lines in between.
+    """
+    clock = Clock()
+    monkeypatch.setattr(session, "time", clock)
+    filename = str(tmp_path / "test.ses")
+    recorder = SessionRecorder(filename, CHANNELS)
+
+    rng = np.random.default_rng(21)
+    total = 0
+    while total < 4.5 * BLOCK_RECORDS:
+        clock.now += rng.choice([0.0, 0.001, 0.01, 0.5])
+        n = int(rng.choice([1, 1, 1, 7, 300]))
+        ms = np.full((n, len(CHANNELS)), int(clock.now * 1000), dtype=np.uint32)
+        values = rng.normal(size=(n, len(CHANNELS))).astype(np.float32)
+        values[:, 2] = np.nan
+        recorder.frames(ms, values, 3, np.arange(total, total + n))
+        total += n
+        if rng.random() < 0.05:
+            recorder.command(b"{S01000000}\n")
+            recorder.log("log: recieved: S01000000")
+            total += 2
+    recorder.close()
+    return filename
+
+
+def test_index(recording):
+    ses = Session(recording)
+    assert len(ses) == (os.path.getsize(recording) - session.HEADER_SIZE) // ses.dtype.itemsize
+    assert len(ses) >= 4.5 * BLOCK_RECORDS
+    assert len(ses.index) == len(ses) // BLOCK_RECORDS
+    assert list(ses.index["first"]) == [i * BLOCK_RECORDS for i in range(len(ses.index))]
+    assert np.all(ses.index["start"] <= ses.index["end"])
+    assert ses.verify() == []
+
+
+def lookups(ses):
+    times = np.asarray(ses.records["time"])
+    probes = np.concatenate((times[::37], times[::37] + 0.0005, times[::37] - 0.0005,
+                             ses.index["start"], ses.index["end"], [times[0] - 1, times[-1], times[-1] + 1]))
+    return times, probes
+
+
+def test_find_matches_a_full_search(recording):
+    ses = Session(recording)
+    times, probes = lookups(ses)
+    for t in probes:
+        assert ses._find(t) == int(np.searchsorted(times, t, side="left"))
+
+
+def test_find_without_index(recording):
+    os.remove(recording + ".idx")
+    ses = Session(recording)
+    assert len(ses.index) == 0
+    times, probes = lookups(ses)
+    for t in probes:
+        assert ses._find(t) == int(np.searchsorted(times, t, side="left"))
+
+
+def test_range(recording):
+    ses = Session(recording)
+    times = np.asarray(ses.records["time"])
+    start, end = times[1500], times[3900]
+    records = ses.range(start, end)
+    assert np.all((records["time"] >= start) & (records["time"] < end))
+    assert len(records) == np.count_nonzero((times >= start) & (times < end))
+
+    t, ms, values, actuators = ses.frames(start, end)
+    assert np.all(actuators == 3)
+    _, _, values = ses.channel("OX MFR", start, end)
+    assert len(values) == 0
+    t, _, values = ses.channel("HBPT", start, end)
+    assert len(t) == np.count_nonzero(records["kind"] == KIND_FRAME)
+
+    commands = ses.texts(KIND_COMMAND)
+    assert commands and all(text == "{S01000000}\n" for _, text in commands)
+    assert len(ses.texts(KIND_LOG)) == len(commands)
+    assert len(ses.range(end, start)) == 0
+
+
+def test_crash_leftovers(recording):
+    # a record cut short and an index entry for records that never made it
+    size = os.path.getsize(recording)
+    with open(recording, "r+b") as file:
+        file.truncate(size - 2 * Session(recording).dtype.itemsize - 5)
+    ses = Session(recording)
+    assert len(ses) == (size - session.HEADER_SIZE) // ses.dtype.itemsize - 3
+
+    with open(recording + ".idx", "ab") as file:
+        file.write(np.array([(len(ses), BLOCK_RECORDS, 0, 1e9, 1e9)], dtype=session.INDEX_ENTRY).tobytes()[:-3])
+    assert len(Session(recording).index) == len(ses.index)
+
+
+def test_verify_finds_bad_blocks(recording):
+    ses = Session(recording)
+    offset = session.HEADER_SIZE + (2 * BLOCK_RECORDS + 10) * ses.dtype.itemsize + 20
+    del ses
+    with open(recording, "r+b") as file:
+        file.seek(offset)
+        byte = file.read(1)
+        file.seek(offset)
+        file.write(bytes([byte[0] ^ 0xFF]))
+    assert Session(recording).verify() == [2]
@@ -0,0 +1,159 @@
+# SARP OTV DAQ GUI
+#
+# tests of the frame decoder and the binary frame reader
+
+import zlib
+
+import numpy as np
+import pytest
+
+from telemetry import BINARY_FRAME, BINARY_SYNC, BINARY_SYNC_WORD, BINARY_CHANNELS, BinaryFrameReader, FrameDecoder
+
+
+FRAME = '{"seq" : %d, "HBPT" : [%d, 4.5, 0.1], "RTD0" : [%d, 2.0, 310], "actuators" : [0, 1]}'
+
+
+def test_decoder_layout():
+    decoder = FrameDecoder(["HBPT", "RTD0"])
+    decoder.decode(FRAME % (1, 10, 10))
+    decoder.decode(FRAME % (2, 20, 20))
+    assert decoder.layout == 1
+    assert decoder.fast == 1
+    assert list(decoder.get("HBPT")) == [20, 4.5, 0.1]
+
+    # a new key is a firmware change
+    decoder.decode('{"seq" : 3, "HBPT" : [30, 4.5, 0.1], "RTD0" : [30, 2.0, 310], "OBPT" : [30, 1.0, 0.0], "actuators" : [0, 1]}')
+    assert decoder.layout == 2
+    assert decoder.get("OBPT")[0] == 30
+
+
+def test_decoder_keeps_layout_over_garbled_frames():
+    decoder = FrameDecoder(["HBPT", "RTD0"])
+    decoder.decode(FRAME % (1, 10, 10))
+    for line in ['{"seq" : 2, "HBQT" : [20, 4.5, 0.1], "RTD0" : [20, 2.0, 310], "actuators" : [0, 1]}',
+                 '{"seq" : 2, "HBPT" : [20, 4.5], "RTD0" : [20, 2.0, 310], "actuators" : [0, 1]}',
+                 '{"seq" : 2, "actuators" : [0, 1]}']:
+        with pytest.raises(ValueError):
+            decoder.decode(line)
+    assert decoder.layout == 1
+    assert decoder.get("HBPT")[0] == 10
+
+    # a new connection may bring any layout
+    decoder.forget()
+    decoder.decode('{"HBPT" : [60, 4.5]}')
+    assert decoder.layout == 2
+
+
+def binary_frames(seqs):
+    """Valid binary frames numbered `seqs`, as bytes."""
+    frames = np.zeros(len(seqs), dtype=BINARY_FRAME)
+    frames["sync"] = BINARY_SYNC_WORD
+    frames["channels"] = len(BINARY_CHANNELS)
+    frames["seq"] = seqs
+    frames["data"]["ms"] = np.array(seqs)[:, None] * 10
+    frames["data"]["value"] = np.linspace(-100, 5000, len(BINARY_CHANNELS))
+
+    raw = frames.tobytes()
+    size = BINARY_FRAME.itemsize
+    frames["crc"] = [zlib.crc32(raw[i * size:(i + 1) * size - 4]) for i in range(len(seqs))]
+    return frames.tobytes()
+
+
+def test_frames_and_text():
+    reader = BinaryFrameReader()
+    frames, lines = reader.feed(binary_frames([1, 2]) + b"log: recieved: {B1}\n" + binary_frames([3]))
+    assert list(frames["seq"]) == [1, 2, 3]
+    assert lines == [b"log: recieved: {B1}"]
+    assert reader.corrupt == 0
+
+
+def test_flipped_byte_is_not_text():
+    data = bytearray(binary_frames([1, 2, 3]))
+    data[BINARY_FRAME.itemsize + 40] ^= 0xFF # inside frame 2
+
+    reader = BinaryFrameReader()
+    frames, lines = reader.feed(bytes(data) + b"log: tare: done\n")
+    assert list(frames["seq"]) == [1, 3]
+    assert lines == [b"log: tare: done"]
+    assert reader.corrupt == 1
+
+
+def test_short_frame_followed_by_text():
+    data = bytearray(binary_frames([1, 2]))
+    del data[BINARY_FRAME.itemsize + 30:BINARY_FRAME.itemsize + 50] # frame 2 lost bytes
+
+    reader = BinaryFrameReader()
+    frames, lines = reader.feed(bytes(data) + binary_frames([3]) + b"log: tare: done\n")
+    assert list(frames["seq"]) == [1, 3]
+    assert lines == [b"log: tare: done"]
+    assert reader.corrupt == 1
+
+
+def test_corrupt_frame_split_across_reads():
+    data = bytearray(binary_frames([1, 2]))
+    data[60] ^= 0xFF # inside frame 1
+    data += b"log: recieved: {}\n"
+
+    reader = BinaryFrameReader()
+    seqs = []
+    lines = []
+    for i in range(0, len(data), 37):
+        frames, text = reader.feed(bytes(data[i:i + 37]))
+        seqs += list(frames["seq"])
+        lines += text
+    assert seqs == [2]
+    assert lines == [b"log: recieved: {}"]
+    assert reader.corrupt == 1
+
+
+def test_binary_mode():
+    reader = BinaryFrameReader()
+    reader.feed(b'{"seq" : 1}\n')
+    assert not reader.binary
+    reader.feed(binary_frames([1]))
+    assert reader.binary
+
+    reader.clear()
+    assert not reader.binary
+    assert reader.frames == 1
+
+
+def test_resync_after_noise():
+    reader = BinaryFrameReader()
+    noise = bytes(range(0x30, 0x60)) # printable, no sync word
+    frames, lines = reader.feed(noise + b"\n" + binary_frames([1, 2]))
+    assert list(frames["seq"]) == [1, 2]
+    assert lines == [noise]
+    assert reader.corrupt == 0
+
+
+def test_false_sync_in_noise():
+    # a stray sync word followed by a frame's worth of junk fails the CRC, the
+    # real frame behind it is still found
+    junk = BINARY_SYNC + bytes(BINARY_FRAME.itemsize - 2)
+    reader = BinaryFrameReader()
+    frames, lines = reader.feed(junk + binary_frames([7, 8]))
+    assert list(frames["seq"]) == [7, 8]
+    assert lines == []
+    assert reader.corrupt == 1
+
+
+def test_sync_split_across_reads():
+    data = b"log: ok\n" + binary_frames([1])
+    reader = BinaryFrameReader()
+    frames, lines = reader.feed(data[:9]) # up to the first sync byte
+    assert len(frames) == 0 and lines == [b"log: ok"]
+    frames, lines = reader.feed(data[9:])
+    assert list(frames["seq"]) == [1]
+    assert reader.text == bytearray()
+
+
+def test_every_frame_of_a_run_is_checked():
+    data = bytearray(binary_frames(list(range(10))))
+    for i in (2, 7):
+        data[i * BINARY_FRAME.itemsize + 100] ^= 0x01
+    reader = BinaryFrameReader()
+    frames, lines = reader.feed(bytes(data))
+    assert list(frames["seq"]) == [0, 1, 3, 4, 5, 6, 8, 9]
+    assert lines == []
+    assert reader.corrupt == 2
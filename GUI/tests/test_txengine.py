@@ -0,0 +1,127 @@
+# SARP OTV DAQ GUI
+#
+# tests of the serial transmit engine
+
+import threading
+import time
+
+import pytest
+
+from txengine import TxEngine, HEARTBEAT
+
+
+class FakePort:
+    """Records writes with the time they were made."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.writes = []
+
+    def write(self, data):
+        with self.lock:
+            self.writes.append((time.monotonic(), bytes(data)))
+
+    def flush(self):
+        pass
+
+    def sent(self, heartbeats=False):
+        with self.lock:
+            return [data for _, data in self.writes if heartbeats or data != HEARTBEAT]
+
+
+@pytest.fixture
+def engine():
+    tx = TxEngine(period=0.02, verbose=False)
+    yield tx
+    tx.stop()
+
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.005)
+    return condition()
+
+
+def test_safety_commands_go_first(engine):
+    port = FakePort()
+    engine.attach(port)
+    # queued before the thread runs, so they are all waiting at once
+    for command in (b"{A1}", b"{A2}", b"{CAB}", b"{A3}"):
+        engine.send(command)
+    engine.send(b"{tare}", priority=0)
+    engine.start()
+
+    assert wait_for(lambda: len(port.sent()) == 5)
+    assert port.sent() == [b"{CAB}", b"{tare}", b"{A1}", b"{A2}", b"{A3}"]
+    assert engine.latency.count == 5
+
+
+def test_on_write(engine):
+    port = FakePort()
+    written = []
+    engine.on_write = lambda data, latency: written.append((data, latency))
+    engine.attach(port)
+    engine.start()
+    engine.send(b"{B1}")
+
+    assert wait_for(lambda: written)
+    assert written[0][0] == b"{B1}"
+    assert 0 <= written[0][1] < 1
+
+
+def test_heartbeat_schedule(engine):
+    port = FakePort()
+    engine.start()
+    time.sleep(0.05)
+    assert port.writes == [] # nothing attached yet
+
+    engine.attach(port)
+    time.sleep(0.3)
+    engine.detach()
+    count = len(port.writes)
+    time.sleep(0.1)
+    assert len(port.writes) == count
+
+    # first one right away, then every period on the monotonic clock
+    times = [t for t, data in port.writes]
+    assert all(data == HEARTBEAT for _, data in port.writes)
+    assert 10 <= engine.heartbeats <= 17
+    gaps = [b - a for a, b in zip(times, times[1:])]
+    assert sum(gaps) / len(gaps) == pytest.approx(0.02, abs=0.005)
+
+
+def test_commands_do_not_delay_heartbeats(engine):
+    port = FakePort()
+    engine.attach(port)
+    engine.start()
+    for i in range(20):
+        engine.send(b"{A%d}" % i)
+        time.sleep(0.01)
+    engine.detach()
+
+    times = [t for t, data in port.writes if data == HEARTBEAT]
+    assert len(port.sent()) == 20
+    assert max(b - a for a, b in zip(times, times[1:])) < 0.04
+
+
+def test_without_a_port(engine):
+    engine.start()
+    engine.send(b"{A1}")
+    assert wait_for(lambda: engine.dropped == 1)
+    assert engine.latency.count == 0
+
+
+def test_no_heartbeat():
+    tx = TxEngine(heartbeat=None, verbose=False)
+    port = FakePort()
+    tx.attach(port)
+    tx.start()
+    try:
+        tx.send(b"{A1}")
+        assert wait_for(lambda: port.sent() == [b"{A1}"])
+        time.sleep(0.1)
+        assert port.sent(heartbeats=True) == [b"{A1}"]
+        assert tx.heartbeats == 0
+    finally:
+        tx.stop()
@@ -0,0 +1,165 @@
+# SARP OTV DAQ GUI
+#
+# serial transmit engine shared by the DAQ GUI and the Capstone serial GUI
+#
+# a single thread owns every write to the port. it sleeps on a priority queue
+# until either a command arrives or the next heartbeat is due on the monotonic
+# clock, so it costs nothing while idle and sends a queued command as soon as
+# it is put there. safety commands (abort) are queued ahead of everything else
+
+import itertools
+import queue
+import threading
+import time
+
+
+PRIORITY_SAFETY  = 0
+PRIORITY_COMMAND = 1
+
+# the DAQ resets its keepalive on every packet it receives
+HEARTBEAT = b"{}"
+HEARTBEAT_PERIOD = 0.06
+
+# commands starting with these go out before anything already queued
+SAFETY_COMMANDS = (b"{CAB}",)
+
+
+class LatencyStats:
+    """Running count, mean and max of command queue latencies, in seconds."""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.last = 0.0
+
+    def add(self, latency):
+        self.count += 1
+        self.total += latency
+        self.max = max(self.max, latency)
+        self.last = latency
+
+    def summary(self):
+        if self.count == 0:
+            return "no commands sent"
+        mean = self.total / self.count
+        return f"{self.count} commands, enqueue to write mean {mean * 1000:.2f} ms, max {self.max * 1000:.2f} ms"
+
+
+class TxEngine:
+    """Writes queued commands and periodic heartbeats to a serial port.
+
+    `send()` may be called from any thread. Commands are written in priority
+    order, then in the order they were sent. Nothing is written while no port
+    is attached, commands sent then are dropped (there is no DAQ to act on
+    them). Set `heartbeat` to None for devices that do not need one.
+    """
+
+    def __init__(self, heartbeat=HEARTBEAT, period=HEARTBEAT_PERIOD, safety=SAFETY_COMMANDS, verbose=True):
+        self.heartbeat = heartbeat
+        self.period = period
+        self.safety = tuple(safety)
+        self.verbose = verbose
+
+        self.port = None
+        self.lock = threading.Lock() # held while writing, so detach() waits for it
+        self.queue = queue.PriorityQueue()
+        self.order = itertools.count()
+        self.running = False
+        self.thread = None
+
+        self.latency = LatencyStats()
+        self.heartbeats = 0
+        self.dropped = 0
+        self.errors = 0
+
+        # called with (data, latency) after every command write
+        self.on_write = None
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self._run, daemon=True, name="SerialTX")
+        self.thread.start()
+
+    def stop(self, timeout=1.0):
+        self.running = False
+        self._wake()
+        if self.thread is not None:
+            self.thread.join(timeout)
+
+    def attach(self, port):
+        """Starts writing to `port`, the first heartbeat goes out right away."""
+        self.port = port
+        self._wake()
+
+    def detach(self):
+        """Stops writing, returns once the current write (if any) is done."""
+        with self.lock:
+            self.port = None
+        self._wake()
+
+    def priority(self, data):
+        return PRIORITY_SAFETY if data.startswith(self.safety) else PRIORITY_COMMAND
+
+    def send(self, data, priority=None):
+        """Queues bytes for the port. The priority defaults from the command."""
+        if priority is None:
+            priority = self.priority(data)
+        self.queue.put((priority, next(self.order), time.monotonic(), data))
+
+    def _wake(self):
+        # an empty entry only interrupts the wait so the loop looks at its state
+        self.queue.put((-1, next(self.order), time.monotonic(), None))
+
+    def _write(self, data):
+        """Writes to the attached port, returns False if there is none or it failed."""
+        with self.lock:
+            if self.port is None:
+                return False
+            try:
+                self.port.write(data)
+                self.port.flush()
+                return True
+            except Exception as e:
+                self.errors += 1
+                print(f"TX Error | {e}")
+                return False
+
+    def _run(self):
+        port = None
+        next_heartbeat = 0.0
+
+        while self.running:
+            if self.port is not port:
+                port = self.port
+                next_heartbeat = time.monotonic()
+
+            timeout = None
+            if port is not None and self.heartbeat is not None:
+                timeout = max(next_heartbeat - time.monotonic(), 0)
+
+            try:
+                _, _, queued, data = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                data = None
+
+            if data is not None:
+                if self.port is None:
+                    self.dropped += 1
+                    print("TX dropped | not connected")
+                elif self._write(data):
+                    latency = time.monotonic() - queued
+                    self.latency.add(latency)
+                    if self.verbose:
+                        print(f"sent command ({latency * 1000:.2f} ms)")
+                    if self.on_write is not None:
+                        self.on_write(data, latency)
+
+            now = time.monotonic()
+            if port is not None and port is self.port and self.heartbeat is not None and now >= next_heartbeat:
+                if self._write(self.heartbeat):
+                    self.heartbeats += 1
+                # stay on the schedule, unless the thread fell a whole period behind
+                next_heartbeat += self.period
+                if next_heartbeat < now:
+                    next_heartbeat = now + self.period
@@ -3,8 +3,7 @@ matplotlib.use("TkAgg")
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg, NavigationToolbar2Tk
 from matplotlib.figure import Figure
 from matplotlib import style
-import matplotlib.animation as animation
-import matplotlib.dates as mdates
+import matplotlib.ticker as ticker
 import matplotlib.pyplot as plt
 
 import tkinter as tk
@@ -16,8 +15,24 @@ import threading
 import queue
 import time
 from collections import deque
-import datetime
+import numpy as np
 import ctypes
+import os
+import sys
+
+# the telemetry decoder is shared with the OTV DAQ GUI
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "GUI"))
+from telemetry import FrameDecoder, LineSplitter
+from ringbuffer import ChannelStore
+from txengine import TxEngine, PRIORITY_SAFETY
+from cmdtrack import CommandTracker
+from session import SessionRecorder
+from replay import ReplaySerial, STYLE_CAPSTONE
+
+from livegraph import LiveGraph
+from console import ConsoleWriter
+from dispatch import UIDispatcher, RenderCache
+from controller import is_echo, read_frame
 
 # Color scheme
 BG_COLOR = "#2E2E2E"
@@ -37,37 +52,63 @@ BUTTON_PENDING_BG = "#FFA500"  # Amber for pending state
 override_mutual_rules = False
 
 # Create queues for thread communication
-serial_queue = queue.Queue()
+serial_queue = queue.Queue()  # Batches (lists) of received lines
 data_queue = queue.Queue()
-update_queue = queue.Queue()
-command_queue = queue.Queue()  # New queue for commands
+
+# One thread writes every command, the Capstone controller needs no heartbeat
+tx = TxEngine(heartbeat=None, verbose=False)
+
+# Matches every command with its {"received":...} echo, for round trip latencies
+tracker = CommandTracker(expected_state=None)
+
+# Session file of the current connection, every frame, command and echo goes in
+recorder = None
+
+def on_write(data, latency):
+    tracker.sent(data, latency)
+    if recorder is not None:
+        recorder.command(data)
+
+tx.on_write = on_write
 
 # Thread control
 stop_thread = threading.Event()
 data_thread = None
 serial_thread = None
-update_thread = None
-write_thread = None
 
 # Store the initial connection time and initial time
 initial_connection_time = None  # Will be set once when first data is received
 initial_time = 0
 
+# Decodes incoming frames, learns the key layout from the first one
+frame_decoder = FrameDecoder()
+
+# Remembers what every button, banner and label shows, unchanged updates are skipped
+render = RenderCache()
+
 def get_available_ports():
     """Get list of available COM ports"""
-    ports = serial.tools.list_ports.comports()
-    return [port.device for port in ports]
+    ports = [port.device for port in serial.tools.list_ports.comports()]
+    # The virtual controller (GUI/simulator.py --capstone) while it runs
+    if os.path.exists(simulator_port):
+        ports.append(simulator_port)
+    # A recording to play back instead of a port
+    if replay_file:
+        ports.append(replay_port)
+    return ports
 
 def update_serial_config(port):
     """Update SerialConfig.json with new port"""
     try:
-        with open("SerialConfig.json", 'r') as file:
-            config = json.load(file)
-        config['port'] = port
-        with open("SerialConfig.json", 'w') as file:
-            json.dump(config, file, indent=4)
+        # The replay port is only for this session, the next launch opens the last real port
+        if port != replay_port:
+            with open("SerialConfig.json", 'r') as file:
+                config = json.load(file)
+            config['port'] = port
+            with open("SerialConfig.json", 'w') as file:
+                json.dump(config, file, indent=4)
         # Update the serial port
-        ser.port = port
+        serial_port.port = port
     except Exception as e:
         print(f"Error updating serial config: {e}")
 
@@ -95,158 +136,104 @@ def millis_to_hms(ms):
     s = seconds % 60
     return f"{h:02}:{m:02}:{s:02}"
 
+def seconds_to_hms(seconds, pos=None):
+    """Tick formatter for the graphs' time axis, session seconds as HH:MM:SS"""
+    sign = "-" if seconds < 0 else ""
+    return sign + millis_to_hms(int(round(abs(seconds) * 1000)))
+
 def serial_read_thread():
+    splitter = LineSplitter()
     while not stop_thread.is_set():
         if ser.is_open:
             try:
-                line = ser.readline().decode('utf-8').strip()
-                if line:
-                    serial_queue.put(line)
+                # Everything already received, or wait for the next byte
+                data = ser.read(ser.in_waiting or 1)
+                lines = [line.decode('utf-8', errors='replace').strip() for line in splitter.feed(data)]
+                lines = [line for line in lines if line]
+                if lines:
+                    # One queue operation per batch of lines
+                    serial_queue.put(lines)
             except Exception as e:
                 print(f"Error reading serial: {e}")
         else:
             stop_thread.wait(0.1)
 
-def serial_write_thread():
-    while not stop_thread.is_set():
-        try:
-            if not command_queue.empty():
-                command_str = command_queue.get_nowait()
-                if ser.is_open:
-                    ser.write(bytes(command_str, 'utf-8'))
-                    ser.flush()
-        except Exception as e:
-            print(f"Error in serial write thread: {e}")
-        time.sleep(0.01)  # Small sleep to prevent CPU hogging
-
 def data_processing_thread():
     global initial_time, initial_connection_time
     while not stop_thread.is_set():
         try:
-            # Process serial data
-            while not serial_queue.empty() and not stop_thread.is_set():  # Add stop_thread check here
-                line = serial_queue.get_nowait()
-                try:
-                    # Handle received messages differently
-                    if '"received"' in line:
-                        # Log received message in orange
-                        app.frames[MainPage].console_text.insert("end", f"<< {line}\n", "received")
-                        app.frames[MainPage].console_text.tag_config("received", foreground="#FFA500")  # Orange for received
-                        app.frames[MainPage].console_text.see("end")  # Scroll to bottom
-                        continue
+            # Block until the reader hands over a batch of lines, waking up
+            # now and then to notice stop_thread
+            lines = serial_queue.get(timeout=0.1)
+        except queue.Empty:
+            continue
+        
+        for line in lines:
+            if stop_thread.is_set():
+                break
+            try:
+                # Handle received messages differently
+                if is_echo(line):
+                    # Log received message in orange
+                    app.frames[MainPage].console.write(f"<< {line}\n", "received")
+                    if tracker.received(line):
+                        ui.mark("latency")
+                    if recorder is not None:
+                        recorder.log(line)
+                    continue
                         
-                    newData = json.loads(line)
-                    # Convert milliseconds to datetime for proper x-axis plotting
-                    try:
-                        # Use current time if timestamp is invalid
-                        current_time = datetime.datetime.fromtimestamp(newData['timeSent'] / 1000.0)
-                    except (OSError, ValueError):
-                        current_time = datetime.datetime.now()
-                    
-                    # Set initial_connection_time only once when first data is received
-                    if initial_connection_time is None:
-                        initial_connection_time = current_time
+                # Time the frame was sent in seconds
+                current_time, samples, states = read_frame(frame_decoder, line, series_index, state)
+                if current_time is None:
+                    # Use current time if timestamp is missing or invalid
+                    current_time = time.time()
                     
-                    # If this is the first point after a reconnect, update initial_time
-                    if initial_time == 0:
-                        initial_time = current_time
+                # Set initial_connection_time only once when first data is received
+                if initial_connection_time is None:
+                    initial_connection_time = current_time
                     
-                    # Calculate time relative to the initial connection time
-                    relative_time = current_time - initial_connection_time
-                    # Create a new datetime starting at 00:00:00
-                    timestamp = datetime.datetime.combine(datetime.date.today(), datetime.time(0, 0, 0)) + relative_time
+                # If this is the first point after a reconnect, update initial_time
+                if initial_time == 0:
+                    initial_time = current_time
                     
-                    # Log incoming data at the end
-                    app.frames[MainPage].console_text.insert("end", f"<< {line}\n", "incoming")
-                    app.frames[MainPage].console_text.tag_config("incoming", foreground="#00FF00")  # Green for incoming
-                    app.frames[MainPage].console_text.see("end")  # Scroll to bottom
+                # Seconds since the initial connection, the graphs show them as HH:MM:SS
+                timestamp = current_time - initial_connection_time
                     
-                    for key in newData.keys():
-                        if key in data:
-                            data[key][1].append((timestamp, newData[key]))
-                            if len(data[key][1]) > 1000:
-                                data[key][1] = data[key][1][-1000:]
-                            # Signal that new data is available
-                            update_queue.put(True)
-                        if key in state:
-                            # Handle command state updates
-                            if isinstance(newData[key], list) and len(newData[key]) == 3:
-                                # Update state with all three values in correct order: [state, commandedState, inProgress]
-                                state[key]['currentState'] = newData[key][0]  # First element is state
-                                state[key]['commandedState'] = newData[key][1]  # Second element is commandedState
-                                state[key]['inProgress'] = newData[key][2]  # Third element is inProgress
-                                state[key]['lastUpdated'] = timestamp
-                                # Force immediate button update
-                                if key in buttons:
-                                    if buttons[key]['type'] == 'cmd':
-                                        updateCommandButton(key, toggle=False)
-                                    elif buttons[key]['type'] == 'valve':
-                                        updateValveButton(key, toggle=False)
-                                # Signal that state has been updated
-                                update_queue.put(True)
-                            else:
-                                # Handle non-command state updates
-                                state[key]['currentState'] = newData[key]
-                                state[key]['lastUpdated'] = timestamp
-                                # Signal that state has been updated
-                                update_queue.put(True)
-                except json.JSONDecodeError as e:
-                    # Log invalid data in red at the end
-                    app.frames[MainPage].console_text.insert("end", f"!! Invalid JSON: {line}\n", "error")
-                    app.frames[MainPage].console_text.tag_config("error", foreground="#FF0000")  # Red for errors
-                    app.frames[MainPage].console_text.see("end")  # Scroll to bottom
-        except queue.Empty:
-            pass
-        if not stop_thread.is_set():  # Only sleep if we're not stopping
-            time.sleep(0.01)  # Small sleep to prevent CPU hogging
-
-def update_thread_func():
-    last_update = 0
-    update_interval = 0.1  # Update every 100ms
-    
-    while not stop_thread.is_set():  # Check stop flag at the start of each iteration
-        try:
-            # Check if we need to update
-            current_time = time.time()
-            if current_time - last_update >= update_interval:
-                # Process any pending updates
-                while not update_queue.empty() and not stop_thread.is_set():  # Check stop flag here too
-                    update_queue.get_nowait()
+                # Log incoming data at the end
+                app.frames[MainPage].console.write(f"<< {line}\n", "incoming")
                 
-                # Only update if we haven't been asked to stop
-                if not stop_thread.is_set():
-                    # Update graphs
-                    updateGraphs()
-                    
-                    # Update value labels
-                    for graph_config in gui_config['graphs']:
-                        for j, data_key in enumerate(graph_config['data_keys']):
-                            if data_key in data and data[data_key][1]:
-                                latest_value = data[data_key][1][-1][1]
-                                label = app.frames[MainPage].graph_frames[graph_config['label']][j]
-                                label.config(text=f"{data_key}: {latest_value:.2f}")
+                # Graphed values of the frame for the session, NaN if missing
+                session_values = np.full(len(series_index), np.nan)
                     
-                    # Update buttons
-                    updateButtons()
-                    last_update = current_time
+                for key, value in samples.items():
+                    series.append(series_index[key], timestamp, value)
+                    session_values[series_index[key]] = value
+                    # Redraw the graph on the next UI frame
+                    ui.mark("graphs", key)
+                for key, fields in states.items():
+                    # Command states, or plain values of other state keys
+                    state[key].update(fields)
+                    state[key]['lastUpdated'] = timestamp
+                    # Update the button on the next UI frame
+                    ui.mark("state", key)
                 
-        except Exception as e:
-            print(f"Error in update thread: {e}")
-        
-        # Check stop flag before sleeping
-        if not stop_thread.is_set():
-            time.sleep(0.01)  # Small sleep to prevent CPU hogging
-        else:
-            break  # Exit immediately if stop flag is set
-    
-    print("Update thread exiting cleanly")
+                if recorder is not None:
+                    recorder.frame(max(timestamp, 0) * 1000, session_values)
+            except (ValueError, TypeError) as e:
+                # Log invalid data in red at the end, one bad line never stops the thread
+                app.frames[MainPage].console.write(f"!! Invalid JSON: {line}\n", "error")
 
 def initSerialConnection():
-    global serial_thread, data_thread, update_thread, write_thread, initial_connection_time, initial_time
+    global ser, serial_thread, data_thread, initial_connection_time, initial_time
     if ser.is_open:
         return 1
     else:
         try:
+            # The replay port plays a recording through the same threads as live data
+            if serial_port.port == replay_port and replay_file:
+                ser = ReplaySerial(replay_file, replay_speed, replay_start, style=STYLE_CAPSTONE)
+            else:
+                ser = serial_port
             ser.open()
             # Clear any existing data in the buffer
             ser.reset_input_buffer()
@@ -258,45 +245,14 @@ def initSerialConnection():
                 initial_time = 0
                 
                 # First clear all data points
-                for key in data:
-                    data[key][1].clear()
+                series.clear()
                 
-                # Then clear and reset all figures
-                for graph_config in gui_config['graphs']:
-                    # Get the existing figure
-                    fig = app.frames[MainPage].figures[graph_config['label']]
-                    ax = fig.axes[0]  # Get the existing axis
-                    
-                    # Clear the axis
-                    ax.clear()
-                    
-                    # Reset the subplot properties
-                    ax.set_title(graph_config['label'])
-                    fig.subplots_adjust(top=0.85, bottom=0.2, left=0.15, right=0.95)
-                    ax.set_facecolor(GRAPH_BG)
-                    ax.tick_params(colors=GRAPH_FG, labelsize=8)
-                    ax.xaxis.label.set_color(GRAPH_FG)
-                    ax.yaxis.label.set_color(GRAPH_FG)
-                    ax.title.set_color(GRAPH_FG)
-                    ax.title.set_fontsize(10)
-                    for spine in ax.spines.values():
-                        spine.set_color(GRAPH_FG)
-                    ax.grid(True, linestyle='--', alpha=0.3)
-                    ax.xaxis.set_major_formatter(mdates.DateFormatter('%H:%M:%S'))
-                    plt.setp(ax.get_xticklabels(), rotation=45, ha='right')
-                    
-                    # Update the data reference with the axis
-                    for j, data_key in enumerate(graph_config['data_keys']):
-                        data[data_key] = [ax, list(), graph_config['kwargs']]
-                    
-                    # Force a redraw
-                    fig.canvas.draw()
+                # Then empty every graph, its styling and line are kept
+                for graph in graphs.values():
+                    graph.clear()
                 
                 # Wait a short time to ensure everything is cleared
                 time.sleep(0.1)
-                
-                # Force graph update
-                update_queue.put(True)
             
             # Wait for initial data
             line = ser.readline().decode('utf-8').strip()
@@ -307,28 +263,46 @@ def initSerialConnection():
             # Start all threads
             stop_thread.clear()
             
+            # Record the session before the first line is read, replays are not recorded
+            if ser is serial_port:
+                startSession()
+            
             # Serial reading thread
             serial_thread = threading.Thread(target=serial_read_thread, daemon=True, name="SerialRead")
             serial_thread.start()
             
-            # Serial writing thread
-            write_thread = threading.Thread(target=serial_write_thread, daemon=True, name="SerialWrite")
-            write_thread.start()
+            # Commands go out through the transmit engine
+            tx.attach(ser)
             
             # Data processing thread
             data_thread = threading.Thread(target=data_processing_thread, daemon=True, name="DataProcess")
             data_thread.start()
             
-            # Update thread
-            update_thread = threading.Thread(target=update_thread_func, daemon=True, name="Update")
-            update_thread.start()
-            
             updateButtons()
         except Exception as e:
             print(f"Error opening serial port: {e}")
+            tx.detach()
+            closeSession()
             if ser.is_open:
                 ser.close()
 
+def startSession():
+    """Starts recording a session file for the connection"""
+    global recorder
+    if session_dir:
+        try:
+            recorder = SessionRecorder.create(session_dir, list(series_index))
+            print(f"Recording to {recorder.filename}")
+        except OSError as e:
+            print(f"Error starting session: {e}")
+
+def closeSession():
+    """Writes out and closes the session file of the connection, if any"""
+    global recorder
+    if recorder is not None:
+        rec, recorder = recorder, None
+        rec.close()
+
 def updateSerialButton(state_key, toggle=True):
     if(toggle):
         if ser.is_open:
@@ -341,10 +315,6 @@ def updateSerialButton(state_key, toggle=True):
                 threads_to_join.append(serial_thread)
             if data_thread and data_thread.is_alive():
                 threads_to_join.append(data_thread)
-            if update_thread and update_thread.is_alive():
-                threads_to_join.append(update_thread)
-            if write_thread and write_thread.is_alive():
-                threads_to_join.append(write_thread)
             
             # Join threads with timeout
             for thread in threads_to_join:
@@ -352,14 +322,16 @@ def updateSerialButton(state_key, toggle=True):
                 if thread.is_alive():
                     print(f"Warning: Thread {thread.name} did not terminate properly")
             
+            tx.detach()
             ser.close()
+            closeSession()
             # Enable port selection
             port_dropdown.configure(state="readonly")
         else:
             initSerialConnection()
             # Disable port selection
             port_dropdown.configure(state="disabled")
-    buttons[state_key]['button'].config(
+    render.apply(buttons[state_key]['button'],
         text="Close Serial Connection" if ser.is_open else "Open Serial Connection",
         bg=BUTTON_ACTIVE_BG if ser.is_open else BUTTON_INACTIVE_BG,
         fg=BUTTON_FG
@@ -437,9 +409,9 @@ def updateValveButton(state_key, toggle=True):
                 state[state_key]['commandedState'] = new_commanded_state
                 newCommand[state[state_key]['commandIndex']] = state[state_key]['commandedState']
                 # Update button state immediately
-                buttons[state_key]['button'].config(text=text, bg=bg, fg=fg)
-                # Send command in a separate thread
-                threading.Thread(target=sendCommands, daemon=True).start()
+                render.apply(buttons[state_key]['button'], text=text, bg=bg, fg=fg)
+                # Queue the command, the transmit engine writes it
+                sendCommands()
                 # Clear any error message
                 app.frames[MainPage].error_text.config(text="")
                 # Reset override after successful command
@@ -453,7 +425,7 @@ def updateValveButton(state_key, toggle=True):
                 # Schedule error message to clear after 3 seconds
                 app.frames[MainPage].after(3000, lambda: app.frames[MainPage].error_text.config(text=""))
     
-    buttons[state_key]['button'].config(text=text, bg=bg, fg=fg)
+    render.apply(buttons[state_key]['button'], text=text, bg=bg, fg=fg)
 
 def updateCommandButton(state_key, toggle=True):
     if state[state_key]['currentState'] == None:
@@ -479,10 +451,10 @@ def updateCommandButton(state_key, toggle=True):
             state[state_key]['commandedState'] = not state[state_key]['commandedState']
             newCommand[state[state_key]['commandIndex']] = state[state_key]['commandedState']
             # Update button state immediately
-            buttons[state_key]['button'].config(text=text, bg=bg, fg=fg)
-            # Send command in a separate thread
-            threading.Thread(target=sendCommands, daemon=True).start()
-    buttons[state_key]['button'].config(text=text, bg=bg, fg=fg)
+            render.apply(buttons[state_key]['button'], text=text, bg=bg, fg=fg)
+            # Queue the command, an abort goes out ahead of anything pending
+            sendCommands(PRIORITY_SAFETY if state_key == "ABORT" else None)
+    render.apply(buttons[state_key]['button'], text=text, bg=bg, fg=fg)
 
 def updateButtons():
     for key in buttons.keys():
@@ -493,38 +465,38 @@ def updateButtons():
         elif buttons[key]['type'] == "valve":
             updateValveButton(key, toggle=False)
     
-    # Update HW ARM banner
+    updateArmBanner()
+
+def updateArmBanner():
     if "HW ARM" in state:
         if state["HW ARM"]['currentState'] is None:
-            app.frames[MainPage].hw_arm_banner.config(
+            render.apply(app.frames[MainPage].hw_arm_banner,
                 text="HW ARM [WAITING]",
                 bg=BUTTON_WAITING_BG,
                 fg=BUTTON_WAITING_FG
             )
         else:
             if state["HW ARM"]['inProgress']:
-                app.frames[MainPage].hw_arm_banner.config(
+                render.apply(app.frames[MainPage].hw_arm_banner,
                     text="HW ARM [PENDING]",
                     bg=BUTTON_PENDING_BG,
                     fg=BUTTON_FG
                 )
             else:
                 if state["HW ARM"]['currentState']:
-                    app.frames[MainPage].hw_arm_banner.config(
+                    render.apply(app.frames[MainPage].hw_arm_banner,
                         text="HW ARM [ACTIVE]",
                         bg=BUTTON_ACTIVE_BG,
                         fg=BUTTON_FG
                     )
                 else:
-                    app.frames[MainPage].hw_arm_banner.config(
+                    render.apply(app.frames[MainPage].hw_arm_banner,
                         text="HW ARM [INACTIVE]",
                         bg=BUTTON_INACTIVE_BG,
                         fg=BUTTON_FG
                     )
-        # Force update of the banner
-        app.frames[MainPage].hw_arm_banner.update_idletasks()
 
-def sendCommands():
+def sendCommands(priority=None):
     if ser.is_open:
         try:
             # Convert Python True/False to JSON true/false
@@ -535,128 +507,54 @@ def sendCommands():
             command_str = command_str + '\n'
             
             # Log outgoing command
-            app.frames[MainPage].console_text.insert("end", f">> {command_str}", "outgoing")
-            app.frames[MainPage].console_text.tag_config("outgoing", foreground="#00FFFF")  # Cyan for outgoing
-            app.frames[MainPage].console_text.see("end")  # Scroll to bottom
+            app.frames[MainPage].console.write(f">> {command_str}", "outgoing")
             
             # Queue the command for sending
-            command_queue.put(command_str)
+            tx.send(command_str.encode('utf-8'), priority)
             
         except Exception as e:
             # Log any errors
             error_msg = f"!! Error sending command: {str(e)}\n"
-            app.frames[MainPage].console_text.insert("end", error_msg, "error")
-            app.frames[MainPage].console_text.tag_config("error", foreground="#FF0000")  # Red for errors
-            app.frames[MainPage].console_text.see("end")  # Scroll to bottom
+            app.frames[MainPage].console.write(error_msg, "error")
 
-def updateGraphs():
-    for graph_config in gui_config['graphs']:
-        data_key = graph_config['data_keys']
-        if data_key in data and data[data_key][1]:  # Check data list
-            ax = data[data_key][0]
-            data_list = data[data_key][1]
-            style = data[data_key][2]
-            
-            if len(data_list) > 0:
-                ax.clear()
-                x_vals, y_vals = zip(*data_list)
-                ax.plot(x_vals, y_vals, **style)
-                ax.set_title(graph_config['label'])
-                ax.grid(True, linestyle='--', alpha=0.3)
-                ax.xaxis.set_major_formatter(mdates.DateFormatter('%H:%M:%S'))
-                ax.set_facecolor(GRAPH_BG)
-                ax.tick_params(colors=GRAPH_FG, labelsize=8)
-                ax.xaxis.label.set_color(GRAPH_FG)
-                ax.yaxis.label.set_color(GRAPH_FG)
-                ax.title.set_color(GRAPH_FG)
-                # Adjust title font size based on length
-                title_length = len(graph_config['label'])
-                if title_length > 20:
-                    ax.title.set_fontsize(8)
-                elif title_length > 15:
-                    ax.title.set_fontsize(9)
-                else:
-                    ax.title.set_fontsize(10)
-                for spine in ax.spines.values():
-                    spine.set_color(GRAPH_FG)
-                plt.setp(ax.get_xticklabels(), rotation=45, ha='right')
-                
-                # Set y-axis label using units from config
-                if 'units' in graph_config and graph_config['units']:
-                    ax.set_ylabel(graph_config['units'])
-                
-                # Auto-scale axes
-                ax.relim()
-                ax.autoscale_view()
-                
-                # Set number of ticks (5-10 ticks)
-                ax.xaxis.set_major_locator(mdates.AutoDateLocator(minticks=5, maxticks=10))
-                
-                # Adjust layout to prevent label overlap
-                ax.figure.subplots_adjust(top=0.85, bottom=0.25, left=0.2, right=0.95)
-                
-                # Update the figure
-                ax.figure.canvas.draw_idle()
+def updateLatency(keys=None):
+    """Shows the command round trip latencies"""
+    render.apply(app.frames[MainPage].latency_text, text=tracker.status())
 
-def animate(i):
-    # Process all available data from the queue
-    try:
-        while not serial_queue.empty():
-            line = serial_queue.get_nowait()
-            try:
-                # Skip lines that contain the key 'received'
-                if '"received"' in line:
-                    continue
-                newData = json.loads(line)
-                # Convert milliseconds to datetime for proper x-axis plotting
-                current_time = datetime.datetime.fromtimestamp(newData['timeSent'] / 1000.0)
-                
-                # If this is the first point, set it as the reference time
-                if initial_time == 0:
-                    initial_time = current_time
-                
-                # Calculate time relative to the first point
-                relative_time = current_time - initial_time
-                # Create a new datetime starting at 00:00:00
-                timestamp = datetime.datetime.combine(datetime.date.today(), datetime.time(0, 0, 0)) + relative_time
-                
-                # Log incoming data at the end
-                app.frames[MainPage].console_text.insert("end", f"<< {line}\n", "incoming")
-                app.frames[MainPage].console_text.tag_config("incoming", foreground="#00FF00")  # Green for incoming
-                app.frames[MainPage].console_text.see("end")  # Scroll to bottom
-                
-                for key in newData.keys():
-                    if key in data:
-                        data[key][1].append((timestamp, newData[key]))
-                        if len(data[key][1]) > 1000:
-                            data[key][1] = data[key][1][-1000:]
-                        # Signal that new data is available
-                        update_queue.put(True)
-                    if key in state:
-                        state[key]['lastUpdated'] = timestamp
-                        state[key]['currentState'] = newData[key]
-            except json.JSONDecodeError as e:
-                # Log invalid data in red at the end
-                app.frames[MainPage].console_text.insert("end", f"!! Invalid JSON: {line}\n", "error")
-                app.frames[MainPage].console_text.tag_config("error", foreground="#FF0000")  # Red for errors
-                app.frames[MainPage].console_text.see("end")  # Scroll to bottom
-    except queue.Empty:
-        pass
-    
-    # Update graphs less frequently
-    if i % 2 == 0:  # Update every other frame
-        updateGraphs()
-    
-    # Update value labels
+def exportCommands():
+    """Prints the command latencies and writes them to command_log"""
+    print(f"Commands | {tracker.summary()}")
+    if command_log and tracker.records:
+        try:
+            tracker.export(command_log)
+        except OSError as e:
+            print(f"Error writing {command_log}: {e}")
+
+def updateGraphs(keys=None):
+    """Redraws the graphs and value labels of the given data keys, or all of them"""
     for graph_config in gui_config['graphs']:
         data_key = graph_config['data_keys']
-        if data_key in data and data[data_key][1]:
-            # Get the most recent value
-            latest_value = data[data_key][1][-1][1]
+        if keys is not None and data_key not in keys:
+            continue
+        if data_key in series_index and series.size(series_index[data_key]):
+            # contiguous views of the history, nothing is copied
+            x_vals, y_vals = series.view(series_index[data_key])
+            graphs[data_key].update(x_vals, y_vals)
+            
+            latest_value = series.last(series_index[data_key])[1]
             label = app.frames[MainPage].graph_frames[graph_config['label']][0]
-            label.config(text=f"{data_key}: {latest_value:.2f}")
-    
-    updateButtons()
+            render.apply(label, text=f"{data_key}: {latest_value:.2f}")
+
+def updateState(keys):
+    """Applies state changes from the data thread to their buttons and the HW ARM banner"""
+    for key in keys:
+        if key in buttons:
+            if buttons[key]['type'] == 'cmd':
+                updateCommandButton(key, toggle=False)
+            elif buttons[key]['type'] == 'valve':
+                updateValveButton(key, toggle=False)
+    if "HW ARM" in keys:
+        updateArmBanner()
 
 def initSerialButton(cl, s, key):
     # Create a frame for the port selection and serial button
@@ -726,8 +624,12 @@ def clean_shutdown():
     stop_thread.set()
     
     # Close serial connection if open
+    tx.detach()
+    tx.stop()
+    exportCommands()
     if ser.is_open:
         ser.close()
+    closeSession()
     
     # Clear all queues first
     while not serial_queue.empty():
@@ -740,16 +642,6 @@ def clean_shutdown():
             data_queue.get_nowait()
         except queue.Empty:
             break
-    while not update_queue.empty():
-        try:
-            update_queue.get_nowait()
-        except queue.Empty:
-            break
-    while not command_queue.empty():
-        try:
-            command_queue.get_nowait()
-        except queue.Empty:
-            break
     
     # Wait for threads to finish with a longer timeout
     threads_to_join = []
@@ -757,10 +649,6 @@ def clean_shutdown():
         threads_to_join.append(serial_thread)
     if data_thread and data_thread.is_alive():
         threads_to_join.append(data_thread)
-    if update_thread and update_thread.is_alive():
-        threads_to_join.append(update_thread)
-    if write_thread and write_thread.is_alive():
-        threads_to_join.append(write_thread)
     
     # Join threads with longer timeout
     for thread in threads_to_join:
@@ -826,13 +714,19 @@ class CapstoneGSE(tk.Tk):
     def on_closing(self):
         """Handle window closing"""
         print("Closing application...")
+        print(f"Widget updates | {render.stats()}")
         
         # Stop all threads first
         stop_thread.set()
         
         # Close serial connection if open
+        tx.detach()
+        tx.stop()
+        print(f"TX | {tx.latency.summary()}")
+        exportCommands()
         if ser.is_open:
             ser.close()
+        closeSession()
         
         # Clear all queues first
         while not serial_queue.empty():
@@ -845,16 +739,6 @@ class CapstoneGSE(tk.Tk):
                 data_queue.get_nowait()
             except queue.Empty:
                 break
-        while not update_queue.empty():
-            try:
-                update_queue.get_nowait()
-            except queue.Empty:
-                break
-        while not command_queue.empty():
-            try:
-                command_queue.get_nowait()
-            except queue.Empty:
-                break
         
         # Wait for threads to finish with a longer timeout
         threads_to_join = []
@@ -862,10 +746,6 @@ class CapstoneGSE(tk.Tk):
             threads_to_join.append(serial_thread)
         if data_thread and data_thread.is_alive():
             threads_to_join.append(data_thread)
-        if update_thread and update_thread.is_alive():
-            threads_to_join.append(update_thread)
-        if write_thread and write_thread.is_alive():
-            threads_to_join.append(write_thread)
         
         # Join threads with longer timeout
         for thread in threads_to_join:
@@ -914,7 +794,8 @@ class MainPage(tk.Frame):
         title_frame.grid_columnconfigure(1, weight=0)  # No weight for banner
         title_frame.grid_columnconfigure(2, weight=0)  # No weight for override checkbox
         title_frame.grid_columnconfigure(3, weight=0)  # No weight for error message
-        title_frame.grid_columnconfigure(4, weight=0)  # No weight for exit button
+        title_frame.grid_columnconfigure(4, weight=0)  # No weight for latency readout
+        title_frame.grid_columnconfigure(5, weight=0)  # No weight for exit button
         
         # Title label
         label = tk.Label(title_frame, text="2025 Capstone Hotfire Test Software", 
@@ -951,6 +832,14 @@ class MainPage(tk.Frame):
                                  wraplength=200)  # Wrap text after 200 pixels
         self.error_text.grid(row=0, column=3, padx=10, sticky="ew")
         
+        # Command round trip latency readout
+        self.latency_text = tk.Label(title_frame,
+                                   text=tracker.status(),
+                                   bg=BG_COLOR,
+                                   fg=TEXT_FG,
+                                   font=("Verdana", 8))
+        self.latency_text.grid(row=0, column=4, padx=10, sticky="ew")
+        
         # Exit button in title frame
         exit_button = tk.Button(title_frame, 
                               text="Exit", 
@@ -960,7 +849,7 @@ class MainPage(tk.Frame):
                               activeforeground=BUTTON_FG,
                               command=clean_shutdown,
                               width=8)  # Fixed width for the button
-        exit_button.grid(row=0, column=4, padx=(10,0), sticky="e")
+        exit_button.grid(row=0, column=5, padx=(10,0), sticky="e")
 
         # Left frame for buttons with resizable width
         button_frame = tk.Frame(self, bg=BG_COLOR)
@@ -1118,8 +1007,9 @@ class MainPage(tk.Frame):
         console_scrollbar.grid(row=1, column=1, sticky="ns")
         console_text.configure(yscrollcommand=console_scrollbar.set)
         
-        # Store console reference
+        # Store console reference, lines are written to it in batches
         self.console_text = console_text
+        self.console = ConsoleWriter(console_text, max_lines=console_lines)
 
         # Right frame for graphs
         graph_frame = tk.Frame(self, bg=BG_COLOR)
@@ -1177,18 +1067,18 @@ class MainPage(tk.Frame):
             for spine in ax.spines.values():
                 spine.set_color(GRAPH_FG)
             ax.grid(True, linestyle='--', alpha=0.3)
-            ax.xaxis.set_major_formatter(mdates.DateFormatter('%H:%M:%S'))
+            ax.xaxis.set_major_formatter(ticker.FuncFormatter(seconds_to_hms))
+            # Set number of ticks (5-10 ticks), on round numbers of seconds
+            ax.xaxis.set_major_locator(ticker.MaxNLocator(nbins=8, steps=[1, 2, 3, 5, 6, 10], min_n_ticks=5))
             plt.setp(ax.get_xticklabels(), rotation=45, ha='right')
             
             # Set y-axis label using units from config
             if 'units' in graph_config and graph_config['units']:
                 ax.set_ylabel(graph_config['units'])
             
-            # Store the data reference
-            data[graph_config['data_keys']] = [ax, list(), graph_config['kwargs']]
-            
-            # Create canvas for the graph
+            # Create canvas for the graph, the line is drawn by blitting
             canvas = FigureCanvasTkAgg(fig, graph_container)
+            graphs[graph_config['data_keys']] = LiveGraph(ax, graph_config['kwargs'])
             canvas.draw()
             canvas.get_tk_widget().grid(row=0, column=0, sticky="nsew")
             
@@ -1329,6 +1219,16 @@ button_width = 100
 serial_height = 200  # Default serial monitor height
 max_save_frames = 100
 graph_fps = 30
+history_length = 1000  # Points kept per graph
+console_lines = 2000  # Lines kept in the serial monitor
+ui_interval = 100  # ms between UI updates
+command_log = "commands.csv"  # Commands and their latencies, written on exit
+session_dir = "sessions"  # Session files of every connection, empty to disable
+simulator_port = "/tmp/ttyDAQ"  # Listed with the ports while GUI/simulator.py --capstone runs
+replay_file = ""  # Session (.ses) or SD log.txt offered as the replay port
+replay_speed = 1.0  # 1 plays in real time, 0 as fast as possible
+replay_start = 0.0  # Seconds into the recording to start from
+replay_port = "replay"
 
 with open("GUIConfig.json", 'r') as file:
     gui_config = json.load(file)
@@ -1351,11 +1251,30 @@ if 'max_save_frames' in gui_config:
     max_save_frames = gui_config['max_save_frames']
 if 'graph_fps' in gui_config:
     graph_fps = gui_config['graph_fps']
+if 'history_length' in gui_config:
+    history_length = gui_config['history_length']
+if 'console_lines' in gui_config:
+    console_lines = gui_config['console_lines']
+if 'ui_interval' in gui_config:
+    ui_interval = gui_config['ui_interval']
+if 'command_log' in gui_config:
+    command_log = gui_config['command_log']
+if 'session_dir' in gui_config:
+    session_dir = gui_config['session_dir']
+if 'simulator_port' in gui_config:
+    simulator_port = gui_config['simulator_port']
+if 'replay_file' in gui_config:
+    replay_file = gui_config['replay_file']
+if 'replay_speed' in gui_config:
+    replay_speed = gui_config['replay_speed']
+if 'replay_start' in gui_config:
+    replay_start = gui_config['replay_start']
 
 ser = serial.Serial()
 ser.baudrate=serial_config['baudrate']
 ser.timeout=serial_config['timeout']
 ser.port=serial_config['port']
+serial_port = ser  # ser is swapped for a ReplaySerial while replaying
 
 
 LARGE_FONT= ("Verdana", 12)
@@ -1366,7 +1285,10 @@ buttons = dict()
 
 f = None  # This will be set when MainPage is created
 
-data = dict()
+# Graph history, one fixed size channel per graph
+series_index = {graph_config['data_keys']: i for i, graph_config in enumerate(gui_config['graphs'])}
+series = ChannelStore(len(series_index), history_length)
+graphs = dict()  # data key -> LiveGraph
 state = dict()
 info = dict()
 mutually_exclusive = dict()
@@ -1393,16 +1315,13 @@ app = CapstoneGSE()
 app.geometry(f"{window_width}x{window_height}")  # Set initial window size
 app.minsize(800, 600)  # Minimum window size
 
-# Create animation for each figure with minimal updates
-animations = []
-for fig in app.frames[MainPage].figures.values():
-    ani = animation.FuncAnimation(
-        fig, 
-        lambda i: None, 
-        interval=1000,  # Dummy animation to keep figures alive
-        cache_frame_data=False,  # Disable frame caching
-        save_count=1  # Minimal save count since we're not actually animating
-    )
-    animations.append(ani)
+# Worker threads mark what changed, widgets are updated from the Tk main loop
+ui = UIDispatcher(app, ui_interval)
+ui.register("graphs", updateGraphs)
+ui.register("state", updateState)
+ui.register("latency", updateLatency)
+
+tx.start()
 
+# Graphs are redrawn by LiveGraph when their data changes, no animation timers
 app.mainloop()
\ No newline at end of file
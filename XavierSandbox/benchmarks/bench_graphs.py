@@ -0,0 +1,177 @@
+# SARP 2025 Capstone GSE
+#
+# frames per second of the serial GUI's graphs, rebuilt every frame the way
+# updateGraphs used to against LiveGraph's blitting
+#
+#   python benchmarks/bench_graphs.py [frames] [long frames]
+#
+# draws a 4x4 grid of figures at 1000 points per series, the size of the
+# GUIConfig.json layout with a full history. uses TkAgg when a display is
+# available and falls back to Agg, which renders the same but skips the copy
+# to the screen
+#
+# a window of 1000 points slides past LiveGraph's x headroom every 250 frames,
+# and each time that costs a full redraw. the short run (100 frames) never gets
+# there, so LiveGraph is timed again over the long run (2000 frames), which
+# includes those rescales. rebuilding costs the same every frame, it is only
+# timed over the short run
+
+import os
+import sys
+import datetime
+import time
+
+import numpy as np
+import matplotlib
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+GRID = 4
+POINTS = 1000
+PERIOD = 0.1 # seconds between samples
+
+GRAPH_BG = "#1E1E1E"
+GRAPH_FG = "#FFFFFF"
+
+
+def make_figures(backend):
+    from matplotlib.figure import Figure
+    import matplotlib.dates as mdates
+    import matplotlib.pyplot as plt
+
+    root = None
+    if backend == "TkAgg":
+        import tkinter as tk
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+        root = tk.Tk()
+
+    axes = []
+    for i in range(GRID * GRID):
+        fig = Figure(figsize=(4, 3), dpi=100)
+        fig.patch.set_facecolor(GRAPH_BG)
+        ax = fig.add_subplot(111, title=f"Graph {i}")
+        fig.subplots_adjust(top=0.85, bottom=0.25, left=0.2, right=0.95)
+        ax.set_facecolor(GRAPH_BG)
+        ax.tick_params(colors=GRAPH_FG, labelsize=8)
+        ax.title.set_color(GRAPH_FG)
+        for spine in ax.spines.values():
+            spine.set_color(GRAPH_FG)
+        ax.grid(True, linestyle='--', alpha=0.3)
+        ax.xaxis.set_major_formatter(mdates.DateFormatter('%H:%M:%S'))
+        ax.xaxis.set_major_locator(mdates.AutoDateLocator(minticks=5, maxticks=10))
+        plt.setp(ax.get_xticklabels(), rotation=45, ha='right')
+
+        if root is not None:
+            canvas = FigureCanvasTkAgg(fig, root)
+            canvas.get_tk_widget().grid(row=i // GRID, column=i % GRID)
+        else:
+            from matplotlib.backends.backend_agg import FigureCanvasAgg
+            FigureCanvasAgg(fig)
+        fig.canvas.draw()
+        axes.append(ax)
+
+    if root is not None:
+        root.update()
+    return root, axes
+
+
+def signals(frames):
+    """x (date numbers) and y of every graph, long enough for `frames` frames."""
+    import matplotlib.dates as mdates
+
+    start = mdates.date2num(datetime.datetime(2025, 1, 1))
+    t = np.arange(POINTS + frames) * PERIOD
+    x = start + t / 86400
+    return [(x, np.sin(t * (1 + i / 10)) * (100 + i) + np.random.normal(0, 1, len(t))) for i in range(GRID * GRID)]
+
+
+def window(signal, frame):
+    """Views of each graph's last POINTS samples after `frame` new ones."""
+    return [(x[frame:frame + POINTS], y[frame:frame + POINTS]) for x, y in signal]
+
+
+def rebuild_graph(ax, x, y):
+    """What updateGraphs used to do for each graph on every frame."""
+    import matplotlib.dates as mdates
+    import matplotlib.pyplot as plt
+
+    ax.clear()
+    ax.plot(x, y, color='#FF6B6B', linewidth=1)
+    ax.set_title("Graph")
+    ax.grid(True, linestyle='--', alpha=0.3)
+    ax.xaxis.set_major_formatter(mdates.DateFormatter('%H:%M:%S'))
+    ax.set_facecolor(GRAPH_BG)
+    ax.tick_params(colors=GRAPH_FG, labelsize=8)
+    ax.xaxis.label.set_color(GRAPH_FG)
+    ax.yaxis.label.set_color(GRAPH_FG)
+    ax.title.set_color(GRAPH_FG)
+    ax.title.set_fontsize(10)
+    for spine in ax.spines.values():
+        spine.set_color(GRAPH_FG)
+    plt.setp(ax.get_xticklabels(), rotation=45, ha='right')
+    ax.set_ylabel("PSI")
+    ax.relim()
+    ax.autoscale_view()
+    ax.xaxis.set_major_locator(mdates.AutoDateLocator(minticks=5, maxticks=10))
+    ax.figure.subplots_adjust(top=0.85, bottom=0.25, left=0.2, right=0.95)
+
+    # draw_idle only defers the work, draw now so it gets measured
+    ax.figure.canvas.draw()
+
+
+def run(name, root, frames, draw_frame):
+    start = time.perf_counter()
+    for frame in range(frames):
+        draw_frame(frame)
+        if root is not None:
+            root.update()
+    fps = frames / (time.perf_counter() - start)
+    print(f"{name:<28} {fps:8.2f} frames/s  ({frames} frames, {GRID * GRID} graphs x {POINTS} points)")
+    return fps
+
+
+def run_live(name, backend, frames, signal):
+    """Times LiveGraph over `frames` frames, returns (fps, full draws, blits)."""
+    from livegraph import LiveGraph
+
+    root, axes = make_figures(backend)
+    graphs = [LiveGraph(ax, {'color': '#FF6B6B', 'linewidth': 1}) for ax in axes]
+    def blit(frame):
+        for graph, (x, y) in zip(graphs, window(signal, frame)):
+            graph.update(x, y)
+    fps = run(name, root, frames, blit)
+    if root is not None:
+        root.destroy()
+    return fps, sum(graph.full_draws for graph in graphs), sum(graph.blits for graph in graphs)
+
+
+def main():
+    frames = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    long_frames = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+
+    backend = "Agg"
+    if os.environ.get("DISPLAY") or sys.platform == "win32":
+        backend = "TkAgg"
+    matplotlib.use(backend)
+    print(f"backend {backend}\n")
+
+    signal = signals(max(frames, long_frames))
+
+    root, axes = make_figures(backend)
+    def rebuild(frame):
+        for ax, (x, y) in zip(axes, window(signal, frame)):
+            rebuild_graph(ax, x, y)
+    base = run("clear and replot", root, frames, rebuild)
+    if root is not None:
+        root.destroy()
+
+    short = run_live("LiveGraph blitting", backend, frames, signal)
+    long = run_live("LiveGraph with rescales", backend, long_frames, signal)
+
+    print()
+    for name, (fps, full, blits) in [("short run", short), ("long run", long)]:
+        print(f"{name:<10} {fps / base:5.1f}x, {full} full draws and {blits} blits")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+# SARP 2025 Capstone GSE
+#
+# batched serial monitor console
+#
+# worker threads only queue lines. the Tk main loop flushes the queue into the
+# Text widget on a fixed cadence with a single insert, and trims the widget back
+# to a fixed number of lines, so the cost per flush stays bounded however fast
+# lines arrive and however long the session runs
+
+from collections import deque
+
+
+# tag -> text color
+CONSOLE_TAGS = {
+    "incoming": "#00FF00", # Green for incoming
+    "received": "#FFA500", # Orange for received
+    "outgoing": "#00FFFF", # Cyan for outgoing
+    "error":    "#FF0000", # Red for errors
+}
+
+
+class ConsoleWriter:
+    """Thread safe, batched writer for a Tk Text console.
+
+    `write()` can be called from any thread. Lines are buffered in a deque
+    (appends are atomic) and moved to the widget by `flush()`, which runs from
+    the Tk main loop every `interval` ms. At most `max_lines` lines are kept,
+    both in the widget and in the buffer, older ones are dropped.
+    """
+
+    def __init__(self, widget, max_lines=2000, interval=50):
+        self.widget = widget
+        self.max_lines = max_lines
+        self.interval = interval
+
+        self.pending = deque(maxlen=max_lines)
+        self.written = 0 # lines handed to write()
+        self.flushes = 0
+
+        for tag, color in CONSOLE_TAGS.items():
+            widget.tag_config(tag, foreground=color)
+
+        self.widget.after(self.interval, self._tick)
+
+    def write(self, text, tag="incoming"):
+        """Queues text for the console, safe to call from any thread."""
+        self.pending.append((text, tag))
+        self.written += 1
+
+    def _tick(self):
+        try:
+            self.flush()
+        finally:
+            self.widget.after(self.interval, self._tick)
+
+    def flush(self):
+        """Moves every queued line into the widget, Tk thread only."""
+        if not self.pending:
+            return
+
+        # text and tags alternate, so the whole batch is one Tk call
+        chunks = []
+        while self.pending:
+            try:
+                chunks.extend(self.pending.popleft())
+            except IndexError:
+                break
+
+        # only follow new output if the view was already at the bottom
+        following = self.widget.yview()[1] >= 1.0
+
+        self.widget.insert("end", *chunks)
+        # every line ends in a newline, so the last line of the widget is empty
+        lines = int(self.widget.index("end-1c").split(".")[0]) - 1
+        if lines > self.max_lines:
+            self.widget.delete("1.0", f"{lines - self.max_lines + 1}.0")
+
+        if following:
+            self.widget.see("end")
+        self.flushes += 1
+
+    def clear(self):
+        """Drops queued lines and empties the widget, Tk thread only."""
+        self.pending.clear()
+        self.widget.delete("1.0", "end")
@@ -0,0 +1,53 @@
+# SARP 2025 Capstone GSE
+#
+# decoding of the controller's telemetry lines
+#
+# every loop the controller (XavierSandbox.ino) prints one JSON object with
+# timeSent, a few sensors as plain numbers and a few commands as
+# [state, commanded, inProgress]. which sensors and commands rotates from line
+# to line. commands it read are echoed back as {"received":"..."}
+
+import math
+
+
+def is_echo(line):
+    """True for the controller's {"received":"..."} echo of a command"""
+    return '"received"' in line
+
+
+def read_frame(decoder, line, series_index, state_keys):
+    """Decodes one telemetry line with a FrameDecoder
+
+    Returns (time sent in seconds or None, samples, states). samples maps the
+    graphed keys of the line to their value, states maps its state keys to
+    the fields of their state to update. Raises ValueError if the line is no
+    frame, or has a list where a graph needs a number (an OTV DAQ frame).
+    """
+    decoder.decode(line)
+
+    sent = None
+    if 'timeSent' in decoder and decoder.get('timeSent').ndim == 0:
+        sent = float(decoder.get('timeSent')) / 1000.0
+        if not math.isfinite(sent):
+            sent = None
+
+    samples = {}
+    states = {}
+    for key in decoder.names:
+        value = decoder.get(key)
+        if key in series_index:
+            if value.ndim:
+                raise ValueError(f"{key} is not a single number")
+            samples[key] = float(value)
+        if key in state_keys:
+            if value.ndim == 1 and len(value) == 3:
+                # [state, commandedState, inProgress]
+                states[key] = {
+                    'currentState': bool(value[0]),
+                    'commandedState': bool(value[1]),
+                    'inProgress': bool(value[2]),
+                }
+            else:
+                # list values are views into the decoder, so they are copied
+                states[key] = {'currentState': value.tolist() if value.ndim else float(value)}
+    return sent, samples, states
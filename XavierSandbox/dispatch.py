@@ -0,0 +1,95 @@
+# SARP 2025 Capstone GSE
+#
+# coalescing UI updates for the serial GUI
+#
+# worker threads never touch Tk widgets. they mark what changed, and a single
+# after() callback on the Tk main loop applies everything pending once per
+# frame, however many times it was marked in between
+
+import threading
+
+
+class UIDispatcher:
+    """Collects dirty marks from any thread and applies them on the Tk thread.
+
+    Handlers are registered per kind of update and called with the set of
+    keys marked dirty since the previous frame. Marking the same key many
+    times between frames costs one handler call.
+    """
+
+    def __init__(self, widget, interval=100):
+        self.widget = widget
+        self.interval = interval # ms between frames
+
+        self.handlers = {} # kind -> callback(keys)
+        self.dirty = {}    # kind -> keys marked since the last frame
+        self.lock = threading.Lock()
+
+        self.marks = 0
+        self.frames = 0
+
+        self.widget.after(self.interval, self._tick)
+
+    def register(self, kind, callback):
+        """Calls `callback(keys)` on the Tk thread for every frame `kind` is dirty."""
+        self.handlers[kind] = callback
+
+    def mark(self, kind, *keys):
+        """Flags keys of a kind as changed, safe to call from any thread."""
+        with self.lock:
+            self.dirty.setdefault(kind, set()).update(keys)
+            self.marks += 1
+
+    def _tick(self):
+        with self.lock:
+            dirty, self.dirty = self.dirty, {}
+
+        try:
+            for kind, keys in dirty.items():
+                try:
+                    self.handlers[kind](keys)
+                except Exception as e:
+                    print(f"Error in UI update ({kind}): {e}")
+            if dirty:
+                self.frames += 1
+        finally:
+            self.widget.after(self.interval, self._tick)
+
+
+class RenderCache:
+    """Skips widget .config() calls that would not change anything.
+
+    Remembers the options last applied to each widget, and only configures
+    the ones whose value differs. Every widget update of the GUI has to go
+    through `apply()` for the cache to stay in sync with the widgets.
+    """
+
+    def __init__(self):
+        self.options = {} # widget -> options last applied
+        self.applied = 0
+        self.skipped = 0
+
+    def apply(self, widget, **options):
+        """Configures the options of `widget` that changed, returns True if any did."""
+        last = self.options.setdefault(widget, {})
+        changed = {key: value for key, value in options.items() if last.get(key, self) != value}
+        if not changed:
+            self.skipped += 1
+            return False
+
+        widget.config(**changed)
+        last.update(changed)
+        self.applied += 1
+        return True
+
+    def forget(self, widget=None):
+        """Drops what is known about a widget (or all), the next apply configures it fully."""
+        if widget is None:
+            self.options.clear()
+        else:
+            self.options.pop(widget, None)
+
+    def stats(self):
+        total = self.applied + self.skipped
+        share = 100 * self.skipped / total if total else 0
+        return f"{self.applied} applied, {self.skipped} skipped ({share:.1f}%)"
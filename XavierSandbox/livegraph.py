@@ -0,0 +1,88 @@
+# SARP 2025 Capstone GSE
+#
+# blitted live graphs for the serial GUI
+#
+# each graph keeps a single Line2D whose data is replaced in place. the rest of
+# the figure (axes, ticks, labels, grid) is drawn once and cached, and a normal
+# update only restores that background and draws the line over it. the limits
+# are given some headroom, so a full redraw is only needed when the data
+# outgrows them
+
+import numpy as np
+
+
+class LiveGraph:
+    """One axes with a single blitted line.
+
+    The figure must already have its canvas. `update()` does a full draw only
+    when the limits have to change, otherwise it blits the line over the
+    cached background. `full_draws` / `blits` count both kinds of frames.
+    """
+
+    def __init__(self, ax, style, headroom=0.25, margin=0.1):
+        self.ax = ax
+        self.figure = ax.figure
+        self.canvas = ax.figure.canvas
+
+        self.headroom = headroom # spare x range added to the right on rescale
+        self.margin = margin     # spare y range added above and below
+
+        self.line, = ax.plot([], [], animated=True, **style)
+        self.background = None
+
+        self.full_draws = 0
+        self.blits = 0
+
+        # any full draw (resize, rescale, toolbar) invalidates the background
+        self.canvas.mpl_connect('draw_event', self._on_draw)
+
+    def _on_draw(self, event):
+        self.background = self.canvas.copy_from_bbox(self.figure.bbox)
+        self.ax.draw_artist(self.line)
+
+    def _rescale(self, x, y):
+        """Sets new limits if the data left the current ones, returns True if it did."""
+        x0, x1 = x[0], x[-1]
+        y0, y1 = np.nanmin(y), np.nanmax(y)
+        if np.isnan(y0):
+            return False
+
+        xmin, xmax = self.ax.get_xlim()
+        ymin, ymax = self.ax.get_ylim()
+        x_span = max(x1 - x0, 1e-9)
+        y_span = max(y1 - y0, abs(y1) * 1e-3, 1e-9)
+
+        changed = False
+        # refit when the newest point runs off the right, or the oldest points
+        # have slid further than the headroom and left the axes half empty
+        if x1 > xmax or x0 < xmin or (x0 - xmin) > self.headroom * x_span:
+            self.ax.set_xlim(x0, x1 + self.headroom * x_span)
+            changed = True
+
+        # refit when the data leaves the limits, or only fills a sliver of them
+        if y0 < ymin or y1 > ymax or y_span < 0.25 * (ymax - ymin):
+            self.ax.set_ylim(y0 - self.margin * y_span, y1 + self.margin * y_span)
+            changed = True
+        return changed
+
+    def update(self, x, y):
+        """Replaces the line's data and puts it on screen."""
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        self.line.set_data(x, y)
+
+        if (len(x) and self._rescale(x, y)) or self.background is None:
+            self.full_draws += 1
+            self.canvas.draw()
+            return
+
+        self.blits += 1
+        self.canvas.restore_region(self.background)
+        self.ax.draw_artist(self.line)
+        self.canvas.blit(self.ax.bbox)
+
+    def clear(self):
+        """Empties the line and redraws the figure."""
+        self.line.set_data([], [])
+        self.full_draws += 1
+        self.canvas.draw()